@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# benchmark.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark suite for license_tools
+
+Generates a synthetic git repository and measures the throughput of
+each processing phase. Results get stored as JSON so that they can
+be compared between commits:
+
+    ./benchmark.py --output before.json
+    git checkout <other commit>
+    ./benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import math
+import os
+import pathlib
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import license_tools
+
+BASE = pathlib.Path(__file__).resolve().absolute().parent
+
+# a representative suffix and body template for each style
+STYLE_SAMPLES = {
+    license_tools.Style.C_STYLE: ('.cpp', 'int value_{i} = {i} * factor; // computes {i}\n'),
+    license_tools.Style.POUND_STYLE: ('.sh', 'echo "value {i}" >> output_{i}.log\n'),
+    license_tools.Style.DOCSTRING_STYLE: ('.py', 'value_{i} = compute({i})  # computes {i}\n'),
+    license_tools.Style.XML_STYLE: ('.xml', '<value index="{i}">{i}</value>\n'),
+    license_tools.Style.BATCH_STYLE: ('.bat', 'echo value {i} >> output_{i}.log\n'),
+    license_tools.Style.SLASH_STYLE: ('.rs', 'let value_{i} = {i} * factor;\n'),
+    license_tools.Style.DASH_STYLE: ('.lua', 'local value_{i} = {i} * factor\n'),
+}
+
+
+def _repeat(prefix: str, line: str):
+    """Returns a generator repeating line after prefix up to a given size"""
+    def generate(size: int) -> str:
+        return prefix + line * max(1, (size - len(prefix)) // len(line))
+    return generate
+
+
+# adversarial inputs for the header parser as pairs of suffix and generator
+WORST_CASE_INPUTS = {
+    'no_header': ('.cpp', _repeat('', 'int value = compute(42);\n')),
+    'no_header_unknown_style': ('.unknown', _repeat('', 'int value = compute(42);\n')),
+    'huge_line': ('.cpp', _repeat('', 'x')),
+    'c_comments_no_rights': ('.cpp', _repeat('', '/* comment */\n')),
+    'c_unterminated': ('.cpp', _repeat('/*\n', ' * All rights reserved.\n')),
+    'c_unterminated_line': ('.cpp', _repeat('/*', ' All rights reserved.')),
+    'c_tagged_unterminated': ('.cpp', _repeat('/* @LICENSE_HEADER_START@\n', ' * @LICENSE_HEADER_END@\n')),
+    'pound_comments_no_rights': ('.sh', _repeat('', '# comment\n')),
+    'pound_rights_only': ('.sh', _repeat('#\n', '# All rights reserved.\n')),
+    'docstring_unterminated': ('.py', _repeat('"""\n', 'All rights reserved.\n')),
+    'xml_unterminated': ('.xml', _repeat('<!--\n', 'All rights reserved.\n')),
+    'batch_unterminated': ('.bat', _repeat('::\n', ':: All rights reserved.\n')),
+    'slash_rights_only': ('.rs', _repeat('//\n', '// All rights reserved.\n')),
+    'tagged_unterminated': ('.unknown', _repeat('', 'x @LICENSE_HEADER_START@\n')),
+    'copyright_without_year': ('.cpp', _repeat('', ' Copyright notice\n')),
+    'copyright_without_year_line': ('.cpp', _repeat('', ' Copyright')),
+}
+
+CONFIG = {
+    'author': {
+        'from_git': True
+    },
+    'license': 'Apache-2.0',
+    'include': ['**/*'],
+    'exclude': ['^\\.[^/]+', '/\\.[^/]+']
+}
+
+
+def _git(cwd: pathlib.Path, *args, env=None):
+    subprocess.check_call(['git'] + list(args), cwd=cwd, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _parse_weights(value: str) -> dict:
+    """Parses a list of STYLE=weight pairs"""
+    weights = {}
+    for entry in value.split(','):
+        name, _, weight = entry.partition('=')
+        weights[license_tools.Style[name.strip()]] = float(weight or 1)
+    return weights
+
+
+class RepoGenerator:
+    """Generates a synthetic git repository to run benchmarks on"""
+
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.authors = [f'Bench Author {i}' for i in range(max(args.authors, 1))]
+        self.weights = _parse_weights(args.styles) if args.styles else {style: 1.0 for style in STYLE_SAMPLES}
+
+    def _size(self) -> int:
+        size = self.random.lognormvariate(math.log(self.args.size_median), self.args.size_sigma)
+        return int(min(max(size, 1), self.args.size_max))
+
+    def _contents(self, style: license_tools.Style, name: str, header: license_tools.Header) -> str:
+        _, line = STYLE_SAMPLES[style]
+        lines = []
+        size = self._size()
+        written = 0
+        i = 0
+        while written < size:
+            lines.append(line.format(i=i))
+            written += len(lines[-1])
+            i += 1
+        body = ''.join(lines)
+        if self.random.random() < self.args.with_header:
+            first_year = self.random.randint(2000, 2020)
+            authors = [license_tools.Author(author, first_year, self.random.randint(first_year, 2021))
+                       for author in self.random.sample(self.authors, self.random.randint(1, len(self.authors)))]
+            body = header.render(name, authors, style) + '\n' + body
+        return body
+
+    def generate(self, root: pathlib.Path):
+        """Populates root with a git repository according to the configured parameters"""
+        root.mkdir(parents=True, exist_ok=True)
+        _git(root, 'init', '--initial-branch=master')
+        _git(root, 'config', '--local', 'user.name', self.authors[0])
+        _git(root, 'config', '--local', 'user.email', 'bench@lictools.local')
+        (root / license_tools.LICENSE_JSON).write_text(json.dumps(CONFIG, indent=2))
+        header = license_tools.Header(license_tools.License(builtin=CONFIG['license']))
+        styles = list(self.weights)
+        weights = [self.weights[style] for style in styles]
+        files = []
+        for i in range(self.args.files):
+            style = self.random.choices(styles, weights)[0]
+            suffix, _ = STYLE_SAMPLES[style]
+            directory = root / f'dir{i % self.args.directories}'
+            directory.mkdir(exist_ok=True)
+            file = directory / f'file{i}{suffix}'
+            with open(file, 'w', encoding='utf-8', newline='') as output:
+                output.write(self._contents(style, file.name, header))
+            files.append(file)
+        # spread modifications over the configured amount of commits
+        depth = max(self.args.history_depth, 1)
+        for commit in range(depth):
+            author = self.random.choice(self.authors)
+            year = 2010 + (commit * 12) // depth
+            env = dict(os.environ,
+                       GIT_AUTHOR_NAME=author, GIT_AUTHOR_EMAIL='bench@lictools.local',
+                       GIT_AUTHOR_DATE=f'{year}-06-01T12:00:00',
+                       GIT_COMMITTER_DATE=f'{year}-06-01T12:00:00')
+            if commit > 0:
+                for file in self.random.sample(files, max(1, len(files) // depth)):
+                    with open(file, 'a', encoding='utf-8', newline='') as output:
+                        output.write(f'\n// change {commit}\n' if file.suffix == '.cpp' else f'\nchange = {commit}\n')
+            _git(root, 'add', '-A', env=env)
+            _git(root, 'commit', '-q', '-m', f'Commit {commit}', env=env)
+        return files
+
+
+class Benchmark:
+    """Measures the individual phases on a generated repository"""
+
+    def __init__(self, root: pathlib.Path, scratch: pathlib.Path, files, repeat: int, worst_case_size: int):
+        self.root = root
+        self.worst_case_size = worst_case_size
+        self.scratch = scratch
+        self.files = files
+        self.repeat = max(repeat, 1)
+        self.bytes = sum(file.stat().st_size for file in files)
+        self.results = {}
+
+    def measure(self, name: str, func, files: int = None, size: int = None):
+        """Measures func taking the best of the configured repetitions"""
+        files = len(self.files) if files is None else files
+        size = self.bytes if size is None else size
+        best = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+        self.results[name] = {
+            'seconds': best,
+            'files': files,
+            'bytes': size,
+            'files_per_second': files / best if best else None,
+            'mb_per_second': size / best / 1e6 if best else None,
+        }
+        print(f"{name:>36}: {best:8.3f}s {files / best:10.1f} files/s {size / best / 1e6:8.1f} MB/s", file=sys.stderr)
+
+    def run(self):
+        """Runs all phases"""
+        files_rel = [file.relative_to(self.root).as_posix() for file in self.files]
+        file_filter = license_tools.FileFilter(CONFIG['include'], CONFIG['exclude'])
+        self.measure('filter', lambda: [file_filter.matches(file_rel) for file_rel in files_rel])
+        self.measure('parse', lambda: [license_tools.ParsedHeader(file) for file in self.files])
+        git_repo = license_tools.GitRepo(cwd=self.root)
+        self.measure('git', lambda: [(git_repo.is_modified_in_tree(file), git_repo.author_from_history(file))
+                                     for file in self.files])
+        header = license_tools.Header(license_tools.License(builtin=CONFIG['license']))
+        parsed = [license_tools.ParsedHeader(file) for file in self.files]
+        self.measure('render', lambda: [header.render(file.name, entry.authors or [git_repo.author_from_config()],
+                                                      entry.style, license=entry.license)
+                                        for file, entry in zip(self.files, parsed)])
+        tool = license_tools.Tool(license_tools.License(builtin=CONFIG['license']), git_repo.author_from_config())
+        self.measure('bump', lambda: [tool.bump(file) for file in self.files])
+
+        for name, (suffix, generate) in WORST_CASE_INPUTS.items():
+            contents = generate(self.worst_case_size)  # pylint: disable=not-callable
+            file = pathlib.PurePath(f'worst_case{suffix}')
+            self.measure(f'worst_case_{name}', functools.partial(license_tools.ParsedHeader, file, contents),
+                         files=1, size=len(contents))
+
+        lictool = [sys.executable, str(BASE / 'lictool')]
+        pristine = self.scratch / 'pristine'
+        shutil.copytree(self.root, pristine)
+
+        def cli_apply():
+            shutil.rmtree(self.root)
+            shutil.copytree(pristine, self.root)
+            subprocess.run(lictool, cwd=self.root, check=False, stdout=subprocess.DEVNULL)
+        self.measure('cli_apply', cli_apply)
+        self.measure('cli_noop', lambda: subprocess.run(lictool, cwd=self.root,
+                                                        check=False, stdout=subprocess.DEVNULL))
+        return self.results
+
+
+def _git_describe() -> str:
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=BASE,
+                                       encoding='utf-8', stderr=subprocess.DEVNULL).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    """Prints a comparison of two result sets and returns false on regressions"""
+    success = True
+    print(f"{'phase':>36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results['phases'].items():
+        before = baseline['phases'].get(name)
+        if not before:
+            print(f"{name:>36} {'-':>10} {result['seconds']:10.3f}")
+            continue
+        change = result['seconds'] / before['seconds'] - 1 if before['seconds'] else 0
+        marker = ''
+        if change > max_regression:
+            marker = ' REGRESSION'
+            success = False
+        print(f"{name:>36} {before['seconds']:10.3f} {result['seconds']:10.3f} {change:+8.1%}{marker}")
+    return success
+
+
+def main():
+    """CLI entry point"""
+    parser = argparse.ArgumentParser(description='Benchmarks license_tools on a synthetic repository')
+    parser.add_argument('--files', type=int, default=500, help='Number of files to generate')
+    parser.add_argument('--directories', type=int, default=20, help='Number of directories to spread files over')
+    parser.add_argument('--size-median', type=int, default=4096, help='Median file size in bytes')
+    parser.add_argument('--size-sigma', type=float, default=1.0,
+                        help='Spread of the lognormal file size distribution')
+    parser.add_argument('--size-max', type=int, default=4 * 1024 * 1024, help='Maximum file size in bytes')
+    parser.add_argument('--styles', default=None,
+                        help='Mix of comment styles as STYLE=weight pairs, e.g. C_STYLE=3,POUND_STYLE=1.'
+                        f' Defaults to an equal share of {", ".join(style.name for style in STYLE_SAMPLES)}')
+    parser.add_argument('--with-header', type=float, default=0.5,
+                        help='Share of files with an existing header between 0 and 1')
+    parser.add_argument('--history-depth', type=int, default=10, help='Number of commits to generate')
+    parser.add_argument('--authors', type=int, default=3, help='Number of distinct authors')
+    parser.add_argument('--worst-case-size', type=int, default=4 * 1024 * 1024,
+                        help='Size in bytes of the adversarial inputs used to benchmark the parser')
+    parser.add_argument('--seed', type=int, default=42, help='Seed used for generating the repository')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per phase, the best run is reported')
+    parser.add_argument('--keep', type=pathlib.Path, default=None,
+                        help='Generate the repository to the given directory and keep it')
+    parser.add_argument('--output', type=pathlib.Path, default=None, help='Write results as JSON to this file')
+    parser.add_argument('--compare', type=pathlib.Path, default=None,
+                        help='Compare results against a JSON file written by a previous run')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Relative slowdown per phase tolerated when comparing')
+    args = parser.parse_args()
+
+    # make results independent of the date the benchmark is run on
+    os.environ['LICTOOLS_OVERRIDE_YEAR'] = '2022'
+    os.environ['GIT_CONFIG_COUNT'] = '0'
+
+    with tempfile.TemporaryDirectory(suffix='lictools-bench') as wkdir:
+        root = args.keep or pathlib.Path(wkdir) / 'repo'
+        files = RepoGenerator(args).generate(root)
+        results = {
+            'meta': {
+                'commit': _git_describe(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'date': datetime.datetime.now().isoformat(),
+                'parameters': {key: str(value) if isinstance(value, pathlib.Path) else value
+                               for key, value in vars(args).items()},
+            },
+            'phases': Benchmark(root, pathlib.Path(wkdir), files, args.repeat, args.worst_case_size).run()
+        }
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        if not compare(results, json.loads(args.compare.read_text()), args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 # __init__.py
 #
-# Copyright (c) 2012 - 2024 Marius Zwicker
+# Copyright (c) 2012 - 2026 Marius Zwicker
 # All rights reserved.
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -30,13 +30,14 @@ import logging
 import os
 import pathlib
 import re
+import sqlite3
 import subprocess
 import sys
-from collections import namedtuple
+import time
+from collections import Counter, namedtuple
 from copy import copy
 from operator import attrgetter
-from typing import Dict
-import jinja2
+from typing import Dict, List
 
 BASE_DIR = pathlib.Path(__file__).parent
 CW_DIR = pathlib.Path.cwd()
@@ -44,6 +45,10 @@ SPDX_LICENSES = list(BASE_DIR.glob('*.spdx'))
 OTHER_LICENSES = list(BASE_DIR.glob('*.license'))
 LICENSES = {license_file.stem: license_file for license_file in SPDX_LICENSES + OTHER_LICENSES}
 LICENSE_JSON = '.license-tools-config.json'
+# appended to the name of files written by --dry-run
+SIMULATE_SUFFIX = '.license_bumped'
+# number of files to query git for at once
+BATCH_SIZE = 256
 
 
 class DateUtils:
@@ -120,8 +125,14 @@ class Style(enum.Enum):
         setattr(cls, '__suffix_overrides', suffix_overrides)
 
     @classmethod
-    def from_suffix(cls, ext):
-        """Tries to determine the style based on a file suffix"""
+    def from_suffix(cls, ext, suffix_overrides=None):
+        """
+        Tries to determine the style based on a file suffix
+
+        :ext: The file suffix including the leading dot
+        :suffix_overrides: Custom mappings of file suffix to style name,
+                           will use the ones set via set_overrides() if omitted
+        """
         mapping = {
             '.cc': Style.C_STYLE,
             '.cxx': Style.C_STYLE,
@@ -157,7 +168,8 @@ class Style(enum.Enum):
             '.rs': Style.SLASH_STYLE,
             '.toml': Style.POUND_STYLE
         }
-        suffix_overrides = getattr(cls, '__suffix_overrides', None)
+        if suffix_overrides is None:
+            suffix_overrides = getattr(cls, '__suffix_overrides', None)
         if suffix_overrides and ext in suffix_overrides:  # pylint: disable=unsupported-membership-test
             return Style[suffix_overrides[ext]]  # pylint: disable=unsubscriptable-object
         return mapping.get(ext, None) or mapping.get(ext.lower(), Style.UNKNOWN)
@@ -182,45 +194,55 @@ class Style(enum.Enum):
 
         :style: Use to limit the list of patterns to the given style
         """
+        def lazy_until(group, anchor):
+            # Equivalent to (?P<group>.+?)anchor but stopping at the first occurrence
+            # of anchor. A plain lazy group would retry with every later occurrence once
+            # the remainder of a pattern fails, e.g. for an unterminated comment, causing
+            # quadratic runtime. Any later occurrence would fail the same way and as
+            # lookaheads are atomic, they can be used to prevent the backtracking.
+            return rf"(?=(?P<{group}>.+?){anchor})(?P={group}){anchor}"
+        tagged = lazy_until('authors', '@LICENSE_HEADER_START@')
+        mlba_tagged = lazy_until('authors', '@MLBA_OPEN_LICENSE_HEADER_START@')
+        rights = lazy_until('authors', r'All rights reserved\.')
         style_patterns = [
             (Style.C_STYLE,
-                r"/\*(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)\* +@LICENSE_HEADER_END@(?:.*?)\*/(?P<body>.*)"),
+                r"/\*" + tagged + lazy_until('license', r'\* +@LICENSE_HEADER_END@') + r"(?:.*?)\*/(?P<body>.*)"),
             (Style.C_STYLE,
-                r"/\*(?P<authors>.+?)@MLBA_OPEN_LICENSE_HEADER_START@(?P<license>.+?)\* +@MLBA_OPEN_LICENSE_HEADER_END@(?:.*?)\*/(?P<body>.*)"),
+                r"/\*" + mlba_tagged + lazy_until('license', r'\* +@MLBA_OPEN_LICENSE_HEADER_END@') + r"(?:.*?)\*/(?P<body>.*)"),
             (Style.C_STYLE,
-                r"/\*(?P<authors>.+?)All rights reserved\.(?P<license>.+?)\*/(?P<body>.*)"),
+                r"/\*" + rights + r"(?P<license>.+?)\*/(?P<body>.*)"),
             (Style.POUND_STYLE,
-                r"#(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)# +@LICENSE_HEADER_END@(?:.*?)#\r?\n(?P<body>.*)"),
+                r"#" + tagged + lazy_until('license', r'# +@LICENSE_HEADER_END@') + r"(?:.*?)#\r?\n(?P<body>.*)"),
             (Style.POUND_STYLE,
-                r"#(?P<authors>.+?)All rights reserved\.(?P<license>.+?)^(?P<body>[^#](.*)|$)"),
+                r"#" + rights + r"(?P<license>.+?)^(?P<body>[^#](.*)|$)"),
             (Style.DOCSTRING_STYLE,
-                r"\"\"\"\r?\n(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)@LICENSE_HEADER_END@(?:.*?)\r?\n\"\"\"(?P<body>.*)"),
+                r"\"\"\"\r?\n" + tagged + lazy_until('license', '@LICENSE_HEADER_END@') + r"(?:.*?)\r?\n\"\"\"(?P<body>.*)"),
             (Style.DOCSTRING_STYLE,
-                r"\"\"\"\r?\n(?P<authors>.+?)All rights reserved\.(?P<license>.+?)\"\"\"\r?\n(?P<body>.*)"),
+                r"\"\"\"\r?\n" + rights + r"(?P<license>.+?)\"\"\"\r?\n(?P<body>.*)"),
             (Style.DOCSTRING_STYLE,
-                r"#(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)# +@LICENSE_HEADER_END@(?:.*?)#\r?\n(?P<body>.*)"),
+                r"#" + tagged + lazy_until('license', r'# +@LICENSE_HEADER_END@') + r"(?:.*?)#\r?\n(?P<body>.*)"),
             (Style.DOCSTRING_STYLE,
-                r"#(?P<authors>.+?)All rights reserved\.(?P<license>.+?)^(?P<body>[^#](.*)|$)"),
+                r"#" + rights + r"(?P<license>.+?)^(?P<body>[^#](.*)|$)"),
             (Style.XML_STYLE,
-                r"<!--\r?\n(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)@LICENSE_HEADER_END@(?:.*?)\r?\n-->(?P<body>.*)"),
+                r"<!--\r?\n" + tagged + lazy_until('license', '@LICENSE_HEADER_END@') + r"(?:.*?)\r?\n-->(?P<body>.*)"),
             (Style.XML_STYLE,
-                r"<!--\r?\n(?P<authors>.+?)All rights reserved\.(?P<license>.+?)-->\r?\n(?P<body>.*)"),
+                r"<!--\r?\n" + rights + r"(?P<license>.+?)-->\r?\n(?P<body>.*)"),
             (Style.BATCH_STYLE,
-                r"REM(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)@LICENSE_HEADER_END@(?:.*?)REM\r?\n(?!REM)(?P<body>.*)"),
+                r"REM" + tagged + lazy_until('license', '@LICENSE_HEADER_END@') + r"(?:.*?)REM\r?\n(?!REM)(?P<body>.*)"),
             (Style.BATCH_STYLE,
-                r"REM(?P<authors>.+?)All rights reserved\.(?P<license>.+?)^(?P<body>(?!REM)(.*)|$)"),
+                r"REM" + rights + r"(?P<license>.+?)^(?P<body>(?!REM)(.*)|$)"),
             (Style.BATCH_STYLE,
-                r"::(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)@LICENSE_HEADER_END@(?:.*?)::\r?\n(?!::)(?P<body>.*)"),
+                r"::" + tagged + lazy_until('license', '@LICENSE_HEADER_END@') + r"(?:.*?)::\r?\n(?!::)(?P<body>.*)"),
             (Style.BATCH_STYLE,
-                r"::(?P<authors>.+?)All rights reserved\.(?P<license>.+?)^(::)?\r?\n(?!::)(?P<body>.*)"),
+                r"::" + rights + r"(?P<license>.+?)^(::)?\r?\n(?!::)(?P<body>.*)"),
             (Style.SLASH_STYLE,
-                r"//(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)// +@LICENSE_HEADER_END@(?:.*?)//\r?\n(?P<body>.*)"),
+                r"//" + tagged + lazy_until('license', r'// +@LICENSE_HEADER_END@') + r"(?:.*?)//\r?\n(?P<body>.*)"),
             (Style.SLASH_STYLE,
-                r"//(?P<authors>.+?)All rights reserved\.(?P<license>.+?)^(?P<body>[^/](.*)|$)"),
+                r"//" + rights + r"(?P<license>.+?)^(?P<body>[^/](.*)|$)"),
             (Style.DASH_STYLE,
-                r"--(?P<authors>.+?)All rights reserved\.(?P<license>.+?)^(?P<body>[^-](.*)|$)"),
+                r"--" + rights + r"(?P<license>.+?)^(?P<body>[^-](.*)|$)"),
             (Style.UNKNOWN,
-                r"(?P<authors>.+?)@LICENSE_HEADER_START@(?P<license>.+?)@LICENSE_HEADER_END@(?P<body>.*)"),
+                tagged + lazy_until('license', '@LICENSE_HEADER_END@') + r"(?P<body>.*)"),
         ]
         if style is None:
             style = Style.UNKNOWN
@@ -316,23 +338,43 @@ class Author:
         return self.name == other.name and self.year_from == other.year_from and self.year_to == other.year_to
 
 
-class GitRepo:
+class GitRepo:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
     """Git repository object"""
 
+    @staticmethod
+    def run(cwd: pathlib.Path, *args) -> str:
+        """
+        Runs git with the given arguments without involving a shell
+
+        :throws subprocess.CalledProcessError: When git failed, the output holds stdout and stderr
+        """
+        return subprocess.check_output(['git'] + list(args), cwd=cwd, stderr=subprocess.STDOUT, encoding='utf-8')
+
     @staticmethod
     @functools.lru_cache(maxsize=256, typed=True)
     def find_git_root(cwd: pathlib.Path) -> pathlib.Path:
         """Tries to find the git root as seen from cwd"""
-        root = subprocess.check_output(
-            'git rev-parse --show-toplevel', cwd=cwd, stderr=subprocess.STDOUT, shell=True, encoding='utf-8')
+        from license_tools import gitplumbing  # pylint: disable=import-outside-toplevel
+        if gitplumbing.enabled():
+            try:
+                root, _ = gitplumbing.find_worktree(cwd)
+                return root
+            except gitplumbing.ERRORS:
+                pass
+        root = GitRepo.run(cwd, 'rev-parse', '--show-toplevel')
         return pathlib.Path(root.strip())
 
     @staticmethod
     @functools.lru_cache(maxsize=256, typed=True)
     def author_name_from_config(cwd: pathlib.Path) -> str:
         """Returns the author name as set via gitconfig and seen from cwd"""
-        git_author = subprocess.check_output(
-            'git config user.name', cwd=cwd, stderr=subprocess.STDOUT, shell=True, encoding='utf-8')
+        from license_tools import gitplumbing  # pylint: disable=import-outside-toplevel
+        if gitplumbing.enabled():
+            try:
+                return gitplumbing.Repository(*gitplumbing.find_worktree(cwd)).user_name()
+            except gitplumbing.ERRORS:
+                pass
+        git_author = GitRepo.run(cwd, 'config', 'user.name')
         return git_author.strip()
 
     def __init__(self, cwd=None):
@@ -348,6 +390,325 @@ class GitRepo:
             self.git_root = GitRepo.find_git_root(cwd)
         except subprocess.CalledProcessError as error:
             raise RuntimeError(f"Not a git repo: {error.output}") from error
+        # results queried ahead of time by prefetch(), consumed on first use
+        self.prefetched_modified = {}
+        self.prefetched_history = {}
+        self.prefetched_blame = {}
+        self.prefetched_blobs = {}
+        # bump results by key, see cached_result()
+        from license_tools import gitplumbing, gitstore  # pylint: disable=import-outside-toplevel
+        self.results = gitstore.ResultCache()
+        # the index of the full history, see enable_history()
+        self.use_history = False
+        self.history = None
+        self.history_checked = False
+        # the share of lines required to be listed, see enable_blame()
+        self.blame_threshold = None
+        self.blames = None
+        # metadata shared with other processes, see metadata_store()
+        self.store = None
+        self.plumbing = None
+        if gitplumbing.enabled():
+            try:
+                self.plumbing = gitplumbing.Repository(self.git_root)
+            except gitplumbing.ERRORS as error:
+                logging.debug(f"Using the git CLI for {self.git_root}: {error}")
+
+    def prefetch(self, filenames, concurrency: int = None):
+        """
+        Queries the git state of the given files ahead of time
+
+        Queries for multiple files get combined or run concurrently so that
+        subsequent calls to is_modified_in_tree() and author_from_history()
+        for these files do not need to wait for git anymore.
+
+        :filenames: The files to be queried
+        :concurrency: The maximum number of git processes to run at once
+        """
+        from license_tools import gitasync  # pylint: disable=import-outside-toplevel
+        stored, states, head = self._lookup_stored(filenames)
+        for file_rel, (modified, author, year) in stored.items():
+            self.prefetched_modified[file_rel] = modified
+            if not modified:
+                self.prefetched_history[file_rel] = Author(name=author, year_to=year, git_repo=self) if author else None
+        stored_files = {self.git_root / file_rel for file_rel in stored}
+        remaining = [filename for filename in filenames if pathlib.Path(filename) not in stored_files]
+        modified, history = gitasync.prefetch(self, remaining, concurrency)
+        self.prefetched_modified.update(modified)
+        self.prefetched_history.update(history)
+        if states:
+            entries = {}
+            for file_rel, state in states.items():
+                if file_rel in modified and file_rel not in stored:
+                    author = history.get(file_rel, None)
+                    entries[file_rel.as_posix()] = (state, modified[file_rel], author.name if author else None,
+                                                    author.year_to if author else None)
+            self.store.save(head, entries)
+        files_rel = []
+        for filename in filenames:
+            try:
+                files_rel.append(pathlib.PurePath(filename).relative_to(self.git_root))
+            except ValueError:
+                pass
+        blobs = self.clean_blobs([file_rel for file_rel in files_rel
+                                  if self.prefetched_modified.get(file_rel, None) is False])
+        self.prefetched_blobs.update(blobs)
+        self.results.expect(blobs.values())
+        if self.blame_threshold is not None:
+            self.prefetched_blame.update(self.blame(files_rel, concurrency))
+
+    def metadata_store(self):
+        """Returns the store shared with other processes or None if not available, see gitstore"""
+        from license_tools import gitstore  # pylint: disable=import-outside-toplevel
+        if self.store is None and gitstore.enabled():
+            try:
+                self.store = gitstore.MetadataStore(self.git_dir())
+            except (sqlite3.Error, subprocess.CalledProcessError) as error:
+                logging.debug(f"Not sharing git metadata: {error}")
+                self.store = False
+        return self.store or None
+
+    def _lookup_stored(self, filenames):
+        """Returns the stored metadata of files, their states and the sha of HEAD"""
+        from license_tools import gitstore  # pylint: disable=import-outside-toplevel
+        store = self.metadata_store()
+        # the history index already gets shared, latest authors are taken from there
+        if store is None or self.use_history:
+            return {}, {}, None
+        try:
+            head = self.head_commit()
+            index_key = gitstore.stat_key(self.index_path(), racy=False)
+            states = {}
+            for filename in filenames:
+                file_key = gitstore.stat_key(filename)
+                try:
+                    file_rel = pathlib.PurePath(filename).relative_to(self.git_root)
+                except ValueError:
+                    continue
+                states[file_rel] = f'{index_key}/{file_key}' if index_key and file_key else None
+            found = store.lookup(head, {file_rel.as_posix(): state for file_rel, state in states.items()})
+        except (sqlite3.Error, subprocess.CalledProcessError) as error:
+            logging.debug(f"Failed to look up shared git metadata: {error}")
+            return {}, {}, None
+        stored = {file_rel: found[file_rel.as_posix()] for file_rel in states if file_rel.as_posix() in found}
+        return stored, states, head
+
+    def git_dir(self) -> pathlib.Path:
+        """Returns the git dir of the worktree"""
+        if self.plumbing is not None:
+            return self.plumbing.git_dir
+        return self.git_root / GitRepo.run(self.git_root, 'rev-parse', '--git-dir').strip()
+
+    def index_path(self) -> pathlib.Path:
+        """Returns the path of the index"""
+        if self.plumbing is not None:
+            return self.plumbing.index_path()
+        return self.git_root / GitRepo.run(self.git_root, 'rev-parse', '--git-path', 'index').strip()
+
+    def discard_prefetched(self):
+        """Drops any results of prefetch() which have not been used"""
+        self.prefetched_modified.clear()
+        self.prefetched_history.clear()
+        self.prefetched_blame.clear()
+        self.prefetched_blobs.clear()
+        unchanged = self.results.take_unchanged()
+        if (unchanged or self.store) and self.metadata_store():
+            self.store.add_unchanged(unchanged)
+        if self.plumbing is not None:
+            self.plumbing.close()
+        # new commits may have been added before the next batch
+        self.history_checked = False
+
+    def enable_history(self):
+        """
+        Determines authors using an index of the full history
+
+        The index is built once and stored within the git dir, see githistory.
+        Enables contributors() and makes author_from_history() use the index.
+        """
+        self.use_history = True
+
+    def head_commit(self) -> str:
+        """Returns the sha of the current HEAD"""
+        from license_tools import gitplumbing  # pylint: disable=import-outside-toplevel
+        if self.plumbing is not None:
+            try:
+                return self.plumbing.head_commit()
+            except gitplumbing.ERRORS:
+                pass
+        return GitRepo.run(self.git_root, 'rev-parse', '--verify', 'HEAD').strip()
+
+    def enable_blame(self, threshold: float):
+        """
+        Determines contributors using git blame instead of the history
+
+        Results are cached within the git dir keyed by the blob of each file, see gitblame.
+
+        :threshold: The percentage of lines an author needs to own to be listed
+        """
+        self.blame_threshold = threshold
+
+    def common_dir(self) -> pathlib.Path:
+        """Returns the git dir shared by all worktrees"""
+        if self.plumbing is not None:
+            return self.plumbing.common_dir
+        return self.git_root / GitRepo.run(self.git_root, 'rev-parse', '--git-common-dir').strip()
+
+    def index_blobs(self, files_rel) -> dict:
+        """Returns the sha of the blob each of the given files has in the index or None if not existing"""
+        from license_tools import gitplumbing  # pylint: disable=import-outside-toplevel
+        if self.plumbing is not None:
+            try:
+                index = self.plumbing.index()
+                return {file_rel: index[file_rel.as_posix()][10].hex() if index.get(file_rel.as_posix(), None) else None
+                        for file_rel in files_rel}
+            except gitplumbing.ERRORS:
+                pass
+        blobs = {}
+        for i in range(0, len(files_rel), BATCH_SIZE):
+            chunk = files_rel[i:i + BATCH_SIZE]
+            blobs.update((file_rel, None) for file_rel in chunk)
+            try:
+                output = GitRepo.run(self.git_root, '--literal-pathspecs', 'ls-files', '-s', '-z', '--',
+                                     *[file_rel.as_posix() for file_rel in chunk])
+            except subprocess.CalledProcessError:
+                continue
+            for line in output.split('\0'):
+                info, _, path = line.partition('\t')
+                if not path:
+                    continue
+                _, sha, stage = info.split(' ')
+                if stage == '0':
+                    blobs[pathlib.PurePath(path)] = sha
+        return blobs
+
+    def clean_blobs(self, files_rel) -> dict:
+        """Returns the blobs of the files which are the same in HEAD, the index and the worktree"""
+        if not files_rel:
+            return {}
+        index = self.index_blobs(files_rel)
+        head = self.head_blobs([file_rel for file_rel in files_rel if index.get(file_rel, None)])
+        return {file_rel: blob for file_rel, blob in head.items() if blob and blob == index[file_rel]}
+
+    def clean_blob(self, filename: pathlib.PurePath) -> str:
+        """Returns the blob of a file as determined by prefetch() if it has no pending changes or None"""
+        try:
+            return self.prefetched_blobs.pop(pathlib.PurePath(filename).relative_to(self.git_root), None)
+        except ValueError:
+            return None
+
+    def cached_result(self, key: str, blob: str):
+        """
+        Returns the result of bumping a file stored using cache_result() or None
+
+        Results of identical files get reused within a batch, unchanged results across runs.
+        returns a pair of whether the contents changed and the bumped contents, the latter
+                being None for unchanged contents
+        """
+        result = self.results.get(key, blob)
+        if result is None and self.metadata_store() and self.store.is_unchanged(key):
+            result = (False, None)
+        return result
+
+    def cache_result(self, key: str, blob: str, changed: bool, content):
+        """Stores the result of bumping a file for identical files, see cached_result()"""
+        self.results.put(key, blob, changed, content)
+
+    def head_blobs(self, files_rel) -> dict:
+        """Returns the sha of the blob each of the given files has in HEAD or None if not existing"""
+        from license_tools import gitplumbing  # pylint: disable=import-outside-toplevel
+        blobs = {}
+        unknown = []
+        for file_rel in files_rel:
+            try:
+                entry = self.plumbing.head_entry(file_rel.as_posix()) if self.plumbing else False
+            except gitplumbing.ERRORS:
+                entry = False
+            if entry is False:
+                unknown.append(file_rel)
+            else:
+                blobs[file_rel] = entry[1].hex() if entry else None
+        for i in range(0, len(unknown), BATCH_SIZE):
+            chunk = unknown[i:i + BATCH_SIZE]
+            blobs.update((file_rel, None) for file_rel in chunk)
+            try:
+                output = GitRepo.run(self.git_root, '--literal-pathspecs', 'ls-tree', '-z', 'HEAD', '--',
+                                     *[file_rel.as_posix() for file_rel in chunk])
+            except subprocess.CalledProcessError:
+                continue
+            for line in output.split('\0'):
+                info, _, path = line.partition('\t')
+                if not path:
+                    continue
+                _, obj_type, sha = info.split(' ')
+                if obj_type == 'blob':
+                    blobs[pathlib.PurePath(path)] = sha
+        return blobs
+
+    def blame(self, files_rel, concurrency: int = None) -> dict:
+        """
+        Blames the given files or takes the results from the cache
+
+        :files_rel: The paths of the files relative to the root
+        :concurrency: The maximum number of git processes to run at once
+        returns a dict mapping paths to the authors and lines as returned by gitblame.parse_porcelain()
+        """
+        from license_tools import gitasync, gitblame  # pylint: disable=import-outside-toplevel
+        if self.blames is None:
+            self.blames = gitblame.BlameCache(self.common_dir())
+        blobs = self.head_blobs(files_rel)
+        blamed = {}
+        missing = []
+        for file_rel in files_rel:
+            blob = blobs.get(file_rel, None)
+            cached = self.blames.get(file_rel.as_posix(), blob) if blob else {}
+            if cached is None:
+                missing.append(file_rel)
+            else:
+                blamed[file_rel] = cached
+        for file_rel, output in gitasync.blame(self.git_root, missing, concurrency).items():
+            blamed[file_rel] = {}
+            if output is not None:
+                blamed[file_rel] = gitblame.parse_porcelain(output)
+                self.blames.put(file_rel.as_posix(), blobs[file_rel], blamed[file_rel])
+        self.blames.store()
+        return blamed
+
+    def history_index(self):
+        """Returns the up to date index of the full history or None if not enabled or available"""
+        if not self.use_history:
+            return None
+        if self.history is not None and self.history_checked:
+            return self.history
+        from license_tools import githistory  # pylint: disable=import-outside-toplevel
+        try:
+            if self.history is None:
+                self.history = githistory.HistoryIndex(self.git_root, self.common_dir())
+            self.history.update(self.head_commit())
+        except subprocess.CalledProcessError as error:
+            logging.warning(f"Failed to index the history, using the latest author only: {error.output}")
+            self.use_history = False
+            return None
+        self.history_checked = True
+        return self.history
+
+    def contributors(self, filename: pathlib.Path) -> list:
+        """Returns all authors who committed to the file ordered by their first year"""
+        file_rel = filename.relative_to(self.git_root)
+        if self.blame_threshold is not None:
+            from license_tools import gitblame  # pylint: disable=import-outside-toplevel
+            blamed = self.prefetched_blame.pop(file_rel, None)
+            if blamed is None:
+                blamed = self.blame([file_rel])[file_rel]
+            contributors = gitblame.owners(blamed, self.blame_threshold)
+        else:
+            history = self.history_index()
+            if history is None:
+                return []
+            contributors = history.contributors(file_rel.as_posix())
+        contributors = sorted(contributors.items(), key=lambda item: (item[1], item[0]))
+        return [Author(name=name, year_from=year_from, year_to=year_to, git_repo=self)
+                for name, (year_from, year_to) in contributors]
 
     def author_from_config(self) -> Author:
         """Returns the author as set via gitconfig"""
@@ -357,33 +718,66 @@ class GitRepo:
             logging.fatal(f"Failed to fetch author using git: {error.output}")
             return None
 
+    def author_from_log(self, file_rel: pathlib.PurePath, output: str) -> Author:
+        """Creates the author from the output of git log as run by author_from_history() or None"""
+        try:
+            author_name, author_year = output.strip().split('\t')
+            author_year = int(author_year)
+        except ValueError:
+            return None
+        logging.debug(f"{file_rel} was last touched by \"{author_name}\" during {author_year}")
+        return Author(name=author_name, year_to=author_year, git_repo=self)
+
+    @staticmethod
+    def history_args(file_rel: pathlib.PurePath):
+        """Returns the arguments to git to query the latest author of a file"""
+        return ['--literal-pathspecs', 'log', '-1', '--date=format:%Y', '--pretty=format:%an\t%ad', '--', file_rel.as_posix()]
+
     def author_from_history(self, filename: pathlib.Path) -> Author:
         """Returns the author who touched the file for the last time or None"""
         file_rel = filename.relative_to(self.git_root)
+        if file_rel in self.prefetched_history:
+            return self.prefetched_history.pop(file_rel)
+        history = self.history_index()
+        if history is not None:
+            latest = history.latest(file_rel.as_posix())
+            if latest is None:
+                return None
+            logging.debug(f"{file_rel} was last touched by \"{latest[0]}\" during {latest[1]}")
+            return Author(name=latest[0], year_to=latest[1], git_repo=self)
         try:
-            author_raw = subprocess.check_output(
-                f'git log -1 --date=format:%Y --pretty=format:"%an\t%ad" -- {file_rel}',
-                cwd=self.git_root, stderr=subprocess.STDOUT, shell=True,
-                encoding='utf-8')
-            author_raw = author_raw.strip()
-            author_name, author_year = author_raw.split('\t')
-            author_year = int(author_year)
-            logging.debug(f"{file_rel} was last touched by \"{author_name}\" during {author_year}")
-            return Author(name=author_name, year_to=author_year, git_repo=self)
-        except ValueError:
-            pass
+            return self.author_from_log(file_rel, GitRepo.run(self.git_root, *GitRepo.history_args(file_rel)))
         except subprocess.CalledProcessError:
             pass
         return None
 
+    def modified_from_disk(self, file_rel: pathlib.PurePath) -> bool:
+        """
+        Determines whether the file has uncommitted changes without running git
+
+        Reads the index and the objects of HEAD directly, see gitplumbing.
+        returns None when this is not supported and git needs to be asked
+        """
+        if self.plumbing is None:
+            return None
+        from license_tools import gitplumbing  # pylint: disable=import-outside-toplevel
+        try:
+            return self.plumbing.is_modified(file_rel.as_posix())
+        except gitplumbing.ERRORS as error:
+            logging.debug(f"Using the git CLI for {file_rel}: {error}")
+        return None
+
     def is_modified_in_tree(self, filename: pathlib.Path) -> bool:
         """Returns true when the file has uncommited chnages in the tree"""
         file_rel = filename.relative_to(self.git_root)
+        if file_rel in self.prefetched_modified:
+            return self.prefetched_modified.pop(file_rel)
+        modified = self.modified_from_disk(file_rel)
+        if modified is not None:
+            return modified
         try:
-            diff = subprocess.check_output(
-                f'git diff --name-only HEAD -- {file_rel}',
-                cwd=self.git_root, stderr=subprocess.STDOUT, shell=True,
-                encoding='utf-8').strip()
+            diff = GitRepo.run(self.git_root, '--literal-pathspecs', 'diff', '--name-only', 'HEAD', '--',
+                               file_rel.as_posix()).strip()
             if len(diff) != 0:
                 logging.debug(f"{file_rel} was just modified: {diff}")
                 return True
@@ -455,12 +849,24 @@ class Header:
 
     def __init__(self, default_license, lines_after_license: int = 1):
         """Creates a new header using given default license"""
-        loader = jinja2.FileSystemLoader(BASE_DIR)
-        self.env = jinja2.Environment(loader=loader)
+        self.env = Header.environment()
         self.template = self.env.get_template('Header.j2')
         self.default_license = default_license
         self.lines_after_license = lines_after_license
 
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def environment():
+        """
+        Returns the jinja environment shared by all headers
+
+        Templates get compiled once and are cached by the environment.
+        jinja2 is imported on first use so that commands forwarded to
+        the daemon do not pay for the import.
+        """
+        import jinja2  # pylint: disable=import-outside-toplevel
+        return jinja2.Environment(loader=jinja2.FileSystemLoader(BASE_DIR))
+
     def render(self, title: str, authors, style: Style, company: str = None, license: str = None) -> str:
         """
         Renders a header to a string
@@ -487,38 +893,40 @@ class Header:
 class ParsedHeader:
     """A license header parsed from an existing file"""
 
-    def __init__(self, file: pathlib.PurePath = None, contents: str = None):
+    # headers are only searched for within this many characters at the
+    # beginning of a file limiting the effort spent on large files
+    HEADER_WINDOW = 64 * 1024
+
+    def __init__(self, file: pathlib.PurePath = None, contents: str = None, style_overrides=None,
+                 truncated: bool = False):
         """
         Parses a header from the given file
 
         :file: The filepath of the header
         :contenst: The contents of the header, if None this will be read from file
+        :style_overrides: Custom mappings of file suffix to style, see Style.from_suffix()
+        :truncated: If contents are only the beginning of the file
         """
         if contents is None:
             with open(file, 'r', encoding='utf-8', newline='') as file_obj:
                 contents = file_obj.read()
-        if isinstance(file, str):
-            file = pathlib.Path(file)
         # style is determined from the extension, if unknown we try a second attempt using the contents below
-        self.style = Style.from_suffix(file.suffix)
-        if self.style == Style.UNKNOWN:
-            self.style = Style.from_name(file.name)
+        self.style = ParsedHeader.style_from_path(file, style_overrides)
         # strip but remember any shebang, encoding or doctype at the beginning
-        self.decls = []
-
-        def extract_decl(pattern, contents, flags=re.MULTILINE):
-            decl = re.match(pattern, contents, flags)
-            if decl:
-                decl = decl[0]
-                self.decls.append(decl)
-                # remove the decl including the newline
-                return contents[len(decl):].lstrip()
-            return contents
-        for decl, flags in Style.declarations():
-            contents = extract_decl(decl, contents, flags)
+        self.decls, contents = ParsedHeader.split_decls(contents)
+        # limit the search to complete lines within the window
+        window = contents
+        if len(contents) > ParsedHeader.HEADER_WINDOW:
+            cut = contents.rfind('\n', 0, ParsedHeader.HEADER_WINDOW) + 1
+            window = contents[:cut or ParsedHeader.HEADER_WINDOW]
+        truncated = truncated or len(window) < len(contents)
         # any known license is wrapped in well-known tags
+        match = None
         for style, pattern in Style.patterns(self.style):
-            match = re.match(pattern, contents, re.MULTILINE | re.DOTALL)
+            match = re.match(pattern, window, re.MULTILINE | re.DOTALL)
+            if match and truncated and match.start('body') >= len(window):
+                # the header might continue beyond the window, do not trust it
+                match = None
             if match:
                 match_style = style
                 if self.style == Style.UNKNOWN:
@@ -538,10 +946,12 @@ class ParsedHeader:
             if self.license == "":
                 # When license is an empty string reset to None
                 self.license = None
-            self.remainder = match.group('body').strip()
+            self.body = contents[match.start('body'):]
         else:
             self.license = None
-            self.remainder = contents.strip()
+            self.body = contents
+        # anything following the header
+        self.remainder = self.body.strip()
         # determine the line endings from the remainder or default to platform if none
         if self.remainder:
             if '\r\n' in self.remainder:
@@ -553,11 +963,24 @@ class ParsedHeader:
         # in case we have a matched header we can use its authors group to limit our search
         # use a regex to extract existing authors, i.e. any line starting with 'Copyright'
         if match:
-            authors_raw = match.group('authors') or contents
+            authors_raw = match.group('authors') or window
         else:
-            authors_raw = contents
+            authors_raw = window
         self.authors = []
-        for match in re.finditer(r" Copyright[^\d]*(?P<from>[0-9]+) *(?:- *(?P<to>[0-9]+))? *(?P<name>[^\n\r]+)", authors_raw, re.IGNORECASE):
+        pattern = re.compile(r" Copyright[^\d]*(?P<from>[0-9]+) *(?:- *(?P<to>[0-9]+))? *(?P<name>[^\n\r]+)",
+                             re.IGNORECASE)
+        # the same as pattern.finditer() but without scanning to the next digit again for
+        # every occurrence of 'Copyright' that is bound to fail the same way as the one before
+        skip_to = 0
+        for occurrence in re.finditer(' Copyright', authors_raw, re.IGNORECASE):
+            if occurrence.start() < skip_to:
+                continue
+            match = pattern.match(authors_raw, occurrence.start())
+            if match is None:
+                digit = re.compile(r'\d').search(authors_raw, occurrence.end())
+                skip_to = digit.start() if digit else len(authors_raw)
+                continue
+            skip_to = match.end()
             args = {
                 'name': match.group('name'),
                 'year_from': int(match.group('from'))
@@ -570,29 +993,68 @@ class ParsedHeader:
             self.authors.append(author)
         self.authors = sorted(self.authors, key=attrgetter('year_from'))
 
+    @staticmethod
+    def style_from_path(file: pathlib.PurePath, style_overrides=None) -> Style:
+        """Determines the style from the suffix or name of a file, returns Style.UNKNOWN if neither is known"""
+        if isinstance(file, str):
+            file = pathlib.PurePath(file)
+        style = Style.from_suffix(file.suffix, style_overrides)
+        if style == Style.UNKNOWN:
+            style = Style.from_name(file.name)
+        return style
+
+    @staticmethod
+    def split_decls(contents: str):
+        """Splits any document declarations from contents, returns a pair of these and the remaining contents"""
+        decls = []
+        for pattern, flags in Style.declarations():
+            decl = re.match(pattern, contents, flags)
+            if decl:
+                decl = decl[0]
+                decls.append(decl)
+                # remove the decl including the newline
+                contents = contents[len(decl):].lstrip()
+        return decls, contents
+
+
+BumpResult = namedtuple('BumpResult', 'path style content changed timings')
+BumpResult.__doc__ = """
+The result of bumping a file
+
+:path: The path the contents were bumped for
+:style: The detected comment style
+:content: The bumped contents or None if the style is unknown
+:changed: True if the bumped contents differ from the input
+:timings: The time in seconds spent in the 'parse', 'git' and 'render' phases
+"""
+
 
 class Tool:
     """The license tool"""
 
     def __init__(self, default_license: License, default_author: Author,
-                 company: str = None, aliases: Dict[str, str] = None, lines_after_license: int = 1):
+                 company: str = None, aliases: Dict[str, str] = None, lines_after_license: int = 1, *,
+                 style_overrides: Dict[str, str] = None, generated_markers: List[str] = None):
         """Creates a new tool instance with default license and author"""
         self.default_license = default_license
         self.default_author = default_author
         self.aliases = aliases or {}
         self.company = company
+        self.style_overrides = style_overrides
+        self.generated_markers = generated_markers or []
         self.header = Header(self.default_license, lines_after_license)
 
     @staticmethod
-    def force_newline(input: str, newline='\n') -> str:
-        """Change input to use the given newline and return the result"""
+    def force_newline(input, newline='\n'):
+        """Change input given as str or bytes to use the given newline and return the result"""
+        unix, dos = ('\n', '\r\n') if isinstance(input, str) else (b'\n', b'\r\n')
         if newline == '\n':
             # fast path, simply drop any remaining dos endings
-            return input.replace('\r\n', '\n')
+            return input.replace(dos, unix)
         # this requires to sweep the input twice but is the most
         # reliable way to catch all unix endings without the need
         # to use a look-behind regex (which would be even slower)
-        return Tool.force_newline(input).replace('\n', newline)
+        return Tool.force_newline(input).replace(unix, dos)
 
     def bump(self, filename: pathlib.PurePath,
              keep_license: bool = True, title: Title = None, keep_authors: bool = True, latest_year_only: bool = False) -> str:
@@ -603,22 +1065,29 @@ class Tool:
         :title: The title to use in the header
         :keep_authors: If any existing authors should be retained or replaced with the new default
         :latest_year_only: Only lists the last year a file was touched
-        returns a tuple of detected language and bumped contents
+        returns a tuple of detected language and bumped contents, see rawtext.decode_any()
         """
-        parsed = ParsedHeader(filename)
-        if parsed.style == Style.UNKNOWN:
-            logging.warning(f"Failed to determine comment style for {filename}")
-            return Style.UNKNOWN, None
-
+        from license_tools import rawtext  # pylint: disable=import-outside-toplevel
+        with open(filename, 'rb') as file_obj:
+            result = self.bump_contents(file_obj.read(), filename, keep_license=keep_license, title=title,
+                                        keep_authors=keep_authors, latest_year_only=latest_year_only)
+        return result.style, rawtext.decode_any(result.content)
+
+    def latest_author(self, filename: pathlib.PurePath) -> Author:
+        """Determines the author who touched the given file for the last time"""
         latest_author = None
         git_repo = self.default_author.git_repo
         if git_repo:
-            # first try to test if the file has been cached
-            if git_repo.is_modified_in_tree(filename):
-                latest_author = self.default_author
-            # try to determine the author using the git history of the file
-            else:
-                latest_author = git_repo.author_from_history(filename)
+            try:
+                # first try to test if the file has been cached
+                if git_repo.is_modified_in_tree(filename):
+                    latest_author = copy(self.default_author)
+                # try to determine the author using the git history of the file
+                else:
+                    latest_author = git_repo.author_from_history(filename)
+            except ValueError:
+                # virtual paths outside of the repository have no history
+                latest_author = None
 
             if latest_author:
                 # make sure to honor year_from coming from the config
@@ -627,10 +1096,169 @@ class Tool:
                 if not self.default_author.name_from_git:
                     latest_author.name = self.default_author.name
         if latest_author is None:
-            latest_author = self.default_author
+            latest_author = copy(self.default_author)
+        return latest_author
+
+    def contributors(self, filename: pathlib.PurePath) -> list:
+        """Determines all authors who committed to the given file when using the full history"""
+        git_repo = self.default_author.git_repo
+        if git_repo is None:
+            return []
+        try:
+            contributors = git_repo.contributors(filename)
+        except ValueError:
+            # virtual paths outside of the repository have no history
+            return []
+        for author in contributors:
+            author.name = self.aliases.get(author.name, author.name)
+        return contributors
+
+    def bump_contents(self, contents, path: pathlib.PurePath, *,
+                      keep_license: bool = True, title: Title = None, keep_authors: bool = True,
+                      latest_year_only: bool = False, latest_author: Author = None,
+                      contributors: list = None) -> BumpResult:
+        """
+        Bumps the given contents without any file I/O
+        :contents: The contents to be bumped as str or bytes, see bump_bytes()
+        :path: The path of the contents, used to determine the comment style, the title
+               and the git history in case it is located within the repository
+        :keep_license: If an existing license should be retained or replaced with the new default
+        :title: The title to use in the header
+        :keep_authors: If any existing authors should be retained or replaced with the new default
+        :latest_year_only: Only lists the last year a file was touched
+        :latest_author: The author who touched the contents last, determined using git if omitted
+        :contributors: Further authors to be listed, determined using git if latest_author is omitted
+        returns a BumpResult holding content of the same type as the passed contents
+        """
+        from license_tools import rawtext  # pylint: disable=import-outside-toplevel
+        data = rawtext.encode(contents) if isinstance(contents, str) else bytes(contents)
+        wide = rawtext.wide_encoding(data)
+        if wide:
+            # not compatible with ASCII, bump as UTF-8 and convert back afterwards
+            data = data.decode(wide).encode('utf-8')
+        result = self.bump_bytes(data, path, rawtext.window_end(data, ParsedHeader.HEADER_WINDOW),
+                                 keep_license=keep_license, title=title, keep_authors=keep_authors,
+                                 latest_year_only=latest_year_only, latest_author=latest_author,
+                                 contributors=contributors)
+        if result.content is None:
+            return result
+        if not result.changed:
+            return result._replace(content=contents if isinstance(contents, str) else bytes(contents))
+        if wide:
+            return result._replace(content=result.content.decode('utf-8').encode(wide))
+        if isinstance(contents, str):
+            return result._replace(content=rawtext.decode(result.content))
+        return result
+
+    def bump_bytes(self, data: bytes, path: pathlib.PurePath, cut: int, *,
+                   keep_license: bool = True, title: Title = None, keep_authors: bool = True,
+                   latest_year_only: bool = False, latest_author: Author = None,
+                   contributors: list = None) -> BumpResult:
+        """
+        Bumps the given contents decoding only the part holding the header
+
+        :data: The contents to be bumped in an encoding compatible with ASCII, as bytes or
+               a read-only mmap. The part following cut is only copied if the header changes
+        :path: The path of the contents, see bump_contents()
+        :cut: The offset up to which contents get decoded and searched for a header,
+              see rawtext.window_end(). Anything following is kept as bytes
+        See bump_contents() for the remaining options
+        returns a BumpResult holding bytes or data itself if unchanged
+        """
+        from license_tools import rawtext  # pylint: disable=import-outside-toplevel
+        timings = {}
+        start = time.perf_counter()
+        if isinstance(path, str):
+            path = pathlib.PurePath(path)
+        head = rawtext.decode(data[:cut])
+        truncated = cut < len(data)
+        parsed = None
+        style = ParsedHeader.style_from_path(path, self.style_overrides)
+        if style == Style.UNKNOWN:
+            # the style can only be detected from the contents
+            parsed = ParsedHeader(path, head, self.style_overrides, truncated=truncated)
+            style = parsed.style
+        timings['parse'] = time.perf_counter() - start
+        if style == Style.UNKNOWN:
+            logging.warning(f"Failed to determine comment style for {path}")
+            return BumpResult(path, Style.UNKNOWN, None, False, timings)
+
+        start = time.perf_counter()
+        if latest_author is None:
+            latest_author = self.latest_author(path)
+            contributors = self.contributors(path)
+        contributors = contributors or []
+        timings['git'] = time.perf_counter() - start
+
+        title_text = title.get(path) if title else None
+        if parsed is None:
+            # most files already carry the header they would get, this is quick to confirm
+            # by rendering the authors as they would be listed after bumping a second time
+            start = time.perf_counter()
+            authors = self.merge_authors([], latest_author, contributors, latest_year_only)
+            if keep_authors:
+                authors = self.merge_authors(sorted(authors, key=attrgetter('year_from')),
+                                             latest_author, contributors, latest_year_only)
+            rendered = self.is_rendered(data, ParsedHeader.split_decls(head)[0], style, authors, title_text)
+            timings['render'] = time.perf_counter() - start
+            if rendered:
+                return BumpResult(path, style, data, False, timings)
+            start = time.perf_counter()
+            parsed = ParsedHeader(path, head, self.style_overrides, truncated=truncated)
+            timings['parse'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        parsed.authors = self.merge_authors(parsed.authors if keep_authors else [],
+                                            latest_author, contributors, latest_year_only)
+        license_text = parsed.license if keep_license else None
+        header = self.header.render(
+            title=title_text, authors=parsed.authors, style=parsed.style, company=self.company, license=license_text)
+        # the remainder is passed through as bytes, with the line endings determined from it
+        with memoryview(data) as view:
+            remainder = (rawtext.encode(parsed.body) + view[cut:]).strip()
+        newline = os.linesep
+        if remainder:
+            newline = '\r\n' if b'\r\n' in remainder else '\n'
+        # the updated output is the new header with the remainder and ensuring a single trailing newline
+        if remainder:
+            header = header + '\n'
+        else:
+            header = header.strip() + '\n'
+        if parsed.decls:
+            header = '\n'.join(parsed.decls) + '\n' + header
+        output = rawtext.encode(Tool.force_newline(header, newline))
+        if remainder:
+            output += Tool.force_newline(remainder + b'\n', newline)
+        timings['render'] = timings.get('render', 0) + time.perf_counter() - start
+
+        # comparing the lengths first saves to copy the contents of a mapped file
+        changed = len(output) != len(data) or output != data[:]
+        return BumpResult(path, parsed.style, output, changed, timings)
+
+    def merge_authors(self, authors: list, latest_author: Author, contributors: list,
+                      latest_year_only: bool = False) -> list:
+        """
+        Merges the authors listed by a header with the ones determined using git
 
+        :authors: The authors listed by the existing header, these get updated in place
+        :latest_author: The author who touched the contents last
+        :contributors: Further authors to be listed
+        :latest_year_only: Only lists the last year a file was touched
+        returns the deduplicated list of authors to be rendered
+        """
+        latest_author = copy(latest_author)
+        authors = list(authors)
+        for contributor in contributors:
+            for author in authors:
+                if contributor.name in (author.name, self.aliases.get(author.name, None)):
+                    author.name = contributor.name
+                    author.year_from = min(author.year_from, contributor.year_from)
+                    author.year_to = max(author.year_to, contributor.year_to)
+                    break
+            else:
+                authors.append(copy(contributor))
         new_author = True
-        for author in parsed.authors:
+        for author in authors:
             alias = self.aliases.get(author.name, None)
             if latest_author.name in (author.name, alias):
                 author.year_to = latest_author.year_to
@@ -641,47 +1269,109 @@ class Tool:
                 author.year_to = year_to
                 new_author = False
         if new_author:
-            parsed.authors.append(latest_author)
+            authors.append(latest_author)
 
         # make sure to deduplicate authors properly
         seen_authors = {}
-        for author in parsed.authors:
+        for author in authors:
             seen = seen_authors.get(author.name, None)
             if seen:
                 seen.year_from = min(seen.year_from, author.year_from)
                 seen.year_to = max(seen.year_to, author.year_to)
             else:
                 seen_authors[author.name] = author
-        if keep_authors:
-            parsed.authors = list(seen_authors.values())
-        else:
-            parsed.authors = [latest_author]
+        authors = list(seen_authors.values())
         if latest_year_only:
-            for author in parsed.authors:
+            for author in authors:
                 author.year_from = author.year_to
+        return authors
 
-        license_text = None
-        if keep_license:
-            license_text = parsed.license
+    def is_rendered(self, data: bytes, decls: list, style: Style, authors: list, title_text: str) -> bool:
+        """
+        Tests if contents start with exactly the header that would be rendered for them
+
+        Comparing the beginning of a file with the expected header is way cheaper
+        than parsing the existing header.
+        :data: The contents of a file as bytes or a read-only mmap
+        :decls: The document declarations at the beginning of the contents
+        :style: The comment style of the file
+        :authors: The authors as they would be listed after bumping
+        :title_text: The title as it would be rendered
+        returns true if bumping the contents is known to leave them unchanged
+        """
+        from license_tools import rawtext  # pylint: disable=import-outside-toplevel
+        expected = self.header.render(title=title_text, authors=authors, style=style, company=self.company) + '\n'
+        if decls:
+            expected = '\n'.join(decls) + '\n' + expected
+        newline = '\r\n' if data.find(b'\r\n', 0) >= 0 else '\n'
+        expected = rawtext.encode(Tool.force_newline(expected, newline))
+        if len(expected) > ParsedHeader.HEADER_WINDOW or data[:len(expected)] != expected:
+            return False
+        # the remainder is retained stripped and ending with a single newline
+        start = len(expected)
+        end = len(data) - len(newline)
+        if end <= start or data[start:start + 1].isspace() or data[end - 1:end].isspace() \
+                or data[end:] != newline.encode('ascii'):
+            return False
+        if newline == '\n':
+            return True
+        # line endings are determined from the remainder, all of which get converted
+        return data.find(b'\r\n', start, end) >= 0 and not rawtext.LONE_LF.search(data, start)
 
-        title_text = None
-        if title:
-            title_text = title.get(filename)
+    def result_key(self, blob: str, filename: pathlib.PurePath, latest_author: Author, contributors: list, *,
+                   keep_license: bool = True, title: Title = None, keep_authors: bool = True,
+                   latest_year_only: bool = False) -> str:
+        """
+        Returns a key identifying the result of bumping the given blob stored at filename
 
-        # the updated output is the new header with the remainder and ensuring a single trailing newline
-        output = self.header.render(
-            title=title_text, authors=parsed.authors, style=parsed.style, company=self.company, license=license_text)
-        if parsed.remainder:
-            output = output + '\n' + parsed.remainder + '\n'
-        else:
-            output = output.strip() + '\n'
-        if parsed.decls:
-            output = '\n'.join(parsed.decls) + '\n' + output
-        output = Tool.force_newline(output, parsed.newline)
-        return parsed.style, output
+        Covers everything the result depends on, i.e. the contents, the configuration,
+        the authors, the title and the version of the tool.
+        """
+        from license_tools import gitstore  # pylint: disable=import-outside-toplevel
+        filename = pathlib.PurePath(filename)
+        state = [
+            blob, os.stat(filename).st_size, Style.from_suffix(filename.suffix, self.style_overrides).name,
+            Style.from_name(filename.name).name, title.get(filename) if title else None,
+            [(author.name, author.year_from, author.year_to) for author in [latest_author] + contributors],
+            self.default_license.name if self.default_license else None,
+            self.default_license.header if self.default_license else None, self.company,
+            sorted(self.aliases.items()), self.header.lines_after_license, sorted((self.style_overrides or {}).items()),
+            keep_license, keep_authors, latest_year_only, self.generated_markers, Tool.version()
+        ]
+        return gitstore.digest(state)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def version() -> str:
+        """
+        Identifies the version of the tool by its package version and a digest of its sources
+
+        Covers all modules and templates, the licenses are part of the configuration.
+        """
+        import hashlib  # pylint: disable=import-outside-toplevel
+        import importlib.metadata  # pylint: disable=import-outside-toplevel
+        try:
+            package_version = importlib.metadata.version('mz-lictools')
+        except importlib.metadata.PackageNotFoundError:
+            package_version = None
+        sources = hashlib.sha1(str(package_version).encode('utf-8'))  # nosec - not used for security
+        for source in sorted(list(BASE_DIR.glob('*.py')) + list(BASE_DIR.glob('*.j2'))):
+            sources.update(source.name.encode('utf-8') + b'\0' + source.read_bytes())
+        return f'{package_version}:{sources.hexdigest()}'
+
+    def bump_many(self, items, **kwargs):
+        """
+        Bumps a sequence of contents without any file I/O
+        :items: An iterable of (path, contents) pairs, see bump_contents()
+        :kwargs: Options passed on to bump_contents()
+        yields a BumpResult for each of the items
+        """
+        for path, contents in items:
+            yield self.bump_contents(contents, path, **kwargs)
 
     def bump_inplace(self, filename: pathlib.PurePath, keep_license: bool = True,
-                     title: Title = None, simulate: bool = False, keep_authors: bool = True, latest_year_only: bool = False) -> bool:
+                     title: Title = None, simulate: bool = False, keep_authors: bool = True, *,
+                     latest_year_only: bool = False, stats: Counter = None) -> bool:
         """
         Bumps the license header of a given file
         :filename: The file to be bumped
@@ -690,16 +1380,11 @@ class Tool:
         :simulate: Perform a dry run not applying any changes
         :keep_authors: If any existing authors should be retained or replaced with the new default
         :latest_year_only: Only lists the last year a file was touched
+        :stats: Counts the files 'changed', 'unchanged' or skipped by reason, see rawtext.sniff()
         """
-        _, bumped = self.bump(filename, keep_license=keep_license, title=title,
-                              keep_authors=keep_authors, latest_year_only=latest_year_only)
-        if bumped:
-            filename = str(filename) + \
-                '.license_bumped' if simulate else filename
-            with open(filename, 'w', encoding='utf-8', newline='') as output:
-                output.write(bumped)
-                return True
-        return False
+        from license_tools import rawtext  # pylint: disable=import-outside-toplevel
+        return rawtext.bump_file(self, filename, simulate=simulate, stats=stats, keep_license=keep_license,
+                                 title=title, keep_authors=keep_authors, latest_year_only=latest_year_only)
 
 
 class FileFilter:
@@ -766,35 +1451,87 @@ class FileFilter:
     def _to_re(pattern: str) -> re.Pattern:
         return re.compile(pattern)
 
+    @staticmethod
+    def _literal(expr: str) -> str:
+        return re.match(r'[^*?\[\]]*', expr).group()
+
+    @staticmethod
+    def _merge(patterns: list) -> re.Pattern:
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{pattern.pattern})' for pattern in patterns))
+
+    def __init__(self, includes, excludes):
+        """
+        Compiles the given lists into a matcher to be reused for any number of files
+
+        :includes: List of globbing expressions noting files to includes
+        :exclude: List of regular expressions noting files to exclude
+        """
+        self.includes = [FileFilter._glob_to_re(include) for include in includes]
+        self.excludes = [FileFilter._to_re(exclude) for exclude in excludes]
+        # files can only match if starting and ending with the literal text of any of the includes
+        prefixes = [FileFilter._literal(include) for include in includes]
+        suffixes = [FileFilter._literal(include[::-1])[::-1] for include in includes]
+        self.prefixes = tuple(prefixes) if all(prefixes) else None
+        self.suffixes = tuple(suffixes) if all(suffixes) else None
+        self.include = FileFilter._merge(self.includes)
+        # merging expressions with groups or inline flags would alter their meaning
+        merged = [exclude for exclude in self.excludes if not exclude.groups and exclude.flags == re.UNICODE]
+        self.exclude = FileFilter._merge(merged)
+        self.separate = [exclude for exclude in self.excludes if exclude not in merged]
+
+    def matches(self, file_rel: str) -> bool:
+        """
+        Tests if a given relative file matches includes and not excludes
+
+        :file_rel: Relative filepath to be tested
+        """
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(self.reason(file_rel))
+        if self.prefixes is not None and not file_rel.startswith(self.prefixes):
+            return False
+        if self.suffixes is not None and not file_rel.endswith(self.suffixes):
+            return False
+        if self.include is None or not self.include.match(file_rel):
+            return False
+        if self.exclude is not None and self.exclude.search(file_rel):
+            return False
+        return not any(exclude.search(file_rel) for exclude in self.separate)
+
+    def reason(self, file_rel: str) -> str:
+        """Describes why a given relative file is included or excluded"""
+        reason = f"Excluding '{file_rel}' - failed to match any"
+        for include in self.includes:
+            if include.match(file_rel):
+                reason = f"Including '{file_rel}' because of '{include.pattern}'"
+                break
+        for exclude in self.excludes:
+            if exclude.search(file_rel):
+                reason = f"Excluding '{file_rel}' due to '{exclude.pattern}'"
+                break
+        return reason
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256, typed=True)
+    def _compile(includes: tuple, excludes: tuple) -> 'FileFilter':
+        return FileFilter(includes, excludes)
+
     @staticmethod
     def is_included(file_rel: str, includes, excludes) -> bool:
         """
         Tests if a given relative file matches includes and not excludes
 
+        Prefer creating a FileFilter once when testing many files.
         :file_rel: Relative filepath to be tested
         :includes: List of globbing expressions noting files to includes
         :exclude: List of regular expressions noting files to exclude
         """
-        matched = False
-        match_reason = f"Excluding '{file_rel}' - failed to match any"
-        for include in includes:
-            include = FileFilter._glob_to_re(include)
-            if re.match(include, file_rel):
-                match_reason = f"Including '{file_rel}' because of '{include.pattern}'"
-                matched = True
-                break
-        for exclude in excludes:
-            exclude = FileFilter._to_re(exclude)
-            if re.search(exclude, file_rel):
-                match_reason = f"Excluding '{file_rel}' due to '{exclude.pattern}'"
-                matched = False
-                break
-        logging.debug(match_reason)
-        return matched
+        return FileFilter._compile(tuple(includes), tuple(excludes)).matches(file_rel)
 
 
-def main():
-    """CLI entry point"""
+def create_parser() -> argparse.ArgumentParser:
+    """Creates the parser for the commandline"""
     parser = argparse.ArgumentParser(
         prog='license_tools',
         description=f'Helper to maintain current code license headers ({", ".join(LICENSES)}).')
@@ -816,23 +1553,106 @@ def main():
     parser.add_argument(
         '--sample-config', help='Generate a default configuration file to the working directory',
         default=False, action='store_true')
+    parser.add_argument(
+        '--profile', help='Run under a profiler and write pstats to the given file.'
+        ' Collapsed stacks for flamegraphs get written next to it using an additional \'.folded\' suffix',
+        type=pathlib.Path, default=None, metavar='OUTPUT')
+    parser.add_argument(
+        '--profile-interval', help='Sample stacks every given milliseconds instead of tracing all calls'
+        ' when profiling. Causes less overhead but only estimates times',
+        type=float, default=None, metavar='MS')
+    parser.add_argument(
+        '--stdin', help='Read contents from stdin and write the bumped contents to stdout.'
+        ' Requires --stdin-path to resolve the config and the comment style',
+        default=False, action='store_true')
+    parser.add_argument(
+        '--stdin-path', help='The path of the contents passed via --stdin, the file itself does not need to exist',
+        type=pathlib.Path, default=None, metavar='PATH')
+    parser.add_argument(
+        '--files-from', help='Read the files to be processed from the given file or stdin when passing \'-\'.'
+        ' Expects one path per line unless -0 is passed',
+        type=pathlib.Path, default=None, metavar='FILE')
+    parser.add_argument(
+        '-0', '--null', help='Expect paths passed via --files-from to be separated by NUL instead of newlines',
+        default=False, action='store_true')
+    parser.add_argument(
+        '--watch', help='Keep running and process files as they get saved or created.'
+        ' Configs get reloaded when changed',
+        default=False, action='store_true')
+    parser.add_argument(
+        '--watch-poll', help='Poll for changes instead of using inotify when watching,'
+        ' e.g. for network filesystems',
+        default=False, action='store_true')
+    parser.add_argument(
+        '--lsp', help='Run as language server on stdin and stdout reporting outdated headers as diagnostics',
+        default=False, action='store_true')
+    parser.add_argument(
+        '--git-jobs', help='The maximum number of git processes to run at once, defaults to twice the CPU count',
+        type=int, default=None, metavar='N')
+    parser.add_argument(
+        '--read-jobs', help='The number of threads reading files ahead while others get bumped,'
+        ' defaults to the CPU count but at most 8. Pass 0 to process files strictly one after another',
+        type=int, default=None, metavar='N')
+    parser.add_argument(
+        '--stats', help='Log how many files got changed, left unchanged or skipped by reason when done',
+        default=False, action='store_true')
+    parser.add_argument(
+        '--daemon', help='Hand the work to a warm daemon listening on a local socket.'
+        ' The daemon gets started when not running yet and will exit after being idle',
+        default=False, action='store_true')
     parser.add_argument(
         'files', nargs='*', type=pathlib.Path,
         help='The file to be processed. Repeat to pass multiple.'
              ' Leave empty to process files in and below the current working directory.'
              ' Inclusions and exclusions from the config will always be considered.')
+    return parser
+
+
+def main():
+    """CLI entry point"""
+    parser = create_parser()
     args = parser.parse_args()
+    if args.stdin and (args.stdin_path is None or args.files or args.files_from):
+        parser.error('--stdin requires --stdin-path and cannot be combined with files')
+    if args.files_from and args.files:
+        parser.error('--files-from cannot be combined with files')
+    if args.watch and (args.stdin or args.files_from):
+        parser.error('--watch cannot be combined with --stdin or --files-from')
+    if args.lsp and (args.stdin or args.files_from or args.watch or args.files):
+        parser.error('--lsp cannot be combined with files, --stdin, --files-from or --watch')
+
+    setup_logging(args.verbose)
+
+    if args.daemon and not (args.stdin or args.watch or args.lsp or args.profile or args.sample_config
+                            or str(args.files_from) == '-'):
+        from license_tools import daemon  # pylint: disable=import-outside-toplevel
+        code = daemon.forward(sys.argv[1:], CW_DIR)
+        if code is not None:
+            sys.exit(code)
+        logging.debug("Daemon not available, processing locally")
+
+    if args.profile:
+        from license_tools import profiling  # pylint: disable=import-outside-toplevel
+        interval = args.profile_interval / 1000 if args.profile_interval else None
+        profiling.profile(functools.partial(run, args), args.profile, interval=interval)
+    else:
+        run(args)
 
+
+def setup_logging(verbose: bool, stream=None):
+    """Configures logging to the given stream or stderr if omitted"""
     format = '[%(levelname)s] %(message)s'
-    if args.verbose:
-        logging.basicConfig(level=logging.DEBUG, format=format)
-    else:
-        logging.basicConfig(level=logging.INFO, format=format)
+    level = logging.DEBUG if verbose else logging.INFO
+    logging.basicConfig(level=level, format=format, stream=stream, force=True)
 
+
+def run(args):
+    """Runs the tool using the given parsed commandline"""
     if args.sample_config:
         default_config = {
             'author': {
                 'from_git': True,
+                'from_history': False,
                 'years': [1970, DateUtils.current_year()],
                 'latest_year_only': False,
                 'name': '<author here>',
@@ -851,6 +1671,10 @@ def main():
             'style_override_for_suffix': {
                 ".cpp": f'<pick one of {", ".join([s.name for s in list(Style)])} or leave out>',
             },
+            'generated_markers': [
+                '@generated',
+                'DO NOT EDIT'
+            ],
             'include': [
                 '**/*'
             ],
@@ -864,44 +1688,70 @@ def main():
             logging.info(f'Wrote default config to {CW_DIR / LICENSE_JSON}')
             sys.exit(0)
 
-    if args.files:
+    args.summary = Counter() if args.stats else None
+    if args.lsp:
+        from license_tools import lsp  # pylint: disable=import-outside-toplevel
+        sys.exit(lsp.serve(args))
+    if args.watch:
+        from license_tools import watch  # pylint: disable=import-outside-toplevel
+        paths = [file.resolve() for file in args.files] or [CW_DIR]
+        roots = sorted({path if path.is_dir() else path.parent for path in paths})
+        files = None
+        if not all(path.is_dir() for path in paths):
+            files = set(path for path in paths if not path.is_dir())
+        watch.watch(args, roots, files=files, poll=args.watch_poll)
+        ret = True
+    elif args.stdin:
+        ret = process_stdin(args, args.stdin_path.resolve())
+    elif args.files_from:
+        from license_tools import pipeline  # pylint: disable=import-outside-toplevel
+        separator = b'\0' if args.null else b'\n'
+        if str(args.files_from) == '-':
+            ret = handle_files(args, (pathlib.Path(path).resolve()
+                                      for path in pipeline.read_paths(sys.stdin.buffer, separator)))
+        else:
+            with open(args.files_from, 'rb') as stream:
+                ret = handle_files(args, (pathlib.Path(path).resolve()
+                                          for path in pipeline.read_paths(stream, separator)))
+    elif args.files:
         ret = handle_files(args, [file.resolve() for file in args.files])
     else:
         ret = handle_files(args, CW_DIR.glob('*'))
+    if args.summary is not None:
+        log_stats(args.summary)
     if not ret:
         sys.exit(1)
 
 
+def log_stats(summary: Counter):
+    """Logs how many files got processed and skipped by outcome"""
+    processed = ', '.join(f'{summary[outcome]} {outcome}' for outcome in ('changed', 'unchanged', 'failed'))
+    skipped = ', '.join(f'{count} {reason}' for reason, count in sorted(summary.items())
+                        if reason not in ('changed', 'unchanged', 'failed'))
+    logging.info(f"Processed {sum(summary.values())} files: {processed}, skipped: {skipped or 'none'}")
+
+
 def handle_files(args, candidates):
-    """Processes a given set of candidates resolving dirs on the way"""
-    success = True
-    for candidate in candidates:
-        if candidate.name == '.git':
-            continue
-        if candidate.is_dir():
-            success = handle_files(args, candidate.rglob('*')) and success
-        else:
-            success = process_file(copy(args), candidate) and success
-    return success
+    """
+    Processes a given set of candidates resolving dirs on the way
+
+    Walking the tree, matching the configs and reading files ahead runs in
+    background threads while the batch before is processed, see pipeline.py.
+    """
+    from license_tools import pipeline  # pylint: disable=import-outside-toplevel
+    return pipeline.handle_files(args, candidates)
 
 
-@functools.lru_cache(maxsize=256, typed=True)
 def discover_config(level: pathlib.Path) -> pathlib.Path:
     """
     Searches the given level and any directories
     above for a LICENSE_JSON configuration file
     """
-    config = None
-    while config is None and level.parent != level:
-        candidate = level / LICENSE_JSON
-        if candidate.exists():
-            config = candidate
-        else:
-            level = level.parent
-    return config
+    from license_tools import pipeline  # pylint: disable=import-outside-toplevel
+    return pipeline.CONFIG_INDEX.lookup(level)
 
 
-@functools.lru_cache(maxsize=256, typed=True)
+@functools.lru_cache(maxsize=None, typed=True)
 def parse_config(config: pathlib.Path) -> dict:
     """
     Tries to parse the given config
@@ -914,12 +1764,88 @@ def parse_config(config: pathlib.Path) -> dict:
             sys.exit(2)
 
 
-def process_file(args, file) -> bool:
+def reload_configs():
+    """Drops all cached configs and tools so that changes get picked up"""
+    from license_tools import pipeline  # pylint: disable=import-outside-toplevel
+    pipeline.CONFIG_INDEX.clear()
+    parse_config.cache_clear()
+    load_filter.cache_clear()
+    load_tool.cache_clear()
+
+
+def process_file(args, file, configured=False) -> bool:
     """
     Processes a single file honoring the discovered config
 
     Will return true on success, false on failure.
     If the file does not match the config this is considered success.
+
+    :configured: The result of configure_tool() for the file if invoked before
+    """
+    if configured is False:
+        configured = configure_tool(copy(args), file)
+    if configured is None:
+        return True
+    file_rel, tool, options = configured
+
+    logging.debug(f"Processing '{file_rel}'")
+    try:
+        if tool.bump_inplace(file, simulate=args.dry_run, stats=args.summary, **options):
+            return True
+    except UnicodeDecodeError as error:
+        logging.warning(f"Failed to decode {file_rel}: {error}")
+    if args.summary is not None:
+        args.summary['failed'] += 1
+    return False
+
+
+def process_stdin(args, file) -> bool:
+    """
+    Bumps the contents from stdin as if they were stored at file and writes the result to stdout
+
+    Will return true on success, false on failure. Contents not matching
+    the config, without any config or failing to bump get passed through unmodified.
+    """
+    contents = sys.stdin.buffer.read()
+    output = contents
+    success = True
+    if args.config is None:
+        args.config = discover_config(file.parent)
+    if args.config is None:
+        # editors piping their buffers expect to get them back in any case
+        logging.warning(f"Failed to discover a configuration for {file}, passing contents through")
+        configured = None
+    else:
+        try:
+            configured = configure_tool(args, file)
+        except SystemExit:
+            # errors in the config got logged already
+            configured = None
+            success = False
+    if configured is not None:
+        file_rel, tool, options = configured
+        logging.debug(f"Processing '{file_rel}' from stdin")
+        try:
+            result = tool.bump_contents(contents, file, **options)
+            if result.content is None:
+                success = False
+            else:
+                output = result.content
+        except UnicodeDecodeError as error:
+            logging.warning(f"Failed to decode {file_rel}: {error}")
+            success = False
+    sys.stdout.buffer.write(output)
+    sys.stdout.buffer.flush()
+    return success
+
+
+def configure_tool(args, file):
+    """
+    Creates the tool to process a single file honoring the discovered config
+
+    Returns None if the file does not match the config or a tuple of
+    the file path relative to the config, the tool and the options to
+    be passed when bumping the file.
     """
     if args.config is None:
         args.config = discover_config(file.parent)
@@ -935,14 +1861,37 @@ def process_file(args, file) -> bool:
         logging.fatal(f"Failed to discover a configuration for {file}")
         sys.exit(2)
 
-    config_dir = args.config.parent
-    config = parse_config(args.config)
+    file_rel = file.relative_to(args.config.parent).as_posix()
+    if not load_filter(args.config).matches(file_rel):
+        if args.summary is not None:
+            args.summary['excluded'] += 1
+        return None
 
-    file_rel = file.relative_to(config_dir).as_posix()
-    includes = config.get('include', ['**/*'])
-    excludes = config.get('exclude', ['^\\.[^/]+', '/\\.[^/]+'])
-    if not FileFilter.is_included(file_rel, includes, excludes):
-        return True
+    tool, options = load_tool(args.config, args.force_license)
+    return file_rel, tool, options
+
+
+@functools.lru_cache(maxsize=256, typed=True)
+def load_filter(config_path: pathlib.Path) -> FileFilter:
+    """
+    Creates the filter matching the files covered by the given config
+
+    The filter is cached and shared by all files using the same config.
+    """
+    config = parse_config(config_path)
+    return FileFilter(config.get('include', ['**/*']), config.get('exclude', ['^\\.[^/]+', '/\\.[^/]+']))
+
+
+@functools.lru_cache(maxsize=256, typed=True)
+def load_tool(config_path: pathlib.Path, force_license: bool = False):
+    """
+    Creates the tool and bump options as configured by the given config
+
+    The tool is cached and shared by all files using the same config.
+    Returns a tuple of the tool and the options to be passed when bumping.
+    """
+    config_dir = config_path.parent
+    config = parse_config(config_path)
 
     if 'custom_license' in config:
         license = License(custom=config['custom_license'])
@@ -968,11 +1917,6 @@ def process_file(args, file) -> bool:
             logging.fatal(f"Invalid title '{title}' - supported titles are {valid}")
             sys.exit(2)
 
-    if 'style_override_for_suffix' in config:
-        Style.set_overrides(config['style_override_for_suffix'])
-    else:
-        Style.set_overrides(None)
-
     config_author = config.get('author', {})
     author = None
     if 'from_git' in config_author:
@@ -1015,6 +1959,20 @@ def process_file(args, file) -> bool:
         else:
             author.year_from = year_from
             author.year_to = year_to
+    if config_author.get('from_history', False):
+        if not author.git_repo:
+            logging.fatal("Please enable 'from_git' when using 'from_history'")
+            sys.exit(2)
+        author.git_repo.enable_history()
+    if 'blame_threshold' in config_author:
+        threshold = config_author['blame_threshold']
+        if not author.git_repo:
+            logging.fatal("Please enable 'from_git' when using 'blame_threshold'")
+            sys.exit(2)
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold <= 100:
+            logging.fatal(f"Please provide the 'blame_threshold' attribute as percentage: {threshold}")
+            sys.exit(2)
+        author.git_repo.enable_blame(threshold)
     aliases = config_author.get('aliases', {})
 
     try:
@@ -1024,15 +1982,17 @@ def process_file(args, file) -> bool:
         sys.exit(2)
 
     company = config_author.get('company', None)
-    tool = Tool(license, author, company, aliases, lines_after_license)
-    keep_license = not args.force_license and not config.get('force_license', False)
-    keep_authors = not config.get('force_author', False)
-    latest_year_only = config_author.get('latest_year_only', False)
-
-    logging.debug(f"Processing '{file_rel}'")
-    try:
-        if tool.bump_inplace(file, keep_license=keep_license, keep_authors=keep_authors, latest_year_only=latest_year_only, title=title, simulate=args.dry_run):
-            return True
-    except UnicodeDecodeError as error:
-        logging.warning(f"Failed to decode {file_rel}: {error}")
-    return False
+    style_overrides = config.get('style_override_for_suffix', None)
+    generated_markers = config.get('generated_markers', [])
+    if not isinstance(generated_markers, list) or not all(isinstance(marker, str) for marker in generated_markers):
+        logging.fatal(f"Please provide the 'generated_markers' attribute as list of strings: {generated_markers}")
+        sys.exit(2)
+    tool = Tool(license, author, company, aliases, lines_after_license, style_overrides=style_overrides,
+                generated_markers=generated_markers)
+    options = {
+        'keep_license': not force_license and not config.get('force_license', False),
+        'keep_authors': not config.get('force_author', False),
+        'latest_year_only': config_author.get('latest_year_only', False),
+        'title': title
+    }
+    return tool, options
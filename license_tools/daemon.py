@@ -0,0 +1,409 @@
+# daemon.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Warm daemon for the --daemon option
+
+Keeps an interpreter with all modules imported and templates compiled
+running in the background. Requests get served one after another within
+the daemon process, reusing parsed configs, tools and git state until the
+files they were loaded from change.
+
+See README.md for detail and documentation
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import license_tools  # pylint: disable=cyclic-import
+from license_tools import pipeline
+
+# time in seconds without any request after which the daemon exits
+IDLE_TIMEOUT = 300
+# time in seconds to wait for an auto started daemon to become available
+STARTUP_TIMEOUT = 5
+# env variables read by the tool or the git processes it runs, the only ones passed to the daemon
+FORWARDED_ENV = ('PATH', 'HOME', 'XDG_CONFIG_HOME', 'LANG', 'LANGUAGE', 'LC_ALL', 'LC_CTYPE', 'TZ')
+FORWARDED_ENV_PREFIXES = ('GIT_', 'LICTOOLS_')
+
+
+def socket_path() -> pathlib.Path:
+    """
+    Returns the path of the socket to connect to
+
+    The path is unique per user, interpreter and version of the package as
+    determined by Tool.version() so that changes to any of its sources will
+    not hand work to a daemon running outdated code.
+    Override using the LICTOOLS_DAEMON_SOCKET env variable.
+    """
+    override = os.getenv('LICTOOLS_DAEMON_SOCKET', None)
+    if override:
+        return pathlib.Path(override)
+    installation = f'{sys.executable}:{license_tools.BASE_DIR}:{license_tools.Tool.version()}'
+    version = hashlib.sha1(installation.encode('utf-8'))  # nosec - not used for security
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR', None)
+    if runtime_dir:
+        runtime_dir = pathlib.Path(runtime_dir)
+    else:
+        runtime_dir = _private_dir(pathlib.Path(tempfile.gettempdir()) / f'lictool-{os.getuid()}')
+    return runtime_dir / f'lictool-{os.getuid()}-{version.hexdigest()[:12]}.sock'
+
+
+def _private_dir(path: pathlib.Path) -> pathlib.Path:
+    """
+    Creates a directory only accessible by the current user if not existing
+
+    :throws OSError: When the directory exists but is accessible by others
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"Refusing to use '{path}', it is not a directory private to the current user")
+    return path
+
+
+def _peer_uid(sock: socket.socket) -> int:
+    """Returns the uid of the process at the other end of a unix socket or None if not supported"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    return struct.unpack('3i', credentials)[1]
+
+
+def _forwarded_env(environ) -> dict:
+    """Returns the env variables to be passed to the daemon"""
+    return {name: value for name, value in environ.items()
+            if name in FORWARDED_ENV or name.startswith(FORWARDED_ENV_PREFIXES)}
+
+
+def _connect(path: pathlib.Path) -> socket.socket:
+    """Connects to the daemon at path or returns None if it is not running or not owned by the current user"""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return None
+    if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+        logging.warning(f"Refusing to connect to '{path}', it is not a socket owned by the current user")
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+    except OSError:
+        client.close()
+        return None
+    if _peer_uid(client) not in (None, os.getuid()):
+        logging.warning(f"Refusing to connect to '{path}', it is served by another user")
+        client.close()
+        return None
+    return client
+
+
+def _spawn(path: pathlib.Path):
+    """Starts a daemon listening on path in the background"""
+    env = dict(os.environ)
+    package_dir = str(license_tools.BASE_DIR.parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_dir, env.get('PYTHONPATH', None)]))
+    subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, '-m', 'license_tools.daemon', '--socket', str(path)],
+        cwd='/', env=env, start_new_session=True,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def forward(argv, cwd: pathlib.Path) -> int:
+    """
+    Hands the given commandline to the daemon, starting it if needed
+
+    Output of the daemon is written to stderr as it arrives.
+
+    :argv: The commandline arguments to be processed
+    :cwd: The working directory to process the commandline in
+    returns the exit code or None if the daemon was not available
+    """
+    try:
+        path = socket_path()
+    except OSError as error:
+        logging.warning(f"Failed to determine the daemon socket: {error}")
+        return None
+    client = _connect(path)
+    if client is None:
+        logging.debug(f"Starting daemon on '{path}'")
+        _spawn(path)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while client is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+            client = _connect(path)
+        if client is None:
+            return None
+    with client, client.makefile('rwb') as stream:
+        request = {'argv': list(argv), 'cwd': str(cwd), 'env': _forwarded_env(os.environ)}
+        stream.write(json.dumps(request).encode('utf-8') + b'\n')
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if 'stderr' in message:
+                sys.stderr.write(message['stderr'])
+                sys.stderr.flush()
+            if 'exit' in message:
+                return message['exit']
+    # the connection got closed without an exit code
+    return None
+
+
+def _exit_code(error: SystemExit, stream) -> int:
+    """Returns the exit code for error the same way the interpreter does, writing any message to stream"""
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    stream.write(f'{error.code}\n')
+    return 1
+
+
+class _MessageStream:
+    """File like object forwarding writes as messages to the client"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str) -> int:
+        """Sends the given text to be written to stderr by the client"""
+        self.send({'stderr': text})
+        return len(text)
+
+    def flush(self):
+        """Flushes any pending messages"""
+        self.wfile.flush()
+
+    def send(self, message: dict):
+        """Sends an arbitrary message to the client"""
+        self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+def _stat_key(path: pathlib.Path):
+    """Returns a key changing whenever the file at path changes or None if it is missing"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_ctime_ns, info.st_size, info.st_ino
+
+
+def _git_configs(config_dirs) -> set:
+    """Returns the git configs the author of the configs in the given directories may be taken from"""
+    paths = {pathlib.Path('/etc/gitconfig')}
+    override = os.getenv('GIT_CONFIG_GLOBAL', None)
+    if override:
+        paths.add(pathlib.Path(override))
+    home = os.getenv('HOME', None)
+    if home:
+        paths.add(pathlib.Path(os.getenv('XDG_CONFIG_HOME', None) or os.path.join(home, '.config')) / 'git' / 'config')
+        paths.add(pathlib.Path(home) / '.gitconfig')
+    for config_dir in config_dirs:
+        try:
+            paths.add(license_tools.GitRepo.find_git_root(config_dir) / '.git' / 'config')
+        except subprocess.CalledProcessError:
+            pass
+    return paths
+
+
+class _WarmState:
+    """
+    Decides whether the state kept warm by the daemon can serve a request
+
+    Parsed configs, tools and git repositories get reused by subsequent requests
+    as long as the working directory, the forwarded env variables and the files
+    they were loaded from are unchanged. Otherwise all of them get dropped and
+    are loaded again.
+    """
+
+    def __init__(self):
+        # cached lookups may be keyed on paths relative to the working directory
+        self.request = None
+        # maps the files the state was loaded from to their _stat_key()
+        self.files = {}
+
+    def refresh(self, cwd: str, env: dict):
+        """Drops the state if it is outdated for a request from cwd with the given env"""
+        if (cwd, env) != self.request or any(_stat_key(path) != key for path, key in self.files.items()):
+            logging.debug("Loading configs and git state again")
+            license_tools.reload_configs()
+            license_tools.GitRepo.find_git_root.cache_clear()
+            license_tools.GitRepo.author_name_from_config.cache_clear()
+            license_tools.DateUtils._current_year = None  # pylint: disable=protected-access
+            self.request = (cwd, dict(env))
+            self.files = {}
+        # directories may have gained or lost a config in the meantime
+        pipeline.CONFIG_INDEX.clear()
+
+    def track(self, args):
+        """Remembers the files the state loaded while processing args depends on"""
+        configs = {config.absolute() for config in pipeline.CONFIG_INDEX.configs.values() if config}
+        if args.config:
+            configs.add(args.config.absolute())
+        for path in configs | _git_configs({config.parent for config in configs}):
+            if path not in self.files:
+                self.files[path] = _stat_key(path)
+
+    def invalidate(self):
+        """Drops the state before the next request, e.g. after a request failed halfway"""
+        self.request = None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Processes a single forwarded commandline within the daemon process"""
+
+    def handle(self):
+        stream = _MessageStream(self.wfile)
+        state = self.server.state
+        code = 1
+        saved_cwd = os.getcwd()
+        saved_env = dict(os.environ)
+        try:
+            request = json.loads(self.rfile.readline())
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            license_tools.CW_DIR = pathlib.Path(request['cwd'])
+            sys.stderr = stream
+            state.refresh(request['cwd'], request['env'])
+            args = license_tools.create_parser().parse_args(request['argv'])
+            license_tools.setup_logging(args.verbose, stream=stream)
+            try:
+                license_tools.run(args)
+                code = 0
+            finally:
+                state.track(args)
+        except SystemExit as error:
+            code = _exit_code(error, stream)
+        except Exception:  # pylint: disable=broad-except
+            stream.write(traceback.format_exc())
+        finally:
+            os.chdir(saved_cwd)
+            os.environ.clear()
+            os.environ.update(saved_env)
+            sys.stderr = sys.__stderr__
+            license_tools.setup_logging(False)
+        if code != 0:
+            # batches might have been left halfway
+            state.invalidate()
+        stream.send({'exit': code})
+
+
+class _Server(socketserver.UnixStreamServer):
+    """Serves requests one after another from the state kept warm between them"""
+
+    # invocations started at once by pre-commit queue up until served
+    request_queue_size = 64
+
+    def __init__(self, path: pathlib.Path):
+        super().__init__(str(path), _RequestHandler)
+        os.chmod(path, 0o600)
+        self.state = _WarmState()
+        self.last_activity = time.monotonic()
+
+    def verify_request(self, request, client_address) -> bool:
+        if _peer_uid(request) not in (None, os.getuid()):
+            logging.warning("Rejecting a request from another user")
+            return False
+        return True
+
+    def process_request(self, request, client_address):
+        super().process_request(request, client_address)
+        self.last_activity = time.monotonic()
+
+    def is_idle(self, timeout: float) -> bool:
+        """Returns true when no request was received for the given time in seconds"""
+        return time.monotonic() - self.last_activity > timeout
+
+
+def _warmup():
+    """Imports and compiles everything needed to process a request"""
+    env = license_tools.Header.environment()
+    env.get_template('Header.j2')
+    for license_file in license_tools.LICENSES.values():
+        env.get_template(license_file.name)
+    # trying all styles on an unknown file will compile all patterns
+    license_tools.ParsedHeader(file=pathlib.PurePath('warmup'), contents='warmup')
+
+
+def serve(path: pathlib.Path, idle_timeout: float = IDLE_TIMEOUT):
+    """
+    Runs a daemon listening on path until it has been idle for idle_timeout seconds
+
+    Will return immediately if another daemon is listening on path already.
+    """
+    with open(str(path) + '.lock', 'w', encoding='utf-8') as lock:
+        # serialize startup and shutdown to cleanly replace stale sockets of crashed daemons
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        running = _connect(path)
+        if running is not None:
+            running.close()
+            logging.info(f"Daemon is already listening on '{path}'")
+            return
+        path.unlink(missing_ok=True)
+        _warmup()
+        server = _Server(path)
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        logging.info(f"Daemon listening on '{path}'")
+        try:
+            server.timeout = min(1.0, idle_timeout)
+            while not server.is_idle(idle_timeout):
+                server.handle_request()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path.unlink(missing_ok=True)
+            server.server_close()
+            logging.info("Daemon exiting after being idle")
+
+
+def main():
+    """Entry point used when the daemon gets started"""
+    parser = argparse.ArgumentParser(
+        prog='license_tools.daemon',
+        description='Warm daemon processing commandlines forwarded by lictool --daemon.')
+    parser.add_argument('--socket', help='The socket to listen on',
+                        type=pathlib.Path, default=None)
+    parser.add_argument('--idle-timeout', help='Exit after being idle for the given seconds.'
+                        ' Defaults to the LICTOOLS_DAEMON_IDLE_TIMEOUT env variable if set',
+                        type=float, default=float(os.getenv('LICTOOLS_DAEMON_IDLE_TIMEOUT', str(IDLE_TIMEOUT))))
+    args = parser.parse_args()
+    license_tools.setup_logging(False)
+    serve(args.socket or socket_path(), args.idle_timeout)
+
+
+if __name__ == '__main__':
+    main()
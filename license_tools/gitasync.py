@@ -0,0 +1,178 @@
+# gitasync.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Concurrent git queries used to prefetch the state of many files at once
+
+Git gets executed directly without a shell, the number of concurrently
+running processes is bounded by a semaphore and identical queries which
+are still running get combined into a single process.
+
+See README.md for detail and documentation
+"""
+
+import asyncio
+import logging
+import os
+import pathlib
+import subprocess
+
+# maximum number of paths passed to a single git invocation
+CHUNK_SIZE = 256
+
+
+def default_concurrency() -> int:
+    """Returns the number of git processes to run at once when not configured"""
+    return min(32, (os.cpu_count() or 1) * 2)
+
+
+class GitQueries:
+    """Runs git queries for a repository concurrently"""
+
+    def __init__(self, git_root: pathlib.Path, concurrency: int = None):
+        """
+        Creates a new query runner, must be created within a running event loop
+
+        :git_root: The root of the repository to run git in
+        :concurrency: The maximum number of git processes to run at once
+        """
+        self.git_root = git_root
+        self.semaphore = asyncio.Semaphore(concurrency or default_concurrency())
+        self.running = {}
+
+    async def _exec(self, args) -> str:
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                'git', *args, cwd=self.git_root, stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output, _ = await process.communicate()
+        output = output.decode('utf-8')
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, ['git'] + list(args), output)
+        return output
+
+    async def run(self, *args) -> str:
+        """
+        Runs git with the given arguments and returns its output
+
+        Identical queries issued while a previous one is still running
+        share the result of the running query.
+
+        :throws subprocess.CalledProcessError: When git failed
+        """
+        task = self.running.get(args, None)
+        if task is None:
+            task = asyncio.ensure_future(self._exec(args))
+            self.running[args] = task
+            task.add_done_callback(lambda _: self.running.pop(args, None))
+        return await asyncio.shield(task)
+
+    async def modified(self, files_rel) -> set:
+        """Returns the subset of the given relative paths with uncommitted changes"""
+        files_rel = sorted(set(files_rel))
+        chunks = [files_rel[i:i + CHUNK_SIZE] for i in range(0, len(files_rel), CHUNK_SIZE)]
+
+        async def query(chunk):
+            try:
+                output = await self.run('--literal-pathspecs', 'diff', '--name-only', '-z', '--no-renames',
+                                        'HEAD', '--', *[file_rel.as_posix() for file_rel in chunk])
+            except subprocess.CalledProcessError as error:
+                # e.g. when there is no HEAD yet, consider all files to be modified
+                logging.debug(f"Failed to query modified files: {error.output}")
+                return set(chunk)
+            return {pathlib.PurePath(entry) for entry in output.split('\0') if entry}
+
+        modified = set()
+        for result in await asyncio.gather(*[query(chunk) for chunk in chunks]):
+            modified.update(result)
+        return modified
+
+    async def last_author(self, file_rel: pathlib.PurePath, git_repo) -> tuple:
+        """Returns a pair of the relative path and the author who touched it last or None"""
+        from license_tools import GitRepo  # pylint: disable=import-outside-toplevel,cyclic-import
+        try:
+            output = await self.run(*GitRepo.history_args(file_rel))
+        except subprocess.CalledProcessError:
+            return file_rel, None
+        return file_rel, git_repo.author_from_log(file_rel, output)
+
+
+async def _prefetch(git_repo, files_rel, concurrency: int, history: bool):
+    queries = GitQueries(git_repo.git_root, concurrency)
+    # git only needs to be asked for files which cannot be checked in-process
+    known = {file_rel: git_repo.modified_from_disk(file_rel) for file_rel in files_rel}
+    unknown = [file_rel for file_rel, state in known.items() if state is None]
+    modified = {file_rel for file_rel, state in known.items() if state}
+    if unknown:
+        modified.update(await queries.modified(unknown))
+    # the history is only needed for files without pending changes
+    if history:
+        history = await asyncio.gather(*[queries.last_author(file_rel, git_repo)
+                                         for file_rel in files_rel if file_rel not in modified])
+    return {file_rel: file_rel in modified for file_rel in files_rel}, dict(history or [])
+
+
+def prefetch(git_repo, filenames, concurrency: int = None):
+    """
+    Queries which files are modified and who touched them last
+
+    :git_repo: The GitRepo the files belong to
+    :filenames: The absolute paths of the files to be queried
+    :concurrency: The maximum number of git processes to run at once
+    returns a pair of dicts mapping relative paths to their modified state
+            and to the author who touched them last
+    """
+    files_rel = []
+    for filename in filenames:
+        try:
+            files_rel.append(pathlib.PurePath(filename).relative_to(git_repo.git_root))
+        except ValueError:
+            pass
+    if not files_rel:
+        return {}, {}
+    # the index of the full history makes querying the latest authors obsolete
+    history = git_repo.history_index() is None
+    return asyncio.run(_prefetch(git_repo, files_rel, concurrency, history))
+
+
+async def _blame(git_root: pathlib.Path, files_rel, concurrency: int):
+    from license_tools import gitblame  # pylint: disable=import-outside-toplevel
+    queries = GitQueries(git_root, concurrency)
+
+    async def query(file_rel):
+        try:
+            return file_rel, await queries.run(*gitblame.blame_args(file_rel.as_posix()))
+        except subprocess.CalledProcessError as error:
+            logging.debug(f"Failed to blame {file_rel}: {error.output}")
+            return file_rel, None
+    return dict(await asyncio.gather(*[query(file_rel) for file_rel in files_rel]))
+
+
+def blame(git_root: pathlib.Path, files_rel, concurrency: int = None) -> dict:
+    """
+    Blames the given files concurrently
+
+    :git_root: The root of the repository the files belong to
+    :files_rel: The paths of the files relative to git_root
+    :concurrency: The maximum number of git processes to run at once
+    returns a dict mapping relative paths to the porcelain output or None on failure
+    """
+    if not files_rel:
+        return {}
+    return asyncio.run(_blame(git_root, files_rel, concurrency))
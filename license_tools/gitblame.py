@@ -0,0 +1,131 @@
+# gitblame.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Line ownership of files as determined by 'git blame'
+
+Blaming is expensive, results are stored within the git dir keyed by
+the blob the file has in HEAD so that files only get blamed again once
+their contents got changed.
+
+See README.md for detail and documentation
+"""
+
+import datetime
+import pathlib
+
+from license_tools.githistory import load_stored, store_atomically
+
+# bump when changing the layout of the stored cache
+VERSION = 1
+CACHE_FILE = 'lictool-blame.json'
+
+
+def blame_args(file_rel: str):
+    """Returns the arguments to git to blame the version of a file in HEAD"""
+    return ['--literal-pathspecs', 'blame', '--porcelain', 'HEAD', '--', file_rel]
+
+
+def _year(timestamp: str, timezone: str) -> int:
+    offset = datetime.timedelta(hours=int(timezone[1:3]), minutes=int(timezone[3:5]))
+    if timezone.startswith('-'):
+        offset = -offset
+    return datetime.datetime.fromtimestamp(int(timestamp), datetime.timezone(offset)).year
+
+
+def parse_porcelain(output: str) -> dict:
+    """
+    Parses the output of 'git blame --porcelain'
+
+    returns a dict mapping each author to a triple of the number of lines
+            owned and the first and last year any of these lines got written
+    """
+    commits = {}
+    lines = {}
+    commit = None
+    for line in output.split('\n'):
+        if line.startswith('\t'):
+            # the content of a line attributed to the commit in the preceding header
+            author, year = commits[commit]
+            owned = lines.setdefault(author, [0, year, year])
+            owned[0] += 1
+            owned[1] = min(owned[1], year)
+            owned[2] = max(owned[2], year)
+            continue
+        key, _, value = line.partition(' ')
+        if len(key) == 40 and commit != key:
+            commit = key
+            commits.setdefault(commit, [None, None])
+        elif key == 'author':
+            commits[commit][0] = value
+        elif key == 'author-time':
+            commits[commit][1] = value
+        elif key == 'author-tz':
+            commits[commit][1] = _year(commits[commit][1], value)
+    return {author: tuple(owned) for author, owned in lines.items()}
+
+
+def owners(blamed: dict, threshold: float) -> dict:
+    """
+    Filters the result of parse_porcelain() by share of lines owned
+
+    :blamed: The authors and their lines as returned by parse_porcelain()
+    :threshold: The minimum percentage of lines an author needs to own
+    returns a dict mapping authors to the pair of their first and last year
+    """
+    total = sum(lines for lines, _, _ in blamed.values())
+    return {author: (year_from, year_to) for author, (lines, year_from, year_to) in blamed.items()
+            if total and lines * 100 >= threshold * total}
+
+
+class BlameCache:
+    """The results of blaming files, keyed by path and blob"""
+
+    def __init__(self, git_dir: pathlib.Path):
+        """
+        Creates a cache, loading any results stored before
+
+        :git_dir: The directory to store the cache in
+        """
+        self.path = git_dir / CACHE_FILE
+        # relative posix path -> [blob sha, result of parse_porcelain()]
+        self.files = {}
+        self.dirty = False
+        stored = load_stored(self.path, VERSION)
+        if stored is not None:
+            self.files = stored['files']
+
+    def get(self, file_rel: str, blob: str) -> dict:
+        """Returns the cached result for the given version of a file or None"""
+        entry = self.files.get(file_rel, None)
+        if entry is None or entry[0] != blob:
+            return None
+        return {author: tuple(owned) for author, owned in entry[1].items()}
+
+    def put(self, file_rel: str, blob: str, blamed: dict):
+        """Caches the result of blaming the given version of a file, replacing older versions"""
+        self.files[file_rel] = [blob, blamed]
+        self.dirty = True
+
+    def store(self):
+        """Writes the cache back to disk if anything changed"""
+        if not self.dirty:
+            return
+        if store_atomically(self.path, VERSION, {'files': self.files}):
+            self.dirty = False
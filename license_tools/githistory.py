@@ -0,0 +1,225 @@
+# githistory.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Index of all contributors to the files of a repository
+
+Built from a single streamed pass over 'git log --numstat' and stored
+within the git dir along with the commit it was built for. Subsequent
+runs only scan the commits added since, a full rebuild happens only
+when the history got rewritten. Renames are detected while scanning
+so that the history of a file before being moved is kept with it.
+
+See README.md for detail and documentation
+"""
+
+import json
+import logging
+import os
+import pathlib
+import subprocess
+import tempfile
+
+# bump when changing the layout of the stored index
+VERSION = 2
+INDEX_FILE = 'lictool-history.json'
+_COMMIT_MARKER = '\x01'
+
+
+def parse_log(stream, chunk_size: int = 64 * 1024):
+    """
+    Parses the output of 'git log -z --numstat' using the format of log_args()
+
+    :stream: Binary stream to read the output from
+    returns an iterator of triples of author, year and list of touched files,
+            each file is a triple of its path, the path it was renamed from or
+            None and whether its contents changed
+    """
+    commit = None
+    files = []
+    rename = None
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        records = (pending + chunk).split(b'\0')
+        pending = records.pop() if chunk else b''
+        for record in records:
+            record = record.decode('utf-8', 'surrogateescape')
+            if rename is not None:
+                # renames list the source and the destination as separate records
+                rename.append(record)
+                if len(rename) == 3:
+                    files.append((rename[2], rename[1], rename[0]))
+                    rename = None
+                continue
+            record = record.lstrip('\n')
+            if record.startswith(_COMMIT_MARKER):
+                if commit is not None:
+                    yield commit + (files,)
+                author, _, year = record[len(_COMMIT_MARKER):].rpartition('\t')
+                commit = (author, int(year))
+                files = []
+            elif record and commit is not None:
+                # added and deleted lines followed by the path
+                added, deleted, path = record.split('\t', 2)
+                changed = (added, deleted) != ('0', '0')
+                if path:
+                    files.append((path, None, changed))
+                else:
+                    rename = [changed]
+        if not chunk:
+            break
+    if commit is not None:
+        yield commit + (files,)
+
+
+def log_args(revisions: str):
+    """Returns the arguments to git to list the files touched by each commit in revisions"""
+    return ['log', '-z', '--numstat', '--find-renames', f'--format={_COMMIT_MARKER}%an\t%ad',
+            '--date=format:%Y', revisions, '--']
+
+
+def load_stored(path: pathlib.Path, version: int) -> dict:
+    """Loads data written by store_atomically() or returns None if missing or of another version"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file_obj:
+            stored = json.load(file_obj)
+    except (OSError, ValueError):
+        return None
+    if stored.get('version', None) != version:
+        return None
+    return stored
+
+
+def store_atomically(path: pathlib.Path, version: int, data: dict) -> bool:
+    """Stores data as json replacing path atomically as concurrent runs might be reading it"""
+    handle, temp = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as file_obj:
+            json.dump(dict(data, version=version), file_obj)
+        os.replace(temp, path)
+    except OSError as error:
+        logging.warning(f"Failed to store {path}: {error}")
+        os.unlink(temp)
+        return False
+    return True
+
+
+class HistoryIndex:
+    """The contributors of all files in a repository"""
+
+    def __init__(self, git_root: pathlib.Path, git_dir: pathlib.Path):
+        """
+        Creates an empty index, use update() to load it
+
+        :git_root: The root of the worktree
+        :git_dir: The directory to store the index in
+        """
+        self.git_root = git_root
+        self.path = git_dir / INDEX_FILE
+        self.head = None
+        # relative posix path -> [latest author, latest year, {author: [year_from, year_to]}]
+        self.files = {}
+
+    def _git(self, *args) -> str:
+        return subprocess.check_output(['git'] + list(args), cwd=self.git_root, stderr=subprocess.DEVNULL,
+                                       encoding='utf-8').strip()
+
+    def _load(self):
+        stored = load_stored(self.path, VERSION)
+        if stored is not None:
+            self.head = stored['head']
+            self.files = stored['files']
+
+    def _store(self):
+        store_atomically(self.path, VERSION, {'head': self.head, 'files': self.files})
+
+    def _merge(self, file: str, older: list):
+        """Merges the entry of a file with an entry holding older history"""
+        entry = self.files.get(file, None)
+        if entry is None:
+            self.files[file] = older
+            return
+        for author, (year_from, year_to) in older[2].items():
+            years = entry[2].setdefault(author, [year_from, year_to])
+            years[0] = min(years[0], year_from)
+            years[1] = max(years[1], year_to)
+
+    def _scan(self, revisions: str):
+        stored = self.files
+        self.files = {}
+        # maps paths before a rename to the path at the end of revisions
+        renamed = {}
+        with subprocess.Popen(['git'] + log_args(revisions), cwd=self.git_root,
+                              stdin=subprocess.DEVNULL, stdout=subprocess.PIPE) as process:
+            # commits get listed newest first
+            for author, year, files in parse_log(process.stdout):
+                for file, source, changed in files:
+                    file = renamed.get(file, file)
+                    if source is not None:
+                        renamed[source] = file
+                    if not changed:
+                        # moving a file is no contribution to its contents
+                        continue
+                    self._merge(file, [author, year, {author: [year, year]}])
+        if process.returncode != 0:
+            self.files = stored
+            raise subprocess.CalledProcessError(process.returncode, log_args(revisions))
+        # anything indexed before predates the scanned commits and any renames within
+        for file, older in stored.items():
+            self._merge(renamed.get(file, file), older)
+
+    def update(self, head: str):
+        """
+        Loads the stored index and scans any commits added up to head
+
+        :head: The sha of the commit the index should reflect
+        :throws subprocess.CalledProcessError: When git failed
+        """
+        if self.head is None:
+            self._load()
+        if self.head == head:
+            return
+        if self.head is not None:
+            try:
+                self._git('merge-base', '--is-ancestor', self.head, head)
+                logging.debug(f"Updating the history index from {self.head} to {head}")
+                self._scan(f'{self.head}..{head}')
+            except subprocess.CalledProcessError:
+                self.head = None
+        if self.head is None:
+            logging.debug(f"Building the history index for {head}")
+            self.files = {}
+            self._scan(head)
+        self.head = head
+        self._store()
+
+    def latest(self, file_rel: str):
+        """Returns a pair of the author who touched the file last and the year or None"""
+        entry = self.files.get(file_rel, None)
+        if entry is None:
+            return None
+        return entry[0], entry[1]
+
+    def contributors(self, file_rel: str) -> dict:
+        """Returns all authors who touched the file mapped to the pair of first and last year"""
+        entry = self.files.get(file_rel, None)
+        if entry is None:
+            return {}
+        return {author: tuple(years) for author, years in entry[2].items()}
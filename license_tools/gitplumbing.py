@@ -0,0 +1,666 @@
+# gitplumbing.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process reader for the git data needed by GitRepo
+
+Reads the config, HEAD, the index and the object database directly
+from disk so that typical invocations do not need to spawn git at all.
+Any situation which is not fully supported raises Unsupported so that
+callers can fall back to the git CLI, e.g. config includes, split or
+sparse indexes, alternates, sha256 repositories or content filters.
+
+See README.md for detail and documentation
+"""
+
+import hashlib
+import mmap
+import os
+import pathlib
+import stat
+import struct
+import zlib
+
+# see gitformat-index(5)
+_INDEX_HEADER = struct.Struct('>4sII')
+_INDEX_ENTRY = struct.Struct('>10I20sH')
+_FLAG_ASSUME_VALID = 0x8000
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_FLAG_NAME_MASK = 0xfff
+_EXTENDED_SKIP_WORKTREE = 0x4000
+_EXTENDED_INTENT_TO_ADD = 0x2000
+# see gitformat-pack(5)
+_OBJ_COMMIT = 1
+_OBJ_TREE = 2
+_OBJ_BLOB = 3
+_OBJ_TAG = 4
+_OBJ_OFS_DELTA = 6
+_OBJ_REF_DELTA = 7
+_TYPE_NAMES = {_OBJ_COMMIT: b'commit', _OBJ_TREE: b'tree', _OBJ_BLOB: b'blob', _OBJ_TAG: b'tag'}
+_MODE_SYMLINK = 0o120000
+_MODE_GITLINK = 0o160000
+
+
+class Unsupported(Exception):
+    """Raised for anything not supported, use the git CLI instead"""
+
+
+# errors to fall back to the git CLI for, including malformed or concurrently changed files
+ERRORS = (Unsupported, OSError, ValueError, IndexError, struct.error, zlib.error)
+
+
+def enabled() -> bool:
+    """
+    Returns true if reading git data in-process is enabled
+
+    Opt in using LICTOOLS_GIT_PLUMBING=1, the git CLI gets used otherwise
+    """
+    return os.getenv('LICTOOLS_GIT_PLUMBING', '0') != '0'
+
+
+def _check_environment():
+    """Raises Unsupported when the environment changes how git discovers repositories or configs"""
+    for variable in ('GIT_DIR', 'GIT_WORK_TREE', 'GIT_COMMON_DIR', 'GIT_OBJECT_DIRECTORY',
+                     'GIT_ALTERNATE_OBJECT_DIRECTORIES', 'GIT_CONFIG', 'GIT_CONFIG_PARAMETERS',
+                     'GIT_CEILING_DIRECTORIES', 'GIT_DISCOVERY_ACROSS_FILESYSTEM'):
+        if os.getenv(variable, None):
+            raise Unsupported(f"{variable} is set")
+    if os.getenv('GIT_CONFIG_COUNT', '0') != '0':
+        raise Unsupported("GIT_CONFIG_COUNT is set")
+
+
+def _read_text(path: pathlib.Path) -> str:
+    with open(path, 'r', encoding='utf-8') as file_obj:
+        return file_obj.read()
+
+
+def find_worktree(cwd: pathlib.Path):
+    """
+    Finds the repository containing cwd
+
+    :cwd: The directory to start searching in
+    returns a pair of the worktree root and the git dir
+    """
+    _check_environment()
+    level = pathlib.Path(cwd).resolve()
+    while True:
+        dot_git = level / '.git'
+        if dot_git.is_dir():
+            return level, dot_git
+        if dot_git.is_file():
+            # worktrees and submodules point to their git dir
+            content = _read_text(dot_git).strip()
+            if not content.startswith('gitdir:'):
+                raise Unsupported(f"Unknown format of {dot_git}")
+            git_dir = pathlib.Path(content[len('gitdir:'):].strip())
+            return level, (level / git_dir).resolve()
+        if level.parent == level:
+            raise Unsupported(f"No repository found for {cwd}")
+        level = level.parent
+
+
+def _parse_config_value(line: str, pos: int) -> str:
+    """Parses a config value starting at pos honoring quotes, escapes and comments"""
+    value = ''
+    quoted = False
+    pending_space = ''
+    escapes = {'n': '\n', 't': '\t', 'b': '\b', '\\': '\\', '"': '"'}
+    while pos < len(line):
+        char = line[pos]
+        pos += 1
+        if char == '\\':
+            if pos >= len(line) or line[pos] not in escapes:
+                raise Unsupported(f"Unsupported escape in config: {line}")
+            value += pending_space + escapes[line[pos]]
+            pending_space = ''
+            pos += 1
+        elif char == '"':
+            value += pending_space
+            pending_space = ''
+            quoted = not quoted
+        elif char in ';#' and not quoted:
+            break
+        elif char.isspace() and not quoted:
+            if value:
+                pending_space += char
+        else:
+            value += pending_space + char
+            pending_space = ''
+    if quoted:
+        raise Unsupported(f"Unterminated quote in config: {line}")
+    return value
+
+
+def parse_config(text: str):
+    """
+    Parses the contents of a git config file
+
+    returns a list of triples of 'section.subsection', key and value
+    with section and key lowercased as git handles them case insensitive
+    """
+    entries = []
+    section = None
+    lines = text.splitlines()
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        # join continuation lines
+        while line.endswith('\\') and not line.endswith('\\\\') and index < len(lines):
+            line = line[:-1] + lines[index]
+            index += 1
+        stripped = line.strip()
+        if not stripped or stripped[0] in ';#':
+            continue
+        if stripped.startswith('['):
+            end = stripped.find(']')
+            if end < 0:
+                raise Unsupported(f"Invalid section in config: {line}")
+            header = stripped[1:end].strip()
+            if '"' in header:
+                name, _, subsection = header.partition(' ')
+                subsection = subsection.strip()
+                if not (subsection.startswith('"') and subsection.endswith('"')):
+                    raise Unsupported(f"Invalid subsection in config: {line}")
+                section = f"{name.lower()}.{subsection[1:-1].replace(chr(92) * 2, chr(92))}"
+            else:
+                name, dot, subsection = header.partition('.')
+                section = f"{name.lower()}.{subsection.lower()}" if dot else name.lower()
+            if section.split('.')[0] in ('include', 'includeif'):
+                raise Unsupported("Config includes are not supported")
+            stripped = stripped[end + 1:].strip()
+            if not stripped or stripped[0] in ';#':
+                continue
+        if section is None:
+            raise Unsupported(f"Config entry outside of a section: {line}")
+        key, equals, _ = stripped.partition('=')
+        key = key.strip().lower()
+        if equals:
+            value = _parse_config_value(stripped, stripped.index('=') + 1)
+        else:
+            # a key without value is a boolean true
+            value = 'true'
+        entries.append((section, key, value))
+    return entries
+
+
+def _global_configs():
+    """Returns the global config files in the order git reads them"""
+    override = os.getenv('GIT_CONFIG_GLOBAL', None)
+    if override is not None:
+        return [pathlib.Path(override)]
+    home = os.getenv('HOME', None)
+    if not home:
+        raise Unsupported("HOME is not set")
+    xdg_config = os.getenv('XDG_CONFIG_HOME', None) or os.path.join(home, '.config')
+    return [pathlib.Path(xdg_config) / 'git' / 'config', pathlib.Path(home) / '.gitconfig']
+
+
+def _varint(data, pos: int):
+    """Decodes an offset encoded varint as used by index v4 and OFS_DELTA"""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, pos
+
+
+def _size_varint(data, pos: int):
+    """Decodes a little endian base 128 size as used in delta headers"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Applies a git delta to the given base object"""
+    base_size, pos = _size_varint(delta, 0)
+    if base_size != len(base):
+        raise Unsupported("Delta does not match its base")
+    target_size, pos = _size_varint(delta, pos)
+    target = bytearray()
+    while pos < len(delta):
+        opcode = delta[pos]
+        pos += 1
+        if opcode & 0x80:
+            offset = 0
+            size = 0
+            for bit in range(4):
+                if opcode & (1 << bit):
+                    offset |= delta[pos] << (8 * bit)
+                    pos += 1
+            for bit in range(3):
+                if opcode & (0x10 << bit):
+                    size |= delta[pos] << (8 * bit)
+                    pos += 1
+            target += base[offset:offset + (size or 0x10000)]
+        elif opcode:
+            target += delta[pos:pos + opcode]
+            pos += opcode
+        else:
+            raise Unsupported("Invalid delta opcode")
+    if len(target) != target_size:
+        raise Unsupported("Delta produced unexpected size")
+    return bytes(target)
+
+
+class Pack:
+    """A pack file and its version 2 index"""
+
+    def __init__(self, idx_path: pathlib.Path):
+        with open(idx_path, 'rb') as idx_file:
+            self.idx = idx_file.read()
+        if self.idx[:8] != b'\377tOc\0\0\0\2':
+            raise Unsupported(f"Unsupported pack index {idx_path}")
+        self.fanout = struct.unpack_from('>256I', self.idx, 8)
+        self.count = self.fanout[255]
+        self.sha_offset = 8 + 256 * 4
+        self.offset_offset = self.sha_offset + self.count * 24
+        self.large_offset = self.offset_offset + self.count * 4
+        with open(idx_path.with_suffix('.pack'), 'rb') as pack_file:
+            self.data = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def find(self, sha: bytes) -> int:
+        """Returns the offset of the object in the pack or None"""
+        low = self.fanout[sha[0] - 1] if sha[0] else 0
+        high = self.fanout[sha[0]]
+        while low < high:
+            middle = (low + high) // 2
+            start = self.sha_offset + middle * 20
+            candidate = self.idx[start:start + 20]
+            if candidate < sha:
+                low = middle + 1
+            elif candidate > sha:
+                high = middle
+            else:
+                offset, = struct.unpack_from('>I', self.idx, self.offset_offset + middle * 4)
+                if offset & 0x80000000:
+                    offset, = struct.unpack_from('>Q', self.idx, self.large_offset + (offset & 0x7fffffff) * 8)
+                return offset
+        return None
+
+    def close(self):
+        """Unmaps the pack file"""
+        self.data.close()
+
+    def _inflate(self, pos: int, size: int) -> bytes:
+        decompressor = zlib.decompressobj()
+        output = bytearray()
+        while not decompressor.eof:
+            chunk = self.data[pos:pos + 4096]
+            if not chunk:
+                raise Unsupported("Truncated pack")
+            pos += len(chunk)
+            output.extend(decompressor.decompress(chunk))
+        if len(output) != size:
+            raise Unsupported("Corrupt pack entry")
+        return bytes(output)
+
+    def read(self, offset: int, store):
+        """Returns a pair of object type and content for the object at offset"""
+        byte = self.data[offset]
+        pos = offset + 1
+        obj_type = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        while byte & 0x80:
+            byte = self.data[pos]
+            pos += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+        if obj_type == _OBJ_OFS_DELTA:
+            distance, pos = _varint(self.data, pos)
+            base_type, base = self.read(offset - distance, store)
+            return base_type, apply_delta(base, self._inflate(pos, size))
+        if obj_type == _OBJ_REF_DELTA:
+            base_type, base = store.read(bytes(self.data[pos:pos + 20]))
+            return base_type, apply_delta(base, self._inflate(pos + 20, size))
+        if obj_type not in _TYPE_NAMES:
+            raise Unsupported(f"Unknown object type {obj_type}")
+        return obj_type, self._inflate(pos, size)
+
+
+class ObjectStore:
+    """Reads loose and packed objects"""
+
+    def __init__(self, objects_dir: pathlib.Path):
+        self.objects_dir = objects_dir
+        if (objects_dir / 'info' / 'alternates').exists():
+            raise Unsupported("Alternate object stores are not supported")
+        self.packs = None
+        self.trees = {}
+
+    def _load_packs(self):
+        self.packs = [Pack(idx) for idx in sorted((self.objects_dir / 'pack').glob('*.idx'))]
+
+    def close(self):
+        """Unmaps all pack files, they get mapped again when needed"""
+        for pack in self.packs or []:
+            pack.close()
+        self.packs = None
+
+    def read(self, sha: bytes):
+        """Returns a pair of object type and content for the given binary sha"""
+        loose = self.objects_dir / sha[:1].hex() / sha[1:].hex()
+        try:
+            with open(loose, 'rb') as loose_file:
+                raw = zlib.decompress(loose_file.read())
+        except FileNotFoundError:
+            raw = None
+        if raw is not None:
+            header, _, content = raw.partition(b'\0')
+            type_name, _, _ = header.partition(b' ')
+            for obj_type, name in _TYPE_NAMES.items():
+                if name == type_name:
+                    return obj_type, content
+            raise Unsupported(f"Unknown object type {type_name}")
+        for _ in range(2):
+            if self.packs is None:
+                self._load_packs()
+            for pack in self.packs:
+                offset = pack.find(sha)
+                if offset is not None:
+                    return pack.read(offset, self)
+            # packs may have changed due to a repack, retry once
+            self.close()
+        raise Unsupported(f"Object {sha.hex()} not found")
+
+    def tree(self, sha: bytes) -> dict:
+        """Returns the entries of a tree as dict of name to pair of mode and binary sha"""
+        entries = self.trees.get(sha, None)
+        if entries is None:
+            obj_type, content = self.read(sha)
+            if obj_type != _OBJ_TREE:
+                raise Unsupported(f"Object {sha.hex()} is not a tree")
+            entries = {}
+            pos = 0
+            while pos < len(content):
+                space = content.index(b' ', pos)
+                nul = content.index(b'\0', space)
+                mode = int(content[pos:space], 8)
+                entries[content[space + 1:nul]] = (mode, content[nul + 1:nul + 21])
+                pos = nul + 21
+            self.trees[sha] = entries
+        return entries
+
+
+class Repository:  # pylint: disable=too-many-instance-attributes
+    """Read only access to a repository with a worktree"""
+
+    def __init__(self, root: pathlib.Path, git_dir: pathlib.Path = None):
+        """
+        Opens the repository with the given worktree root
+
+        :root: The root of the worktree
+        :git_dir: The git dir of the repository, determined from root if omitted
+        :throws Unsupported: If the repository cannot be read in-process
+        """
+        _check_environment()
+        self.root = pathlib.Path(root)
+        if git_dir is None:
+            found, git_dir = find_worktree(self.root)
+            if found != self.root:
+                raise Unsupported(f"{root} is not the root of a worktree")
+        self.git_dir = git_dir
+        self.common_dir = git_dir
+        if (git_dir / 'commondir').exists():
+            self.common_dir = (git_dir / _read_text(git_dir / 'commondir').strip()).resolve()
+        self.config = self._read_local_config()
+        if self.config.get(('extensions', 'objectformat'), 'sha1').lower() != 'sha1':
+            raise Unsupported("Only sha1 repositories are supported")
+        if self.config.get(('extensions', 'refstorage'), 'files').lower() != 'files':
+            raise Unsupported("Only the files ref storage is supported")
+        self.objects = ObjectStore(self.common_dir / 'objects')
+        self._index_stat = None
+        self._index = None
+        self._index_mtime = None
+        self._head_stat = None
+        self._head_tree = None
+        self._filtered = None
+
+    def _read_local_config(self) -> dict:
+        config = {}
+        for path in (self.common_dir / 'config', self.git_dir / 'config.worktree'):
+            if path.exists():
+                if path.name == 'config.worktree':
+                    raise Unsupported("Worktree specific configs are not supported")
+                for section, key, value in parse_config(_read_text(path)):
+                    config[(section, key)] = value
+        return config
+
+    def close(self):
+        """Releases the mapped pack files, the repository can still be used afterwards"""
+        self.objects.close()
+
+    def user_name(self) -> str:
+        """Returns user.name as git config user.name would"""
+        name = self.config.get(('user', 'name'), None)
+        if name is not None:
+            return name
+        for path in reversed(_global_configs()):
+            if path.exists():
+                for section, key, value in reversed(parse_config(_read_text(path))):
+                    if (section, key) == ('user', 'name'):
+                        return value
+        # the system config is located at a platform dependent place
+        raise Unsupported("user.name is not set in the local or global config")
+
+    def _stat_key(self, path: pathlib.Path):
+        try:
+            info = path.stat()
+        except FileNotFoundError:
+            return None
+        return info.st_mtime_ns, info.st_size, info.st_ino
+
+    def index_path(self) -> pathlib.Path:
+        """Returns the path of the index honoring GIT_INDEX_FILE"""
+        index_file = os.getenv('GIT_INDEX_FILE', None)
+        if index_file:
+            # relative paths are relative to the root when running hooks
+            return self.root / index_file
+        return self.git_dir / 'index'
+
+    def index(self) -> dict:
+        """Returns the stage 0 entries of the index as dict of relative posix path to IndexEntry"""
+        path = self.index_path()
+        key = self._stat_key(path)
+        if key != self._index_stat or self._index is None:
+            self._index = self._read_index(path) if key else {}
+            self._index_stat = key
+            self._index_mtime = key[0] if key else None
+        return self._index
+
+    @staticmethod
+    def _read_index(path: pathlib.Path) -> dict:
+        with open(path, 'rb') as index_file:
+            data = index_file.read()
+        signature, version, count = _INDEX_HEADER.unpack_from(data, 0)
+        if signature != b'DIRC' or version not in (2, 3, 4):
+            raise Unsupported(f"Unsupported index version {version}")
+        entries = {}
+        pos = _INDEX_HEADER.size
+        name = b''
+        for _ in range(count):
+            start = pos
+            fields = _INDEX_ENTRY.unpack_from(data, pos)
+            pos += _INDEX_ENTRY.size
+            flags = fields[11]
+            extended = 0
+            if flags & _FLAG_EXTENDED:
+                extended, = struct.unpack_from('>H', data, pos)
+                pos += 2
+            if version == 4:
+                strip, pos = _varint(data, pos)
+                end = data.index(b'\0', pos)
+                name = name[:len(name) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b'\0', pos)
+                name = data[pos:end]
+                # entries are padded with 1-8 nul bytes to a multiple of 8
+                pos = start + ((end - start) // 8 + 1) * 8
+            if flags & _FLAG_STAGE or extended & (_EXTENDED_SKIP_WORKTREE | _EXTENDED_INTENT_TO_ADD):
+                # conflicts, sparse checkouts and intent to add entries get handled by the CLI
+                entries[name.decode('utf-8', 'surrogateescape')] = None
+                continue
+            entries[name.decode('utf-8', 'surrogateescape')] = fields + (extended,)
+        while pos + 8 <= len(data) - 20:
+            extension, size = struct.unpack_from('>4sI', data, pos)
+            if extension in (b'link', b'sdir'):
+                raise Unsupported("Split and sparse indexes are not supported")
+            pos += 8 + size
+        return entries
+
+    def head_tree(self) -> bytes:
+        """Returns the binary sha of the tree HEAD points to"""
+        head = self.git_dir / 'HEAD'
+        content = _read_text(head).strip()
+        ref_path = None
+        if content.startswith('ref:'):
+            ref = content[len('ref:'):].strip()
+            ref_path = self.common_dir / ref
+        key = (self._stat_key(head), self._stat_key(ref_path) if ref_path else None,
+               self._stat_key(self.common_dir / 'packed-refs'))
+        if key != self._head_stat:
+            self._head_tree = self._resolve_head_tree()
+            self._head_stat = key
+        return self._head_tree
+
+    def head_commit(self) -> str:
+        """Returns the sha of the commit HEAD points to"""
+        head = _read_text(self.git_dir / 'HEAD').strip()
+        sha = head
+        if head.startswith('ref:'):
+            ref = head[len('ref:'):].strip()
+            sha = None
+            ref_path = self.common_dir / ref
+            if ref_path.exists():
+                sha = _read_text(ref_path).strip()
+            elif (self.common_dir / 'packed-refs').exists():
+                for line in _read_text(self.common_dir / 'packed-refs').splitlines():
+                    if line and line[0] not in '#^' and line.endswith(' ' + ref):
+                        sha = line.split(' ', 1)[0]
+            if sha is None:
+                raise Unsupported(f"Cannot resolve {ref}, probably no commit yet")
+        if len(sha) != 40:
+            raise Unsupported(f"Unsupported HEAD {head}")
+        return sha
+
+    def _resolve_head_tree(self) -> bytes:
+        sha = self.head_commit()
+        obj_type, content = self.objects.read(bytes.fromhex(sha))
+        if obj_type != _OBJ_COMMIT or not content.startswith(b'tree '):
+            raise Unsupported(f"HEAD {sha} is not a commit")
+        return bytes.fromhex(content[5:45].decode('ascii'))
+
+    def head_entry(self, file_rel: str):
+        """Returns a pair of mode and binary sha of the file in HEAD or None if not existing"""
+        tree = self.head_tree()
+        parts = file_rel.encode('utf-8', 'surrogateescape').split(b'/')
+        for i, part in enumerate(parts):
+            entry = self.objects.tree(tree).get(part, None)
+            if entry is None:
+                return None
+            mode, sha = entry
+            if i == len(parts) - 1:
+                return entry
+            if mode != 0o40000:
+                break
+            tree = sha
+        return None
+
+    def _may_filter(self, file_rel: str) -> bool:
+        """Returns true if content filters or eol conversion may apply to the file"""
+        if self._filtered is None:
+            self._filtered = self.config.get(('core', 'autocrlf'), 'false').lower() not in ('false', 'no', 'off', '0') \
+                or (self.common_dir / 'info' / 'attributes').exists()
+            for path in _global_configs():
+                if path.exists():
+                    for section, key, value in parse_config(_read_text(path)):
+                        if section == 'core' and key in ('autocrlf', 'attributesfile'):
+                            self._filtered = self._filtered or value.lower() not in ('false', 'no', 'off', '0')
+        if self._filtered:
+            return True
+        directory = self.root
+        for part in ['.'] + file_rel.split('/')[:-1]:
+            directory = directory / part
+            if (directory / '.gitattributes').exists():
+                return True
+        return False
+
+    def _worktree_modified(self, file_rel: str, entry) -> bool:
+        """Compares the file in the worktree with its index entry"""
+        ctime_s, ctime_ns, mtime_s, mtime_ns, _, ino, mode, _, _, size, sha, flags, _ = entry
+        if flags & _FLAG_ASSUME_VALID:
+            return False
+        path = self.root / file_rel
+        try:
+            info = os.lstat(path)
+        except FileNotFoundError:
+            return True
+        if not stat.S_ISREG(info.st_mode):
+            raise Unsupported(f"{file_rel} is not a regular file")
+        if (info.st_mode & 0o100) != (mode & 0o100) and self.config.get(('core', 'filemode'), 'true') == 'true':
+            return True
+        stat_matches = (
+            int(info.st_mtime) & 0xffffffff == mtime_s and info.st_mtime_ns % 1000000000 == mtime_ns
+            and int(info.st_ctime) & 0xffffffff == ctime_s and info.st_ctime_ns % 1000000000 == ctime_ns
+            and info.st_size & 0xffffffff == size and info.st_ino & 0xffffffff == ino)
+        # entries not older than the index itself might have changed after being staged
+        racy = self._index_mtime is not None and (mtime_s * 1000000000 + mtime_ns) >= self._index_mtime
+        if stat_matches and not racy:
+            return False
+        with open(path, 'rb') as file_obj:
+            content = file_obj.read()
+        blob = hashlib.sha1(b'blob %d\0' % len(content) + content).digest()  # nosec - as used by git
+        if blob == sha:
+            return False
+        if self._may_filter(file_rel):
+            raise Unsupported(f"{file_rel} may be subject to content filters")
+        return True
+
+    def is_modified(self, file_rel: str) -> bool:
+        """
+        Returns true if the file differs between the worktree and HEAD
+
+        Yields the same result as running 'git diff --name-only HEAD -- file'
+        """
+        entry = self.index().get(file_rel, False)
+        head = self.head_entry(file_rel)
+        if entry is None:
+            raise Unsupported(f"{file_rel} needs special handling")
+        if entry is False:
+            # untracked files are not considered but deleted ones are
+            return head is not None
+        mode, sha = entry[6], entry[10]
+        if mode in (_MODE_SYMLINK, _MODE_GITLINK):
+            raise Unsupported(f"{file_rel} is a symlink or submodule")
+        if head is None or head != (mode, sha):
+            return True
+        return self._worktree_modified(file_rel, entry)
@@ -0,0 +1,245 @@
+# gitstore.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Git metadata shared between processes
+
+Results of querying git are kept in a SQLite database within the git dir
+so that they can be shared by concurrently running processes, e.g. as
+started by pre-commit. SQLite takes care of locking the database file.
+Whether a file is modified is only valid as long as HEAD, the index and
+the file itself are unchanged, the latest author only as long as HEAD is.
+
+See README.md for detail and documentation
+"""
+
+import collections
+import hashlib
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+
+DATABASE_FILE = 'lictool-metadata.sqlite'
+# time in seconds to wait for other processes to release the database before going without it
+TIMEOUT = 2
+# files changed more recently might still change without their stat changing
+RACY_NS = 2 * 1000 * 1000 * 1000
+# the most unchanged results kept, the least recently used ones get dropped beyond
+MAX_UNCHANGED = 64 * 1024
+# the most bytes of bumped contents kept in memory, see ResultCache
+MAX_RESULT_BYTES = 32 * 1024 * 1024
+
+
+def enabled() -> bool:
+    """
+    Returns true if metadata should be shared between processes
+
+    Opt in using LICTOOLS_GIT_STORE=1, every process queries git on its own otherwise
+    """
+    return os.getenv('LICTOOLS_GIT_STORE', '0') != '0'
+
+
+def digest(state) -> str:
+    """Returns a short key for the given state made up from builtin types"""
+    return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()  # nosec - not used for security
+
+
+def stat_key(path: pathlib.Path, racy: bool = True) -> str:
+    """
+    Returns a key changing whenever the file at path changes
+
+    :racy: Return None for files changed too recently to detect further changes
+    returns the key or None if the file is missing or racy
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    if racy and info.st_mtime_ns > time.time_ns() - RACY_NS:
+        return None
+    return f'{info.st_mtime_ns}:{info.st_ctime_ns}:{info.st_size}:{info.st_ino}'
+
+
+class MetadataStore:
+    """The modified state and latest author of files in a worktree and bump results"""
+
+    def __init__(self, git_dir: pathlib.Path):
+        """
+        Opens or creates the store
+
+        :git_dir: The git dir of the worktree to keep the database in
+        :throws sqlite3.Error: When the database cannot be opened
+        """
+        self.connection = sqlite3.connect(str(git_dir / DATABASE_FILE), timeout=TIMEOUT)
+        with self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, head TEXT, '
+                                    'state TEXT, modified INTEGER, author TEXT, year INTEGER)')
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(unchanged)')]
+            if columns and 'used' not in columns:
+                # created by an earlier version never dropping any results
+                self.connection.execute('DROP TABLE unchanged')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS unchanged (key TEXT PRIMARY KEY, used INTEGER)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS unchanged_used ON unchanged (used)')
+        # keys found by is_unchanged(), marked as used by the next add_unchanged()
+        self.hits = []
+
+    def close(self):
+        """Closes the database"""
+        self.connection.close()
+
+    def lookup(self, head: str, states: dict) -> dict:
+        """
+        Looks up the stored metadata of files
+
+        :head: The sha of HEAD
+        :states: Maps the relative posix paths of files to a key describing their state,
+                 made up from the state of the index and stat_key()
+        returns a dict mapping paths to a triple of the modified state, author and year
+        """
+        found = {}
+        paths = [path for path, state in states.items() if state]
+        try:
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                rows = self.connection.execute(
+                    f'SELECT path, state, modified, author, year FROM files WHERE head = ? '
+                    f'AND path IN ({",".join("?" * len(chunk))})', [head] + chunk)  # nosec - only placeholders
+                for path, state, modified, author, year in rows:
+                    if state == states[path]:
+                        found[path] = (bool(modified), author, year)
+        except sqlite3.Error as error:
+            logging.debug(f"Failed to look up git metadata: {error}")
+        return found
+
+    def save(self, head: str, entries: dict):
+        """
+        Stores the metadata of files
+
+        :head: The sha of HEAD
+        :entries: Maps relative posix paths to a quadruple of their state as passed
+                  to lookup(), the modified state, the author and the year
+        """
+        rows = [(path, head, state, int(modified), author, year)
+                for path, (state, modified, author, year) in entries.items() if state]
+        try:
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', rows)
+        except sqlite3.Error as error:
+            logging.debug(f"Failed to store git metadata: {error}")
+
+    def is_unchanged(self, key: str) -> bool:
+        """Returns true if bumping a file with the given key was found to leave it unchanged before"""
+        try:
+            found = self.connection.execute('SELECT 1 FROM unchanged WHERE key = ?', (key,)).fetchone() is not None
+        except sqlite3.Error:
+            return False
+        if found:
+            self.hits.append(key)
+        return found
+
+    def add_unchanged(self, keys):
+        """
+        Remembers that bumping files with the given keys leaves them unchanged
+
+        Marks these and all keys found by is_unchanged() since as used, dropping the
+        least recently used results beyond MAX_UNCHANGED.
+        """
+        used = int(time.time())
+        rows = [(key, used) for key in list(keys) + self.hits]
+        self.hits = []
+        try:
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO unchanged VALUES (?, ?)', rows)
+                self.connection.execute('DELETE FROM unchanged WHERE rowid IN (SELECT rowid FROM unchanged '
+                                        'ORDER BY used DESC, rowid DESC LIMIT -1 OFFSET ?)', (MAX_UNCHANGED,))
+        except sqlite3.Error as error:
+            logging.debug(f"Failed to store results: {error}")
+
+
+class ResultCache:
+    """
+    Results of bumping files within a batch keyed by Tool.result_key()
+
+    Contents are only kept while more files with the same blob are expected to
+    be bumped, the least recently used ones get dropped beyond MAX_RESULT_BYTES.
+    """
+
+    def __init__(self):
+        # maps blobs to the number of files still expected to be bumped, see expect()
+        self.pending = collections.Counter()
+        # maps keys to a pair of whether the contents changed and the bumped contents
+        self.results = collections.OrderedDict()
+        self.size = 0
+        # keys of unchanged results not yet passed to MetadataStore.add_unchanged()
+        self.unchanged = []
+
+    def expect(self, blobs):
+        """Announces that files with the given blobs are about to be bumped"""
+        self.pending.update(blobs)
+
+    def get(self, key: str, blob: str):
+        """Returns a pair of whether the contents changed and the bumped contents or None if not known"""
+        result = self.results.get(key, None)
+        if result is not None:
+            self.results.move_to_end(key)
+            self._bumped(key, blob)
+        return result
+
+    def put(self, key: str, blob: str, changed: bool, content):
+        """Stores the result of bumping a file, the contents are only kept if changed"""
+        if not changed:
+            self.unchanged.append(key)
+            content = None
+        self._drop(key)
+        self.results[key] = (changed, content)
+        self.size += len(content) if content else 0
+        self._bumped(key, blob)
+        while self.size > MAX_RESULT_BYTES:
+            self._drop(next(iter(self.results)))
+
+    def take_unchanged(self) -> list:
+        """
+        Ends a batch, dropping all expected blobs
+
+        returns the keys of all unchanged results stored since the last call
+        """
+        self.pending.clear()
+        self.results.clear()
+        self.size = 0
+        keys = self.unchanged
+        self.unchanged = []
+        return keys
+
+    def _bumped(self, key: str, blob: str):
+        """Counts a file with the given blob as bumped, dropping its result if no other is expected"""
+        remaining = self.pending.pop(blob, 0) - 1
+        if remaining > 0:
+            self.pending[blob] = remaining
+        else:
+            self._drop(key)
+
+    def _drop(self, key: str):
+        """Drops the result stored for key if any"""
+        result = self.results.pop(key, None)
+        if result is not None and result[1]:
+            self.size -= len(result[1])
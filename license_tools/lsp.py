@@ -0,0 +1,293 @@
+# lsp.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Language server for the --lsp option
+
+Speaks the language server protocol via stdin and stdout, reporting
+missing or outdated headers as diagnostics and offering a code action
+to update them. Documents are validated from the in-memory buffers of
+the editor, results are kept per document version.
+
+See README.md for detail and documentation
+"""
+
+import json
+import logging
+import pathlib
+import sys
+import urllib.parse
+import urllib.request
+from copy import copy
+
+import license_tools  # pylint: disable=cyclic-import
+
+SOURCE = 'lictool'
+# see the specification of DiagnosticSeverity
+SEVERITY_WARNING = 2
+# see the specification of TextDocumentSyncKind
+SYNC_FULL = 1
+# see the specification of ErrorCodes
+METHOD_NOT_FOUND = -32601
+INVALID_REQUEST = -32600
+
+
+def _utf16_length(text: str) -> int:
+    """Returns the length of text in UTF-16 code units as used for positions"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _position(text: str, offset: int) -> dict:
+    """Converts a character offset within text to a protocol position"""
+    line = text.count('\n', 0, offset)
+    line_start = text.rfind('\n', 0, offset) + 1
+    return {'line': line, 'character': _utf16_length(text[line_start:offset])}
+
+
+def _path_from_uri(uri: str) -> pathlib.Path:
+    """Returns the path for a file uri or None for any other scheme"""
+    parsed = urllib.parse.urlparse(uri)
+    if parsed.scheme != 'file':
+        return None
+    return pathlib.Path(urllib.request.url2pathname(parsed.path))
+
+
+class Document:  # pylint: disable=too-many-instance-attributes
+    """An open document and the results of validating its latest version"""
+
+    def __init__(self, uri: str, path: pathlib.Path):
+        self.uri = uri
+        self.path = path
+        self.version = None
+        self.text = ''
+        # determined using git once per document and refreshed when saved
+        self.author = None
+        self.contributors = None
+        # the version the results below have been computed for
+        self.validated = None
+        self.diagnostics = []
+        self.bumped = None
+
+
+class Server:
+    """A language server processing messages from a pair of binary streams"""
+
+    def __init__(self, args, reader, writer):
+        """
+        Creates a new server
+
+        :args: The parsed commandline used to discover the config of documents
+        :reader: Binary stream to read messages from
+        :writer: Binary stream to write messages to
+        """
+        self.args = args
+        self.reader = reader
+        self.writer = writer
+        self.documents = {}
+        self.shutdown = False
+
+    def read_message(self) -> dict:
+        """Reads the next message or returns None at the end of the stream"""
+        length = None
+        while True:
+            line = self.reader.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode('ascii').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        if length is None:
+            return {}
+        return json.loads(self.reader.read(length))
+
+    def send(self, message: dict):
+        """Writes a message to the client"""
+        message = dict(message, jsonrpc='2.0')
+        body = json.dumps(message).encode('utf-8')
+        self.writer.write(f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii') + body)
+        self.writer.flush()
+
+    def notify(self, method: str, params: dict):
+        """Sends a notification to the client"""
+        self.send({'method': method, 'params': params})
+
+    def serve(self) -> int:
+        """Processes messages until the client asks to exit, returns the exit code"""
+        while True:
+            message = self.read_message()
+            if message is None:
+                return 1
+            method = message.get('method', None)
+            if method == 'exit':
+                return 0 if self.shutdown else 1
+            handler = getattr(self, 'on_' + (method or '').replace('/', '_').replace('$', '_'), None)
+            params = message.get('params', None) or {}
+            if 'id' not in message:
+                if handler:
+                    handler(params)
+                continue
+            if handler is None:
+                self.send({'id': message['id'], 'error': {'code': METHOD_NOT_FOUND,
+                                                          'message': f"Unsupported method '{method}'"}})
+            elif self.shutdown:
+                self.send({'id': message['id'], 'error': {'code': INVALID_REQUEST,
+                                                          'message': 'Server is shutting down'}})
+            else:
+                self.send({'id': message['id'], 'result': handler(params)})
+
+    def validate(self, document: Document):
+        """Validates the latest version of a document unless done before and publishes the results"""
+        if document.validated != document.version:
+            document.validated = document.version
+            document.diagnostics = []
+            document.bumped = None
+            try:
+                configured = license_tools.configure_tool(copy(self.args), document.path)
+            except SystemExit:
+                # errors in the config got logged already
+                configured = None
+            if configured is not None:
+                _, tool, options = configured
+                if document.author is None:
+                    document.author = tool.latest_author(document.path)
+                    document.contributors = tool.contributors(document.path)
+                try:
+                    result = tool.bump_contents(document.text, document.path, latest_author=document.author,
+                                                contributors=document.contributors, **options)
+                except UnicodeDecodeError:
+                    result = None
+                if result and result.changed:
+                    document.bumped = result.content
+                    document.diagnostics = [self._diagnostic(document, tool)]
+        self.notify('textDocument/publishDiagnostics', {
+            'uri': document.uri, 'version': document.version, 'diagnostics': document.diagnostics})
+
+    @staticmethod
+    def _diagnostic(document: Document, tool: license_tools.Tool) -> dict:
+        parsed = license_tools.ParsedHeader(document.path, document.text, tool.style_overrides)
+        if parsed.authors:
+            message = 'License header is outdated'
+            end = -1
+            if parsed.remainder:
+                end = document.text.find(parsed.remainder)
+            if end < 0:
+                end = len(document.text)
+        else:
+            message = 'License header is missing'
+            end = len(document.text.split('\n', maxsplit=1)[0])
+        return {
+            'range': {'start': _position(document.text, 0), 'end': _position(document.text, end)},
+            'severity': SEVERITY_WARNING,
+            'source': SOURCE,
+            'message': message
+        }
+
+    def on_initialize(self, _params) -> dict:
+        """Handles the initialize request"""
+        return {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': SYNC_FULL, 'save': True},
+                'codeActionProvider': {'codeActionKinds': ['quickfix', 'source.fixAll']}
+            },
+            'serverInfo': {'name': SOURCE}
+        }
+
+    def on_shutdown(self, _params):
+        """Handles the shutdown request"""
+        self.shutdown = True
+
+    def on_textDocument_didOpen(self, params: dict):  # pylint: disable=invalid-name
+        """Starts tracking and validates a document"""
+        item = params['textDocument']
+        path = _path_from_uri(item['uri'])
+        if path is None:
+            return
+        document = Document(item['uri'], path)
+        document.version = item.get('version', None)
+        document.text = item['text']
+        self.documents[document.uri] = document
+        self.validate(document)
+
+    def on_textDocument_didChange(self, params: dict):  # pylint: disable=invalid-name
+        """Revalidates a document after it was changed"""
+        document = self.documents.get(params['textDocument']['uri'], None)
+        if document is None:
+            return
+        for change in params['contentChanges']:
+            # only full synchronization is announced in the capabilities
+            document.text = change['text']
+        document.version = params['textDocument'].get('version', None)
+        if document.version is None:
+            # results cannot be reused when the client is not versioning
+            document.validated = object()
+        self.validate(document)
+
+    def on_textDocument_didSave(self, params: dict):  # pylint: disable=invalid-name
+        """Refreshes the author from git and configs once a document got saved"""
+        uri = params['textDocument']['uri']
+        path = _path_from_uri(uri)
+        if path is not None and path.name == license_tools.LICENSE_JSON:
+            logging.info("Reloading changed configs")
+            license_tools.reload_configs()
+            changed = self.documents.values()
+        else:
+            changed = [self.documents[uri]] if uri in self.documents else []
+        for document in changed:
+            document.author = None
+            document.contributors = None
+            document.validated = None
+            self.validate(document)
+
+    def on_textDocument_didClose(self, params: dict):  # pylint: disable=invalid-name
+        """Stops tracking a document"""
+        document = self.documents.pop(params['textDocument']['uri'], None)
+        if document is not None:
+            self.notify('textDocument/publishDiagnostics', {'uri': document.uri, 'diagnostics': []})
+
+    def on_textDocument_codeAction(self, params: dict) -> list:  # pylint: disable=invalid-name
+        """Offers to update the header of a document with diagnostics"""
+        document = self.documents.get(params['textDocument']['uri'], None)
+        if document is None or document.bumped is None:
+            return []
+        only = params.get('context', {}).get('only', None)
+        kind = 'quickfix'
+        if only and kind not in only:
+            kind = 'source.fixAll'
+            if kind not in only:
+                return []
+        edit = {
+            'range': {'start': _position(document.text, 0),
+                      'end': _position(document.text, len(document.text))},
+            'newText': document.bumped
+        }
+        return [{
+            'title': 'Update license header',
+            'kind': kind,
+            'diagnostics': document.diagnostics,
+            'isPreferred': True,
+            'edit': {'changes': {document.uri: [edit]}}
+        }]
+
+
+def serve(args) -> int:
+    """Runs a language server on stdin and stdout, returns the exit code"""
+    return Server(args, sys.stdin.buffer, sys.stdout.buffer).serve()
@@ -0,0 +1,302 @@
+# pipeline.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Reads ahead of processing many files
+
+Walking the tree, matching the files against their config and reading the
+beginning of the next files into the page cache run in background threads
+connected by bounded queues, so that only a limited number of files is
+pending at any time, no matter how large the tree is. Querying git, which
+happens for a batch of files at once, as well as parsing, rendering and
+writing stay with the calling thread, see process_batch().
+
+See README.md for detail and documentation
+"""
+
+import collections
+import concurrent.futures
+import os
+import pathlib
+import queue
+import threading
+from copy import copy
+
+import license_tools  # pylint: disable=cyclic-import
+
+# the number of items buffered between two stages
+DEPTH = 256
+# the number of bytes read ahead of bumping a file, covering the header of most files
+READ_AHEAD = 64 * 1024
+# marks the end of the items passed between threads
+_DONE = object()
+
+
+def default_jobs() -> int:
+    """Returns the number of threads to read files ahead when not configured"""
+    return min(8, os.cpu_count() or 1)
+
+
+def background(items, depth: int = DEPTH):
+    """
+    Iterates the given items in a background thread
+
+    At most depth items get buffered, the thread pauses until the consumer catches up.
+    Any exception raised while iterating gets raised again when reaching the consumer.
+    yields the items in order
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as error:  # pylint: disable=broad-except
+            # including SystemExit raised when failing to load a config
+            put((_DONE, error))
+            return
+        put((_DONE, None))
+
+    thread = threading.Thread(target=produce, name='lictool-stage', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        # let the thread finish in case the consumer stopped early
+        stop.set()
+
+
+def stage(func, items, workers: int, depth: int = DEPTH):
+    """
+    Applies func to the given items using a pool of threads
+
+    :func: The function to apply, needs to be safe to call from several threads
+    :workers: The number of threads, func gets applied inline if less than one
+    :depth: The maximum number of items being processed at once
+    yields the results in the order of the items
+    """
+    if workers < 1:
+        yield from map(func, items)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lictool-worker') as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def batched(items, size: int):
+    """Yields lists of up to size of the given items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_ahead(entry):
+    """
+    Reads the beginning of a file to be bumped into the page cache
+
+    The kernel gets advised to read it in the background where supported,
+    the contents are only read into memory by the thread bumping the file.
+    :entry: A pair of the file and its result of configure_tool()
+    returns entry as is
+    """
+    file, configured = entry
+    if configured is not None:
+        try:
+            with open(file, 'rb') as file_obj:
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(file_obj.fileno(), 0, READ_AHEAD, os.POSIX_FADV_WILLNEED)
+                else:
+                    file_obj.read(READ_AHEAD)
+        except OSError:
+            # reported when bumping the file
+            pass
+    return entry
+
+
+def read_paths(stream, separator: bytes = b'\n', chunk_size: int = 64 * 1024):
+    """
+    Lazily reads paths from the given binary stream
+
+    The stream gets read in chunks so that arbitrary long lists can be
+    processed without holding them in memory. Empty entries are skipped.
+
+    :stream: The binary stream to read from
+    :separator: The separator between two paths, i.e. newline or NUL
+    :chunk_size: The number of bytes to read at once
+    yields each path decoded using the filesystem encoding
+    """
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        entries = (pending + chunk).split(separator)
+        pending = entries.pop()
+        for entry in entries:
+            if separator == b'\n':
+                entry = entry.rstrip(b'\r')
+            if entry:
+                yield os.fsdecode(entry)
+    if separator == b'\n':
+        pending = pending.rstrip(b'\r')
+    if pending:
+        yield os.fsdecode(pending)
+
+
+class ConfigIndex:
+    """
+    Maps directories to the LICENSE_JSON configuration file governing them
+
+    Directories get indexed top-down while walking the tree, each one is
+    resolved from its listing and its parent without searching upwards again.
+    """
+
+    def __init__(self):
+        self.configs = {}
+
+    def clear(self):
+        """Drops all indexed directories so that added or removed configs get picked up"""
+        self.configs.clear()
+
+    def add(self, directory: pathlib.Path, names):
+        """
+        Indexes a directory entered while walking the tree
+
+        :directory: The directory being entered
+        :names: The names of all entries of the directory
+        """
+        if license_tools.LICENSE_JSON in names:
+            self.configs[directory] = directory / license_tools.LICENSE_JSON
+        elif directory not in self.configs:
+            self.configs[directory] = self.lookup(directory.parent)
+
+    def lookup(self, level: pathlib.Path) -> pathlib.Path:
+        """
+        Returns the config governing the given directory or None if there is none
+
+        Only directories not indexed yet are searched, up to the first indexed one.
+        """
+        pending = []
+        while level not in self.configs:
+            if level.parent == level:
+                self.configs[level] = None
+            elif (level / license_tools.LICENSE_JSON).exists():
+                self.configs[level] = level / license_tools.LICENSE_JSON
+            else:
+                pending.append(level)
+                level = level.parent
+        config = self.configs[level]
+        for directory in pending:
+            self.configs[directory] = config
+        return config
+
+
+CONFIG_INDEX = ConfigIndex()
+
+
+def iter_files(candidates):
+    """Lazily yields the files within the given candidates resolving dirs on the way"""
+    for candidate in candidates:
+        if candidate.name == '.git':
+            continue
+        if candidate.is_dir():
+            entries = list(candidate.iterdir())
+            CONFIG_INDEX.add(candidate, {entry.name for entry in entries})
+            yield from iter_files(entries)
+        else:
+            yield candidate
+
+
+def handle_files(args, candidates) -> bool:
+    """
+    Processes a given set of candidates resolving dirs on the way, see license_tools.handle_files()
+
+    Will return true on success, false on failure.
+    """
+    jobs = default_jobs() if args.read_jobs is None else args.read_jobs
+
+    def configure(file):
+        # the summary is only updated by the main thread, see process_batch()
+        file_args = copy(args)
+        file_args.summary = None
+        return file, license_tools.configure_tool(file_args, file)
+    configured = (configure(file) for file in iter_files(candidates))
+    if jobs > 0:
+        configured = background(stage(read_ahead, configured, jobs))
+    success = True
+    for batch in batched(configured, license_tools.BATCH_SIZE):
+        success = process_batch(args, batch) and success
+    return success
+
+
+def process_batch(args, configured) -> bool:
+    """
+    Processes a batch of files, querying git for all of them at once
+
+    Will return true on success, false on failure.
+    :configured: Pairs of each file and its result of configure_tool() invoked without a summary
+    """
+    git_repos = {}
+    for file, tool_config in configured:
+        if tool_config is None:
+            continue
+        tool = tool_config[1]
+        # files with unknown style often get skipped, they will query git on demand
+        if license_tools.ParsedHeader.style_from_path(file, tool.style_overrides) == license_tools.Style.UNKNOWN:
+            continue
+        if tool.default_author.git_repo:
+            git_repos.setdefault(tool.default_author.git_repo, []).append(file)
+    for git_repo, git_files in git_repos.items():
+        git_repo.prefetch(git_files, args.git_jobs)
+
+    success = True
+    for file, tool_config in configured:
+        if tool_config is None and args.summary is not None:
+            args.summary['excluded'] += 1
+        success = license_tools.process_file(args, file, tool_config) and success
+    for git_repo in git_repos:
+        git_repo.discard_prefetched()
+    return success
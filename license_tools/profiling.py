@@ -0,0 +1,282 @@
+# profiling.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Profiling support for the --profile option
+
+See README.md for detail and documentation
+"""
+
+import cProfile
+import collections
+import logging
+import os
+import pathlib
+import pstats
+import sys
+import threading
+import time
+
+
+def _label(func) -> str:
+    """Returns a flamegraph compatible label for a pstats function key"""
+    filename, lineno, name = func
+    if filename == '~':
+        # builtins have no file associated
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{lineno})"
+    # semicolons separate frames in the collapsed format
+    return label.replace(';', ':')
+
+
+def _edge_time(edge) -> float:
+    """Returns the cumulative time of a caller edge from pstats"""
+    if isinstance(edge, tuple):
+        return edge[3]
+    return 0.0
+
+
+def collapse_stats(stats: dict, min_time: float = 1e-6) -> collections.Counter:
+    """
+    Converts pstats as recorded by cProfile to collapsed stacks
+
+    cProfile only records caller/callee pairs and not full stacks, hence the
+    time of a function gets distributed to its callers in proportion to the
+    cumulative time spent on each call edge. Recursion gets cut off at the
+    first repetition of a function within a stack.
+
+    :stats: The raw stats dictionary as found in pstats.Stats.stats
+    :min_time: Stacks with less time in seconds than this will be dropped
+    returns a counter of collapsed stack to time in microseconds
+    """
+    callees = collections.defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = _edge_time(edge)
+
+    stacks = collections.Counter()
+
+    def visit(func, stack, fraction):
+        _, _, own_time, _, _ = stats[func]
+        stack = stack + [_label(func)]
+        self_time = own_time * fraction
+        if self_time >= min_time:
+            stacks[';'.join(stack)] += int(self_time * 1e6)
+        for callee, edge_time in callees.get(func, {}).items():
+            if _label(callee) in stack or callee not in stats:
+                continue
+            callee_time = stats[callee][3]
+            if callee_time <= 0:
+                continue
+            callee_fraction = fraction * edge_time / callee_time
+            if edge_time * fraction >= min_time:
+                visit(callee, stack, callee_fraction)
+
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            visit(func, [], 1.0)
+    return stacks
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler sampling the stacks of all threads
+
+    Causes much less overhead than cProfile and still records complete
+    stacks which get directly written as collapsed stacks. In addition
+    the samples get converted to pstats with times being estimated
+    from the number of samples.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        """
+        Creates a new profiler
+
+        :interval: The time between two samples in seconds
+        """
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stats = {}
+        self._samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()  # pylint: disable=protected-access
+        for ident, frame in frames.items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+            self._samples[(names.get(ident, str(ident)),) + tuple(stack)] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def enable(self):
+        """Starts sampling in a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lictool-profiler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        """Stops sampling and waits for the background thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def create_stats(self):
+        """Converts the samples to pstats and collapsed stacks, invoked by pstats.Stats"""
+        self.stacks = collections.Counter()
+        stats = {}
+        for sample, count in self._samples.items():
+            thread, stack = sample[0], sample[1:]
+            if not stack:
+                continue
+            duration = count * self.interval
+            labels = [thread] + [_label(func) for func in stack]
+            self.stacks[';'.join(labels)] += int(duration * 1e6)
+            seen = set()
+            for i, func in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+                if i == len(stack) - 1:
+                    tt += duration
+                if func not in seen:
+                    # recursive functions must only be accounted once per sample
+                    seen.add(func)
+                    cc += count
+                    nc += count
+                    ct += duration
+                if i > 0:
+                    caller = stack[i - 1]
+                    ecc, enc, ett, ect = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (ecc + count, enc + count,
+                                       ett + (duration if i == len(stack) - 1 else 0.0), ect + duration)
+                stats[func] = (cc, nc, tt, ct, callers)
+        self.stats = stats
+
+
+class ThreadedProfile:
+    """
+    cProfile extended to the threads started while profiling
+
+    cProfile only records the thread enabling it, hence every thread started
+    in the meantime gets a profiler of its own using threading.setprofile().
+    Their stats get merged with the stats of the enabling thread. Python 3.12
+    and later only allow a single profiler at a time, threads are not covered
+    there and need to be profiled using SamplingProfiler instead.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.stats = {}
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, *_):
+        """Invoked on the first event of each thread started, replaced by its own profiler"""
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active already
+            return
+        with self._lock:
+            self._threads.append(profiler)
+
+    def enable(self):
+        """Starts profiling the calling thread and any thread started afterwards"""
+        threading.setprofile(self._start_thread)
+        self.profiler.enable()
+
+    def disable(self):
+        """Stops profiling, threads still running keep being recorded until create_stats()"""
+        self.profiler.disable()
+        threading.setprofile(None)
+
+    def create_stats(self):
+        """Merges the stats of all threads, invoked by pstats.Stats"""
+        stats = pstats.Stats(self.profiler)
+        with self._lock:
+            threads = list(self._threads)
+        for profiler in threads:
+            try:
+                stats.add(profiler)
+            except TypeError:
+                # threads without any calls recorded
+                continue
+        self.stats = stats.stats  # pylint: disable=no-member
+
+
+def write_collapsed(stacks: collections.Counter, output: pathlib.Path):
+    """Writes collapsed stacks in the format expected by flamegraph.pl and compatible tools"""
+    with open(output, 'w', encoding='utf-8') as collapsed:
+        for stack, value in sorted(stacks.items()):
+            if value > 0:
+                collapsed.write(f"{stack} {value}\n")
+
+
+def profile(func, output: pathlib.Path, interval: float = None):
+    """
+    Runs func under a profiler and writes the results
+
+    Will write pstats to output and collapsed stacks next to it
+    using an additional '.folded' suffix. Results get written
+    even if func raises or exits.
+
+    :func: The callable to be profiled
+    :output: Path to write pstats to
+    :interval: Use a sampling profiler with given interval in seconds instead of cProfile,
+               see ThreadedProfile for the threads covered by the latter
+    """
+    output = pathlib.Path(output)
+    folded = output.with_name(output.name + '.folded')
+    if interval:
+        profiler = SamplingProfiler(interval)
+    else:
+        profiler = ThreadedProfile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - start
+        try:
+            stats = pstats.Stats(profiler)
+        except TypeError:
+            logging.warning(f"Profiled {duration:.3f}s but did not record any samples")
+        else:
+            stats.dump_stats(output)
+            if interval:
+                stacks = profiler.stacks
+            else:
+                stacks = collapse_stats(stats.stats)  # pylint: disable=no-member
+            write_collapsed(stacks, folded)
+            logging.info(f"Profiled {duration:.3f}s, wrote '{output}' and '{folded}'")
@@ -0,0 +1,455 @@
+# rawtext.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Byte level handling of file contents
+
+Files are processed as bytes and only the window at their beginning that
+might hold a header gets decoded. Anything following is passed through as
+is, so that the encoding of the body does not matter as long as newlines
+and ASCII whitespace are encoded as in ASCII, e.g. UTF-8, Latin-1 or
+Shift-JIS. Bytes not valid as UTF-8 are retained when decoding so that
+they get restored unchanged when encoding the header again.
+
+Files bumped in place get sniffed, mapped into memory or streamed when
+large, see bump_file(). Headers only lagging behind by some years get
+their years replaced in place, see year_patches().
+
+See README.md for detail and documentation
+"""
+
+import codecs
+import contextlib
+import errno
+import logging
+import mmap
+import os
+import pathlib
+import re
+import tempfile
+from copy import copy
+from operator import attrgetter
+
+import license_tools  # pylint: disable=cyclic-import
+
+# encodings not compatible with ASCII, these can only be detected by their BOM
+WIDE_ENCODINGS = [
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+# the number of bytes at the beginning of a file inspected by sniff()
+SNIFF_SIZE = 8 * 1024
+# lines longer than this many bytes indicate minified contents
+MAX_LINE_LENGTH = 4096
+# files larger than this many bytes get rewritten without reading them into memory
+STREAM_SIZE = 1024 * 1024
+# the number of bytes to read or copy at once when streaming
+COPY_CHUNK = 1024 * 1024
+# a line feed not being part of a CRLF line ending
+LONE_LF = re.compile(rb'(?<!\r)\n')
+# the reasons to skip a file returned by sniff()
+BINARY = 'binary'
+MINIFIED = 'minified'
+GENERATED = 'generated'
+
+
+def wide_encoding(data: bytes) -> str:
+    """Returns the encoding of contents starting with a UTF-16 or UTF-32 BOM or None"""
+    for bom, encoding in WIDE_ENCODINGS:
+        if data.startswith(bom):
+            return encoding
+    return None
+
+
+def decode(data: bytes) -> str:
+    """Decodes bytes as UTF-8 retaining any invalid bytes to be restored by encode()"""
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def encode(text: str) -> bytes:
+    """Encodes text as UTF-8 restoring any invalid bytes retained by decode()"""
+    return text.encode('utf-8', 'surrogateescape')
+
+
+def decode_any(data: bytes) -> str:
+    """Decodes data using the encoding of its BOM if wide, else the same as decode(), returns None for None"""
+    if data is None:
+        return None
+    wide = wide_encoding(data)
+    return data.decode(wide) if wide else decode(data)
+
+
+@contextlib.contextmanager
+def mapped(file_obj):
+    """
+    Maps a file into memory for reading so that it does not need to be read in full
+
+    :file_obj: The file opened for reading in binary mode
+    yields a read-only mmap of the file or None if it cannot be mapped, e.g. if empty
+    """
+    try:
+        data = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        yield None
+        return
+    try:
+        yield data
+    finally:
+        try:
+            data.close()
+        except BufferError:
+            # still referenced by a pending exception, unmapped once that is released
+            pass
+
+
+def window_end(data: bytes, window: int) -> int:
+    """
+    Determines the end of the complete lines within window
+
+    :data: The contents of a file, at least window bytes if any follow
+    :window: The maximum number of bytes to decode
+    returns the offset splitting the decoded head from the remaining bytes
+    """
+    if len(data) <= window:
+        return len(data)
+    return data.rfind(b'\n', 0, window) + 1 or window
+
+
+def stand_in(file_obj, chunk_size: int = COPY_CHUNK) -> bytes:
+    """
+    Scans the remaining contents of a file for being passed through unchanged when bumping
+
+    Bumping strips the remainder of a file and converts its line endings, so the remainder
+    is only retained as is when starting and ending with anything but whitespace, ending
+    with a single newline and using the same line ending throughout.
+    :file_obj: The file opened in binary mode and positioned at the start of the remainder
+    returns a short replacement for the remainder bumping to the same header
+            or None if the remainder would not be retained as is
+    """
+    first = file_obj.read(chunk_size)
+    if not first or first[:1].isspace():
+        return None
+    unix = dos = 0
+    last = b''
+    chunk = first
+    while chunk:
+        unix += chunk.count(b'\n')
+        dos += chunk.count(b'\r\n')
+        if last.endswith(b'\r') and chunk.startswith(b'\n'):
+            dos += 1
+        last = (last + chunk[-3:])[-3:]
+        chunk = file_obj.read(chunk_size)
+    newline = b'\r\n' if dos else b'\n'
+    if dos not in (0, unix) or not last.endswith(newline) or last[-len(newline) - 1:-len(newline)].isspace():
+        return None
+    line = first[:1] + newline
+    # the line endings get determined from the remainder not counting the final newline
+    return line * 2 if unix > 1 else line
+
+
+def year_patches(tool, data: bytes, path: pathlib.PurePath, cut: int, *,
+                 keep_license: bool = True,  # pylint: disable=unused-argument
+                 title=None, keep_authors: bool = True, latest_year_only: bool = False,
+                 latest_author=None, contributors: list = None):
+    """
+    Determines if a header only needs its years updated without parsing it
+
+    The authors get read from the Copyright lines as rendered by the tool and merged
+    with the ones determined using git. Only if this changes their years but neither
+    their names, order nor the length of any line, and if the header is exactly the one
+    rendered for the listed authors, the years can be replaced in place.
+    :data: The contents to be bumped as bytes or a read-only mmap
+    :cut: The end of the window holding the header, see window_end()
+    :keep_license: Without effect, only headers carrying the default license get patched
+    See Tool.bump_bytes() for the remaining options
+    returns a list of pairs of byte offset and replacement years, an empty list if the
+            header is up to date or None if the contents need to be bumped in full
+    """
+    style = license_tools.ParsedHeader.style_from_path(path, tool.style_overrides)
+    if style == license_tools.Style.UNKNOWN:
+        return None
+    head = data[:cut]
+    end = head.find(b'All rights reserved.')
+    title_text = title.get(path) if title else None
+    if end < 0 or (title_text and 'copyright' in title_text.lower()):
+        # no header or a title parsing would take for an author
+        return None
+    if latest_author is None:
+        latest_author = tool.latest_author(path)
+        contributors = tool.contributors(path)
+    prefix = re.escape(license_tools.Style.decorators(style).prefix.encode('ascii'))
+    lines = list(re.finditer(prefix + rb' Copyright \(c\) (?P<years>(?P<from>[0-9]{4})(?: - (?P<to>[0-9]{4}))?) '
+                             rb'(?P<name>[^\r\n]+)\r?$', head[:end], re.MULTILINE))
+    if not lines:
+        return None
+    listed = [license_tools.Author(decode(line['name']), int(line['from']), int(line['to'] or line['from']))
+              for line in lines]
+    # bumping merges the authors sorted by their first year
+    authors = sorted((copy(author) for author in listed), key=attrgetter('year_from')) if keep_authors else []
+    authors = tool.merge_authors(authors, latest_author, contributors or [], latest_year_only)
+    if [author.name for author in authors] != [author.name for author in listed]:
+        return None
+    patches = []
+    for line, author in zip(lines, authors):
+        years = f'{author.year_from} - {author.year_to}' if author.year_from != author.year_to else f'{author.year_to}'
+        years = years.encode('ascii')
+        if len(years) != len(line['years']):
+            return None
+        if years != line['years']:
+            patches.append((line.start('years'), years))
+    decls = license_tools.ParsedHeader.split_decls(decode(head))[0]
+    if not tool.is_rendered(data, decls, style, listed, title_text):
+        return None
+    return patches
+
+
+def sniff(head: bytes, markers=()) -> str:
+    """
+    Determines if a file should be skipped by looking at its beginning only
+
+    :head: Up to the first SNIFF_SIZE bytes of the file
+    :markers: Strings identifying generated files
+    returns the reason to skip the file, i.e. one of BINARY, MINIFIED or GENERATED, or None
+    """
+    if b'\0' in head and not wide_encoding(head):
+        return BINARY
+    if len(head) > MAX_LINE_LENGTH and any(len(line) > MAX_LINE_LENGTH for line in head.split(b'\n')):
+        return MINIFIED
+    for marker in markers:
+        if marker.encode('utf-8') in head:
+            return GENERATED
+    return None
+
+
+def patch_years(filename: pathlib.PurePath, patches):
+    """Writes the years determined by year_patches() leaving the rest of the file in place"""
+    with open(filename, 'r+b') as file_obj:
+        for offset, years in patches:
+            if hasattr(os, 'pwrite'):
+                os.pwrite(file_obj.fileno(), years, offset)
+            else:
+                file_obj.seek(offset)
+                file_obj.write(years)
+    logging.debug(f"Patched {len(patches)} years of {filename} in place")
+
+
+def _pread_write(source: int, target: int, offset: int, count: int) -> int:
+    return os.write(target, os.pread(source, count, offset))
+
+
+def copy_range(source: int, target: int, offset: int, count: int):
+    """
+    Copies count bytes starting at offset of source to the current position of target
+
+    Uses copy_file_range() or sendfile() where supported so that the data does not
+    need to pass through userspace, falling back to reading and writing in chunks.
+    :source: The file descriptor to copy from
+    :target: The file descriptor to copy to
+    """
+    copiers = []
+    if hasattr(os, 'copy_file_range'):
+        copiers.append(lambda source, target, offset, count: os.copy_file_range(source, target, count, offset))
+    if hasattr(os, 'sendfile'):
+        copiers.append(lambda source, target, offset, count: os.sendfile(target, source, offset, count))
+    copiers.append(_pread_write)
+    while count > 0:
+        try:
+            copied = copiers[0](source, target, offset, min(count, COPY_CHUNK))
+        except OSError:
+            # not supported for the given files, e.g. when crossing filesystems
+            if len(copiers) == 1:
+                raise
+            copiers.pop(0)
+            continue
+        if copied == 0:
+            raise OSError(f"Unexpected end of file copying {count} more bytes")
+        offset += copied
+        count -= copied
+
+
+def _copy_metadata(source: int, target: int, info: os.stat_result):
+    """Applies the mode, owner and extended attributes of source to target"""
+    created = os.fstat(target)
+    if (info.st_uid, info.st_gid) != (created.st_uid, created.st_gid):
+        os.fchown(target, info.st_uid, info.st_gid)
+    os.fchmod(target, info.st_mode & 0o7777)
+    if hasattr(os, 'listxattr'):
+        try:
+            names = os.listxattr(source)
+        except OSError as error:
+            if error.errno not in (errno.ENOTSUP, errno.EOPNOTSUPP):
+                raise
+            names = []
+        for name in names:
+            os.setxattr(target, name, os.getxattr(source, name))
+
+
+def rewrite(filename: pathlib.PurePath, file_obj, head: bytes, offset: int):
+    """
+    Replaces the contents of a file before offset with head without reading the rest into memory
+
+    The new contents get written to a temporary file next to the file, which then
+    atomically replaces the file. Use for regular files only, symlinks and hard links
+    would get replaced by a copy.
+    :file_obj: The file opened for reading in binary mode
+    :throws OSError: When failing to write or to retain the mode, owner or extended attributes
+    """
+    filename = pathlib.Path(filename)
+    info = os.fstat(file_obj.fileno())
+    handle, temp = tempfile.mkstemp(dir=filename.parent, prefix=filename.name)
+    replaced = False
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(head)
+            output.flush()
+            copy_range(file_obj.fileno(), output.fileno(), offset, info.st_size - offset)
+            _copy_metadata(file_obj.fileno(), output.fileno(), info)
+        os.replace(temp, filename)
+        replaced = True
+    finally:
+        if not replaced:
+            os.unlink(temp)
+    logging.debug(f"Rewrote {filename} copying {info.st_size - offset} bytes")
+
+
+def bump_streaming(tool, filename: pathlib.PurePath, file_obj, **options) -> bool:
+    """
+    Bumps a large file in place without reading it into memory
+
+    Only the part holding the header gets read. The remainder is scanned in chunks
+    and, if bumping retains it as is, copied to the new contents by the kernel.
+    Symlinks, files with hard links and files whose metadata cannot be retained
+    are left to be bumped in memory and written in place.
+    :tool: The tool to bump the file with
+    :filename: The file to be bumped
+    :file_obj: The file opened for reading in binary mode
+    :options: Options passed on to Tool.bump_bytes()
+    returns true if the file changed or None if it needs to be bumped in memory
+    """
+    if os.path.islink(filename) or os.fstat(file_obj.fileno()).st_nlink > 1:
+        # replacing the file would break the link, these get written in place
+        return None
+    window = license_tools.ParsedHeader.HEADER_WINDOW
+    file_obj.seek(0)
+    head = file_obj.read(window + 1)
+    if wide_encoding(head):
+        return None
+    cut = window_end(head, window)
+    file_obj.seek(cut)
+    replacement = stand_in(file_obj)
+    if replacement is None:
+        return None
+    # the stand-in shares all properties of the remainder affecting the bumped header
+    result = tool.bump_bytes(head[:cut] + replacement, filename, cut, **options)
+    if result.content is None or not result.content.endswith(replacement):
+        return None
+    output = result.content[:-len(replacement)]
+    if result.changed:
+        try:
+            rewrite(filename, file_obj, output, cut)
+        except OSError as error:
+            logging.debug(f"Failed to rewrite {filename}, writing it in place: {error}")
+            return None
+    return result.changed
+
+
+def bump_file(tool, filename: pathlib.PurePath, simulate: bool = False, stats=None, **options) -> bool:
+    """
+    Bumps the license header of a given file, see Tool.bump_inplace()
+
+    Binary and generated files get skipped after sniffing their beginning. Others are
+    mapped into memory, streamed if large or bumped from the result of an identical file.
+    :tool: The tool to bump the file with
+    :simulate: Write the bumped contents next to the file instead
+    :stats: Counts the files 'changed', 'unchanged' or skipped by reason, see sniff()
+    :options: Options passed on to Tool.bump_bytes()
+    returns true on success
+    """
+    def record(outcome):
+        if stats is not None:
+            stats[outcome] += 1
+        return True
+    git_repo = tool.default_author.git_repo
+    key = None
+    blob = git_repo.clean_blob(filename) if git_repo and not simulate else None
+    if blob:
+        # identical files within a batch share their result, unchanged results are even kept across runs
+        options['latest_author'] = tool.latest_author(filename)
+        options['contributors'] = tool.contributors(filename)
+        key = tool.result_key(blob, filename, **options)
+        cached = git_repo.cached_result(key, blob)
+        if cached is not None:
+            changed, content = cached
+            if changed:
+                with open(filename, 'wb') as output:
+                    output.write(content)
+            return record('changed' if changed else 'unchanged')
+    with open(filename, 'rb') as file_obj, mapped(file_obj) as data:
+        # reject binary or generated files before reading them in full
+        contents = file_obj.read(SNIFF_SIZE)
+        skipped = sniff(contents, tool.generated_markers)
+        if skipped:
+            logging.debug(f"Skipping {filename}, it looks {skipped}")
+            return record(skipped)
+        if options.get('latest_author', None) is None:
+            # looked up once for the checks below and bumping in full
+            options['latest_author'] = tool.latest_author(filename)
+            options['contributors'] = tool.contributors(filename)
+        if data is not None and not simulate and not wide_encoding(contents):
+            # headers only lagging behind by some years get patched without being parsed
+            patches = year_patches(tool, data, filename, window_end(data, license_tools.ParsedHeader.HEADER_WINDOW),
+                                   **options)
+            if patches:
+                patch_years(filename, patches)
+                return record('changed')
+            if patches is not None:
+                if key:
+                    git_repo.cache_result(key, blob, False, None)
+                return record('unchanged')
+        if not simulate and os.fstat(file_obj.fileno()).st_size > STREAM_SIZE:
+            changed = bump_streaming(tool, filename, file_obj, **options)
+            if changed is not None:
+                if key and not changed:
+                    git_repo.cache_result(key, blob, False, None)
+                return record('changed' if changed else 'unchanged')
+            file_obj.seek(len(contents))
+        if data is not None and not wide_encoding(contents):
+            # parse straight from the mapped file, its body only gets copied if the header changes
+            result = tool.bump_bytes(data, filename, window_end(data, license_tools.ParsedHeader.HEADER_WINDOW),
+                                     **options)
+        else:
+            contents += file_obj.read()
+            result = tool.bump_contents(contents, filename, **options)
+        if key and result.content is not None:
+            git_repo.cache_result(key, blob, result.changed, result.content)
+        if not result.content:
+            return False
+        if simulate:
+            with open(str(filename) + license_tools.SIMULATE_SUFFIX, 'wb') as output:
+                output.write(result.content)
+                return record('changed')
+        if not result.changed:
+            # leave the file untouched so that its timestamp is retained
+            return record('unchanged')
+    # only written once the mapping is closed, truncating a mapped file is not portable
+    with open(filename, 'wb') as output:
+        output.write(result.content)
+        return record('changed')
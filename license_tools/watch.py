@@ -0,0 +1,264 @@
+# watch.py
+#
+# Copyright (c) 2026 Marius Zwicker
+# All rights reserved.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+File watching for the --watch option
+
+Uses inotify on Linux and falls back to polling the modification
+times on other platforms or when inotify is not available.
+
+See README.md for detail and documentation
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import pathlib
+import select
+import struct
+import time
+
+import license_tools  # pylint: disable=cyclic-import
+
+# time in seconds to wait for further events before processing a batch
+DEBOUNCE = 0.05
+# time in seconds between two scans when polling
+POLL_INTERVAL = 1.0
+
+# see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+def _skip_dir(name: str) -> bool:
+    """Returns true for directories never to be watched"""
+    return name == '.git'
+
+
+class InotifyWatcher:
+    """Watches directories recursively using inotify"""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, roots):
+        """
+        Creates a new watcher
+
+        :roots: The directories to be watched recursively
+        :throws OSError: When inotify is not available
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+        except (AttributeError, TypeError, OSError) as error:
+            raise OSError(f"inotify is not supported: {error}") from error
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_init1: {os.strerror(ctypes.get_errno())}")
+        self.dirs = {}
+        try:
+            for root in roots:
+                self._watch_tree(pathlib.Path(root))
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, directory: pathlib.Path):
+        descriptor = self._add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if descriptor < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch '{directory}': {os.strerror(errno)}")
+        self.dirs[descriptor] = directory
+
+    def _watch_tree(self, root: pathlib.Path):
+        """Watches root and all directories below, returns all files found on the way"""
+        found = []
+        self._watch(root)
+        for current, dirs, files in os.walk(root):
+            dirs[:] = [name for name in dirs if not _skip_dir(name)]
+            for name in dirs:
+                self._watch(pathlib.Path(current) / name)
+            found.extend(pathlib.Path(current) / name for name in files)
+        return found
+
+    def fileno(self) -> int:
+        """The file descriptor to wait on for events"""
+        return self.fd
+
+    def read(self):
+        """Returns the set of files changed since the last call"""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    logging.warning("Lost events as too many changes happened at once")
+                    continue
+                directory = self.dirs.get(descriptor, None)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self.dirs[descriptor]
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not _skip_dir(name):
+                        # files may have been created before the watch got added
+                        changed.update(self._watch_tree(directory / name))
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    changed.add(directory / name)
+        return changed
+
+    def close(self):
+        """Stops watching"""
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Watches directories recursively by comparing modification times"""
+
+    def __init__(self, roots, interval: float = POLL_INTERVAL):
+        """
+        Creates a new watcher
+
+        :roots: The directories to be watched recursively
+        :interval: The time between two scans in seconds
+        """
+        self.roots = [pathlib.Path(root) for root in roots]
+        self.interval = interval
+        self.snapshot = self._scan()
+        self.deadline = time.monotonic() + interval
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        for root in self.roots:
+            for current, dirs, files in os.walk(root):
+                dirs[:] = [name for name in dirs if not _skip_dir(name)]
+                for name in files:
+                    path = pathlib.Path(current) / name
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def timeout(self) -> float:
+        """Returns the time in seconds until the next scan is due"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def read(self):
+        """Returns the set of files changed since the last call"""
+        snapshot = self._scan()
+        changed = {path for path, stat in snapshot.items() if self.snapshot.get(path, None) != stat}
+        self.snapshot = snapshot
+        self.deadline = time.monotonic() + self.interval
+        return changed
+
+    def close(self):
+        """Stops watching"""
+
+
+def _state(path: pathlib.Path):
+    """Returns what identifies the current contents of a file or None if missing"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return (info.st_ino, info.st_size, info.st_mtime_ns)
+
+
+def create_watcher(roots, poll: bool = False):
+    """Creates an inotify based watcher or falls back to polling if not possible"""
+    if not poll:
+        try:
+            return InotifyWatcher(roots)
+        except OSError as error:
+            logging.warning(f"Falling back to polling: {error}")
+    return PollingWatcher(roots)
+
+
+def _wait(watcher, timeout: float = None) -> bool:
+    """Waits for events on watcher, returns true if there are events to be read"""
+    if isinstance(watcher, PollingWatcher):
+        remaining = watcher.timeout() if timeout is None else min(timeout, watcher.timeout())
+        time.sleep(remaining)
+        return watcher.timeout() == 0
+    readable, _, _ = select.select([watcher], [], [], timeout)
+    return bool(readable)
+
+
+def watch(args, roots, files=None, poll: bool = False, stop=None):
+    """
+    Processes files below roots as they get saved or created
+
+    :args: The parsed commandline used to process the files
+    :roots: The directories to be watched recursively
+    :files: Limit processing to the given files if not None
+    :poll: Force polling for changes instead of using inotify
+    :stop: An optional threading.Event to stop watching
+    """
+    watcher = create_watcher(roots, poll)
+    logging.info(f"Watching {', '.join(str(root) for root in roots)} for changes using {type(watcher).__name__}")
+    # the state of files after processing them, events caused by writing them get ignored
+    written = {}
+    try:
+        while stop is None or not stop.is_set():
+            if not _wait(watcher, None if stop is None else 0.1):
+                continue
+            changed = watcher.read()
+            # editors often write a file in multiple steps
+            while isinstance(watcher, InotifyWatcher) and _wait(watcher, DEBOUNCE):
+                changed.update(watcher.read())
+            if any(path.name == license_tools.LICENSE_JSON for path in changed):
+                logging.info("Reloading changed configs")
+                license_tools.reload_configs()
+            for path in sorted(changed):
+                if path.name == license_tools.LICENSE_JSON or path.name.endswith(license_tools.SIMULATE_SUFFIX) \
+                        or not path.is_file():
+                    continue
+                if files is not None and path not in files:
+                    continue
+                if written.get(path, None) == _state(path):
+                    continue
+                try:
+                    license_tools.handle_files(args, [path])
+                except SystemExit:
+                    # errors got logged already, keep watching so they can be fixed
+                    pass
+                except Exception as error:  # pylint: disable=broad-except
+                    logging.error(f"Failed to process {path}: {error}")
+                written[path] = _state(path)
+    finally:
+        watcher.close()
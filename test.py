@@ -1,6 +1,6 @@
 # test.py
 #
-# Copyright (c) 2021 - 2024 Marius Zwicker
+# Copyright (c) 2021 - 2026 Marius Zwicker
 # All rights reserved.
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -18,16 +18,28 @@
 # limitations under the License.
 
 from asyncio import subprocess
+import concurrent.futures
+import copy
 import datetime
 import functools
+import io
+import json
 import os
 import pathlib
+import pstats
+import re
 import shutil
+import socket
+import sqlite3
 import subprocess
+import sys
 import tempfile
 import textwrap
+import time
 import unittest
+import unittest.mock
 import license_tools
+from license_tools import gitblame, githistory, gitplumbing, gitstore, lsp, pipeline, rawtext
 
 BASE = pathlib.Path(__file__).resolve().absolute().parent
 
@@ -95,6 +107,27 @@ class TestFileFilter(unittest.TestCase):
                 print(f"file_rel={file_rel} includes={includes}")
                 raise
 
+    def test_compiled(self):
+        file_filter = license_tools.FileFilter(['**/*.cpp', 'src/**/*.h'], ['_test', '(?i)^GEN/', '(a)/\\1/'])
+        self.assertIsNone(file_filter.prefixes)
+        self.assertEqual(('.cpp', '.h'), file_filter.suffixes)
+        # expressions with flags or groups are not merged
+        self.assertEqual(['(?i)^GEN/', '(a)/\\1/'], [exclude.pattern for exclude in file_filter.separate])
+        EXPRESSIONS = [
+            ('main.cpp', True),
+            ('src/lib/lib.h', True),
+            ('lib/lib.h', False),
+            ('main.cpp.txt', False),
+            ('main_test.cpp', False),
+            ('gen/main.cpp', False),
+            ('a/a/main.cpp', False),
+            ('a/b/main.cpp', True),
+        ]
+        for file_rel, included in EXPRESSIONS:
+            self.assertEqual(included, file_filter.matches(file_rel), file_rel)
+            self.assertEqual(included, file_filter.reason(file_rel).startswith('Including'), file_rel)
+        self.assertFalse(license_tools.FileFilter([], []).matches('main.cpp'))
+
 
 class TestDateUtils(unittest.TestCase):
 
@@ -725,6 +758,126 @@ class TestParserDashStyle(unittest.TestCase):
         self.assertTrue(parsed.remainder.startswith('print'), parsed.remainder)
 
 
+class RecordedPattern:
+    """A compiled pattern recording how it gets applied, see RecordingRe"""
+
+    def __init__(self, compiled: re.Pattern, applied: list):
+        self.compiled = compiled
+        self.applied = applied
+
+    def __getattr__(self, name):
+        return getattr(self.compiled, name)
+
+    def match(self, string, pos=0):
+        self.applied.append((self.compiled.pattern, 'match', len(string) - pos))
+        return self.compiled.match(string, pos)
+
+    def search(self, string, pos=0):
+        self.applied.append((self.compiled.pattern, 'search', len(string) - pos))
+        return self.compiled.search(string, pos)
+
+    def finditer(self, string, pos=0):
+        self.applied.append((self.compiled.pattern, 'finditer', len(string) - pos))
+        return self.compiled.finditer(string, pos)
+
+    def sub(self, repl, string, count=0):
+        self.applied.append((self.compiled.pattern, 'sub', len(string)))
+        return self.compiled.sub(repl, string, count)
+
+
+class RecordingRe:
+    """Stands in for the re module recording the patterns used and the text they get applied to"""
+
+    def __init__(self):
+        # triples of each pattern, the method used and the number of characters it got applied to
+        self.applied = []
+
+    def __getattr__(self, name):
+        return getattr(re, name)
+
+    def compile(self, pattern, flags=0):
+        return RecordedPattern(re.compile(pattern, flags), self.applied)
+
+    def match(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).match(string)
+
+    def search(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).search(string)
+
+    def finditer(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).finditer(string)
+
+    def sub(self, pattern, repl, string, count=0, flags=0):
+        return self.compile(pattern, flags).sub(repl, string, count)
+
+
+class TestParserWorstCase(unittest.TestCase):
+
+    # adversarial inputs as triples of suffix, prefix and a line repeated up to SIZE
+    INPUTS = {
+        'no_header': ('.cpp', '', 'int value = compute(42);\n'),
+        'no_header_unknown_style': ('.unknown', '', 'int value = compute(42);\n'),
+        'huge_line': ('.cpp', '', 'x'),
+        'c_comments_no_rights': ('.cpp', '', '/* comment */\n'),
+        'c_unterminated': ('.cpp', '/*\n', ' * All rights reserved.\n'),
+        'c_unterminated_line': ('.cpp', '/*', ' All rights reserved.'),
+        'c_tagged_unterminated': ('.cpp', '/* @LICENSE_HEADER_START@\n', ' * @LICENSE_HEADER_END@\n'),
+        'pound_comments_no_rights': ('.sh', '', '# comment\n'),
+        'pound_rights_only': ('.sh', '#\n', '# All rights reserved.\n'),
+        'docstring_unterminated': ('.py', '"""\n', 'All rights reserved.\n'),
+        'xml_unterminated': ('.xml', '<!--\n', 'All rights reserved.\n'),
+        'batch_unterminated': ('.bat', '::\n', ':: All rights reserved.\n'),
+        'slash_rights_only': ('.rs', '//\n', '// All rights reserved.\n'),
+        'tagged_unterminated': ('.unknown', '', 'x @LICENSE_HEADER_START@\n'),
+        'copyright_without_year': ('.cpp', '', ' Copyright notice\n'),
+        'copyright_without_year_line': ('.cpp', '', ' Copyright'),
+    }
+    SIZE = 2 * 1024 * 1024
+
+    def _parse(self, contents: str, file: str):
+        """Parses contents, returns the parsed header and how the patterns got applied, see RecordingRe"""
+        recording = RecordingRe()
+        with unittest.mock.patch.object(license_tools, 're', recording):
+            parsed = license_tools.ParsedHeader(contents=contents, file=file)
+        # declarations are anchored to the first line and are not bounded by the window
+        declarations = {pattern for pattern, _ in license_tools.Style.declarations()}
+        return parsed, [applied for applied in recording.applied if applied[0] not in declarations]
+
+    def test_worst_case(self):
+        for name, (suffix, prefix, line) in self.INPUTS.items():
+            with self.subTest(name):
+                contents = prefix + line * (self.SIZE // len(line))
+                parsed, applied = self._parse(contents, f'worst_case{suffix}')
+                self.assertEqual([], parsed.authors)
+                # no pattern gets to see more than the window
+                self.assertLessEqual(max(size for _, _, size in applied), license_tools.ParsedHeader.HEADER_WINDOW)
+                # searching for authors would scan to the next year again at every 'Copyright',
+                # so they get matched at single occurrences only, giving up at once without a year
+                authors = [method for pattern, method, _ in applied if 'Copyright[' in pattern]
+                self.assertLessEqual(len(authors), 1)
+                self.assertNotIn('finditer', authors)
+
+    def test_copyright_gap(self):
+        # the year may follow on the next line or after any text
+        parsed = license_tools.ParsedHeader(contents='/*\n * Copyright\n * 2020 Max Muster\n */\n', file='gap.h')
+        self.assertEqual([('Max Muster', 2020)], [(author.name, author.year_from) for author in parsed.authors])
+        gap = 'held by the original authors of this project, see the AUTHORS file, '
+        self.assertGreater(len(gap), 64)
+        parsed = license_tools.ParsedHeader(contents=f'# Copyright {gap}2019-2021 Max Muster\n', file='gap.sh')
+        self.assertEqual([('Max Muster', 2019, 2021)],
+                         [(author.name, author.year_from, author.year_to) for author in parsed.authors])
+
+    def test_large_file_with_header(self):
+        header = (BASE / 'test/TestParserCStyle-1author_1year.h').read_text()
+        body = 'int value = compute(42);\n' * 100000
+        parsed, applied = self._parse(header + body, 'large.h')
+        self.assertLessEqual(max(size for _, _, size in applied), license_tools.ParsedHeader.HEADER_WINDOW)
+        self.assertEqual(1, len(parsed.authors))
+        self.assertEqual("Max Muster", parsed.authors[0].name)
+        self.assertEqual(license_tools.Style.C_STYLE, parsed.style)
+        self.assertEqual("#include <stdio.h>\n" + body.strip(), parsed.remainder)
+
+
 class TestHeader(unittest.TestCase):
 
     def test_generator(self):
@@ -849,6 +1002,232 @@ class TestTool(unittest.TestCase):
             self.assertEqual(expected_dos, result,
                              f"\nACTUAL ---\n{self._render_endings(result)}\nWANT ---\n{self._render_endings(expected_dos)}\n---")
 
+    def test_bump_contents(self):
+        author = license_tools.Author("Test Guy", year_to=2021)
+        license = license_tools.License("Apache-2.0")
+        title = license_tools.Title("filename")
+        tool = license_tools.Tool(
+            default_license=license, default_author=author)
+        input = BASE / 'test/TestTool-bump_old_copyright_year.input.cxx'
+        expected = (BASE / 'test/TestTool-bump_old_copyright_year.expected').read_text()
+        virtual = pathlib.PurePath('/nonexistent') / input.name
+        # text in, text out
+        result = tool.bump_contents(input.read_text(), virtual, title=title)
+        self.assertEqual(license_tools.Style.C_STYLE, result.style)
+        self.assertEqual(expected, result.content)
+        self.assertTrue(result.changed)
+        self.assertEqual({'parse', 'git', 'render'}, set(result.timings))
+        # bytes in, bytes out and bumping twice is a no-op
+        result = tool.bump_contents(expected.encode('utf-8'), virtual, title=title)
+        self.assertEqual(expected.encode('utf-8'), result.content)
+        self.assertFalse(result.changed)
+        # unknown styles yield no content
+        result = tool.bump_contents('foo', 'unknown.nostyle')
+        self.assertEqual(license_tools.Style.UNKNOWN, result.style)
+        self.assertIsNone(result.content)
+        # batches get bumped lazily in order
+        results = tool.bump_many([(virtual, input.read_text()), ('unknown.nostyle', 'foo')], title=title)
+        self.assertEqual([expected, None], [result.content for result in results])
+        self.assertEqual(2021, author.year_to)
+
+    def test_version(self):
+        with tempfile.TemporaryDirectory() as wkdir, \
+                unittest.mock.patch.object(license_tools, 'BASE_DIR', pathlib.Path(wkdir)):
+            for name in ('__init__.py', 'rawtext.py', 'Header.j2'):
+                (pathlib.Path(wkdir) / name).write_text('pass\n')
+            versions = {license_tools.Tool.version.__wrapped__()}
+            # any change to a module or template results in another version, even if the time is retained
+            for name in ('rawtext.py', 'Header.j2'):
+                stat = (pathlib.Path(wkdir) / name).stat()
+                (pathlib.Path(wkdir) / name).write_text('changed\n')
+                os.utime(pathlib.Path(wkdir) / name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                versions.add(license_tools.Tool.version.__wrapped__())
+            self.assertEqual(3, len(versions))
+
+    def test_rendered_header(self):
+        author = license_tools.Author("Test Guy", year_to=2021)
+        tool = license_tools.Tool(default_license=license_tools.License("Apache-2.0"), default_author=author)
+        title = license_tools.Title("filename")
+        virtual = pathlib.PurePath('/nonexistent/module.py')
+        bumped = tool.bump_contents('#!/usr/bin/env python\nprint("hello")\nprint("world")\n', virtual, title=title).content
+        with unittest.mock.patch.object(license_tools.ParsedHeader, '__init__', autospec=True,
+                                        side_effect=license_tools.ParsedHeader.__init__) as parsed:
+            # files carrying the expected header are accepted without parsing
+            result = tool.bump_contents(bumped, virtual, title=title)
+            self.assertEqual((bumped, False), (result.content, result.changed))
+            result = tool.bump_contents(self._to_dos(bumped).encode('utf-8'), virtual, title=title)
+            self.assertEqual((self._to_dos(bumped).encode('utf-8'), False), (result.content, result.changed))
+            parsed.assert_not_called()
+            # anything else still gets parsed
+            result = tool.bump_contents(bumped + '\n', virtual, title=title)
+            self.assertEqual((bumped, True), (result.content, result.changed))
+            result = tool.bump_contents(bumped.replace('print("hello")\n', 'print("hello")\r\n'), virtual, title=title)
+            self.assertEqual((self._to_dos(bumped), True), (result.content, result.changed))
+            self.assertEqual(2, parsed.call_count)
+
+    def test_raw_contents(self):
+        author = license_tools.Author("Test Guy", year_to=2021)
+        tool = license_tools.Tool(default_license=license_tools.License("MIT"), default_author=author)
+        virtual = pathlib.PurePath('/nonexistent/main.cpp')
+        expected = tool.bump_contents('int main() {}\n', virtual).content
+        body = expected[expected.index('int main'):]
+        # bodies in any encoding compatible with ASCII are passed through
+        for encoding in ['latin-1', 'shift_jis']:
+            contents = f'// {encoding}: Grüße 日本\n'.encode(encoding, 'replace') + body.encode('ascii')
+            result = tool.bump_contents(contents, virtual)
+            self.assertTrue(result.changed)
+            self.assertEqual(expected[:-len(body)].encode('utf-8') + contents, result.content)
+            self.assertFalse(tool.bump_contents(result.content, virtual).changed)
+        # contents starting with a BOM of wide encodings are converted
+        for encoding in ['utf-16-le', 'utf-32-be']:
+            contents = ('﻿' + body).encode(encoding)
+            result = tool.bump_contents(contents, virtual)
+            self.assertEqual('﻿\n' + expected, result.content.decode(encoding))
+        # anything beyond the header window is never decoded
+        contents = b'// \xff\n' * license_tools.ParsedHeader.HEADER_WINDOW + body.encode('ascii')
+        result = tool.bump_contents(contents, virtual)
+        self.assertEqual(expected[:-len(body)].encode('utf-8') + contents, result.content)
+        # files read by bump() retain invalid bytes as surrogates
+        with tempfile.TemporaryDirectory() as wkdir:
+            latin = pathlib.Path(wkdir) / 'main.cpp'
+            latin.write_bytes('// Grüße\n'.encode('latin-1') + body.encode('ascii'))
+            style, content = tool.bump(latin)
+            self.assertEqual(license_tools.Style.C_STYLE, style)
+            self.assertEqual(expected[:-len(body)].encode('utf-8') + latin.read_bytes(), rawtext.encode(content))
+            latin.write_bytes(('\ufeff' + body).encode('utf-16-le'))
+            self.assertEqual('\ufeff\n' + expected, tool.bump(latin)[1])
+
+    def test_streaming(self):
+        author = license_tools.Author("Test Guy", year_to=2021)
+        tool = license_tools.Tool(default_license=license_tools.License("MIT"), default_author=author)
+        body = b''.join(b'int line%d = %d;\n' % (i, i) for i in range(16 * 1024))
+        with tempfile.TemporaryDirectory() as wkdir, \
+                unittest.mock.patch.object(rawtext, 'STREAM_SIZE', 0), \
+                unittest.mock.patch('license_tools.rawtext.rewrite', wraps=rawtext.rewrite) as rewrite:
+            dut = pathlib.Path(wkdir) / 'main.cpp'
+            for contents, streamed in [(body, True), (body.replace(b'\n', b'\r\n'), True),
+                                       (body.replace(b'\n', b'\r\n', 1), False), (body + b'\n', False)]:
+                rewrite.reset_mock()
+                expected = tool.bump_contents(contents, dut).content
+                dut.write_bytes(contents)
+                dut.chmod(0o640)
+                self.assertTrue(tool.bump_inplace(dut))
+                self.assertEqual(expected, dut.read_bytes())
+                self.assertEqual(streamed, rewrite.called)
+                self.assertEqual(0o640, dut.stat().st_mode & 0o777)
+            # without any support by the kernel the contents get copied in chunks
+            dut.write_bytes(body)
+            with unittest.mock.patch('os.copy_file_range', side_effect=OSError, create=True), \
+                    unittest.mock.patch('os.sendfile', side_effect=OSError, create=True):
+                self.assertTrue(tool.bump_inplace(dut))
+            self.assertEqual(tool.bump_contents(body, dut).content, dut.read_bytes())
+            # bumped files are left as they are
+            stat = dut.stat()
+            self.assertTrue(tool.bump_inplace(dut))
+            self.assertEqual((stat.st_ino, stat.st_mtime_ns), (dut.stat().st_ino, dut.stat().st_mtime_ns))
+            # links are written in place rather than being replaced by a copy
+            target = pathlib.Path(wkdir) / 'real' / 'big.cpp'
+            target.parent.mkdir()
+            link = pathlib.Path(wkdir) / 'link.cpp'
+            hardlink = pathlib.Path(wkdir) / 'hard.cpp'
+            for name in (link, hardlink):
+                rewrite.reset_mock()
+                target.write_bytes(body)
+                if name == link:
+                    link.symlink_to(target)
+                else:
+                    os.link(target, hardlink)
+                inode = target.stat().st_ino
+                self.assertTrue(tool.bump_inplace(name))
+                self.assertFalse(rewrite.called)
+                self.assertEqual(tool.bump_contents(body, dut).content, target.read_bytes())
+                self.assertEqual(inode, target.stat().st_ino)
+                name.unlink()
+            # extended attributes are retained, the temporary file is removed on any error
+            dut.write_bytes(body)
+            try:
+                os.setxattr(dut, 'user.test', b'value')
+                xattrs = [b'value']
+            except (AttributeError, OSError):
+                xattrs = []
+            with unittest.mock.patch('license_tools.rawtext.copy_range', side_effect=KeyboardInterrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    tool.bump_inplace(dut)
+            self.assertEqual(['main.cpp', 'real'], sorted(os.listdir(wkdir)))
+            self.assertTrue(tool.bump_inplace(dut))
+            self.assertEqual(tool.bump_contents(body, dut).content, dut.read_bytes())
+            if xattrs:
+                self.assertEqual(xattrs, [os.getxattr(dut, 'user.test')])
+
+    def test_mapped(self):
+        author = license_tools.Author("Test Guy", year_to=2021)
+        tool = license_tools.Tool(default_license=license_tools.License("MIT"), default_author=author)
+        with tempfile.TemporaryDirectory() as wkdir:
+            dut = pathlib.Path(wkdir) / 'main.cpp'
+            dut.write_bytes(b'')
+            with open(dut, 'rb') as file_obj, rawtext.mapped(file_obj) as data:
+                self.assertIsNone(data)
+            # empty files cannot be mapped and are read instead
+            self.assertTrue(tool.bump_inplace(dut))
+            self.assertIn(b'Copyright', dut.read_bytes())
+            for contents in (b'int main() {}\n', b'int x;\r\nint y;\r\n'):
+                dut.write_bytes(contents)
+                expected = tool.bump_contents(contents, dut).content
+                with open(dut, 'rb') as file_obj, rawtext.mapped(file_obj) as data:
+                    result = tool.bump_bytes(data, dut, len(data))
+                    self.assertTrue(result.changed)
+                    self.assertEqual(expected, result.content)
+                self.assertTrue(tool.bump_inplace(dut))
+                self.assertEqual(expected, dut.read_bytes())
+                # bumped files are confirmed from the mapping without being read
+                with open(dut, 'rb') as file_obj, rawtext.mapped(file_obj) as data:
+                    result = tool.bump_bytes(data, dut, len(data))
+                    self.assertFalse(result.changed)
+                    self.assertIs(data, result.content)
+
+    def test_sniff(self):
+        self.assertIsNone(rawtext.sniff(b'int main() {}\n', ['@generated']))
+        self.assertEqual(rawtext.BINARY, rawtext.sniff(b'\x7fELF\x02\x01\x01\0\0'))
+        self.assertIsNone(rawtext.sniff('// wide\n'.encode('utf-16')))
+        self.assertEqual(rawtext.MINIFIED, rawtext.sniff(b'a' * (rawtext.MAX_LINE_LENGTH + 1)))
+        self.assertIsNone(rawtext.sniff(b'a\n' * rawtext.MAX_LINE_LENGTH))
+        self.assertEqual(rawtext.GENERATED, rawtext.sniff(b'// @generated\nint x;\n', ['@generated']))
+
+    def test_year_patches(self):
+        author = license_tools.Author("Test Guy", year_to=2021)
+        tool = license_tools.Tool(default_license=license_tools.License("Apache-2.0"), default_author=author)
+        title = license_tools.Title("filename")
+        path = pathlib.PurePath('main.cpp')
+        expected = tool.bump_contents(b'int main() {}\n', path, title=title,
+                                      latest_author=license_tools.Author("Test Guy", 1998, 2021)).content
+        offset = expected.index(b'1998 - 2021')
+
+        def patches(contents: bytes, path=path, **options):
+            return rawtext.year_patches(tool, contents, path, len(contents), title=title,
+                                        latest_author=copy.copy(author), **options)
+        self.assertEqual([], patches(expected))
+        self.assertEqual([(offset, b'1998 - 2021')], patches(expected.replace(b'2021', b'2020')))
+        # anything but years lagging behind needs to be bumped in full
+        self.assertIsNone(patches(expected.replace(b'1998 - 2021', b'2020')))
+        self.assertIsNone(patches(expected.replace(b'Test Guy', b'Other')))
+        self.assertIsNone(patches(expected.replace(b'2021', b'2020'), pathlib.PurePath('renamed.cxx')))
+        self.assertIsNone(patches(expected.replace(b'2021', b'2020').replace(b'License")', b'License)')))
+        self.assertIsNone(patches(expected.replace(b'2021', b'2020'), latest_year_only=True))
+        with tempfile.TemporaryDirectory() as wkdir:
+            dut = pathlib.Path(wkdir) / path
+            dut.write_bytes(expected.replace(b'2021', b'2020'))
+            # only the year digits get written without parsing the header
+            with unittest.mock.patch.object(license_tools.Tool, 'bump_bytes') as bump_bytes, \
+                    unittest.mock.patch.object(rawtext, 'patch_years', side_effect=rawtext.patch_years) as patch:
+                self.assertTrue(tool.bump_inplace(dut, title=title))
+                bump_bytes.assert_not_called()
+                patch.assert_called_once()
+            self.assertEqual(expected, dut.read_bytes())
+            # anything else gets written in full
+            dut.write_bytes(expected.replace(b'2021', b'2020').replace(b'Test Guy', b'Other'))
+            self.assertTrue(tool.bump_inplace(dut, title=title))
+            self.assertIn('Test Guy', dut.read_text())
+
 
 for file in BASE.glob('test/TestTool-bump*.input.*'):
     author = license_tools.Author("Test Guy", year_to=2021)
@@ -877,6 +1256,223 @@ for file in BASE.glob('test/TestTool-bump*.input.*'):
     setattr(TestTool, f'test_{name.replace("TestTool-","")}', create_test_case())
 
 
+class TestPipeline(unittest.TestCase):
+
+    def test_config_index(self):
+        with tempfile.TemporaryDirectory() as wkdir:
+            root = pathlib.Path(wkdir).resolve()
+            for directory in ('a/b/c', 'a/d/e', 'a/d/.git'):
+                (root / directory).mkdir(parents=True)
+            for file in ('a/b/c/main.cpp', 'a/d/e/main.cpp', 'a/d/.git/config'):
+                (root / file).write_text('int main() {}\n')
+            for config in ('a', 'a/d'):
+                (root / config / license_tools.LICENSE_JSON).write_text('{}')
+            license_tools.reload_configs()
+            try:
+                files = list(pipeline.iter_files([root / 'a']))
+                self.assertEqual(4, len(files))
+                # walking the tree indexed all directories, these are not searched again
+                with unittest.mock.patch.object(pathlib.Path, 'exists', side_effect=AssertionError):
+                    self.assertEqual(root / 'a' / license_tools.LICENSE_JSON, license_tools.discover_config(root / 'a/b/c'))
+                    self.assertEqual(root / 'a/d' / license_tools.LICENSE_JSON, license_tools.discover_config(root / 'a/d/e'))
+                self.assertNotIn(root / 'a/d/.git', pipeline.CONFIG_INDEX.configs)
+                # directories not walked are searched up to the first indexed one
+                (root / 'a/b/f').mkdir()
+                self.assertEqual(root / 'a' / license_tools.LICENSE_JSON, license_tools.discover_config(root / 'a/b/f'))
+            finally:
+                license_tools.reload_configs()
+
+    def test_pipeline(self):
+        produced = []
+
+        def items():
+            for i in range(100):
+                produced.append(i)
+                yield i
+        # the background thread stays at most the buffered items ahead
+        consumer = pipeline.background(items(), depth=4)
+        self.assertEqual([0, 1], [next(consumer), next(consumer)])
+        time.sleep(0.2)
+        self.assertLessEqual(len(produced), 2 + 4 + 1)
+        self.assertEqual(list(range(2, 100)), list(consumer))
+        # results keep the order of the items no matter which worker finishes first
+        self.assertEqual([i * 2 for i in range(50)],
+                         list(pipeline.stage(lambda i: time.sleep((i % 3) / 1000) or i * 2, range(50), 4, depth=8)))
+        self.assertEqual([[0, 1, 2], [3, 4]], list(pipeline.batched(range(5), 3)))
+
+        def failing():
+            yield 1
+            raise SystemExit(2)
+        with self.assertRaises(SystemExit):
+            list(pipeline.background(failing()))
+
+    def test_read_paths(self):
+        stream = io.BytesIO(b'a.cpp\0\0sub dir/b.py\0c\nd.h')
+        self.assertEqual(['a.cpp', 'sub dir/b.py', 'c\nd.h'],
+                         list(pipeline.read_paths(stream, b'\0', chunk_size=3)))
+        stream = io.BytesIO(b'a.cpp\r\n\nb.py\n')
+        self.assertEqual(['a.cpp', 'b.py'], list(pipeline.read_paths(stream, chunk_size=2)))
+
+
+class TestGitParsers(unittest.TestCase):
+
+    def test_git_blame_parser(self):
+        output = ('a' * 40 + ' 1 1 2\nauthor Jane Doe\nauthor-mail <jane@doe>\nauthor-time 1420070400\nauthor-tz -0100\n'
+                  'summary Initial\nfilename a.py\n\tfirst\n' + 'a' * 40 + ' 2 2\n\tsecond\n' + 'b' * 40 + ' 1 3 1\n'
+                  'author John\nauthor-time 1420070400\nauthor-tz +0200\nfilename a.py\n\tthird\n')
+        blamed = gitblame.parse_porcelain(output)
+        self.assertEqual({'Jane Doe': (2, 2014, 2014), 'John': (1, 2015, 2015)}, blamed)
+        self.assertEqual({'Jane Doe': (2014, 2014)}, gitblame.owners(blamed, 50))
+
+    def test_git_log_parser(self):
+        output = b'\x01Jane Doe\t2015\0\n1\t0\ta.py\0-\t-\tsub/b\tc.bin\0\x01John\t2016\0' \
+                 b'\x01Max\t2017\0\n0\t0\t\0a.py\0b.py\0'
+        self.assertEqual([('Jane Doe', 2015, [('a.py', None, True), ('sub/b\tc.bin', None, True)]), ('John', 2016, []),
+                          ('Max', 2017, [('b.py', 'a.py', False)])],
+                         list(githistory.parse_log(io.BytesIO(output), chunk_size=5)))
+
+    def test_git_config(self):
+        entries = gitplumbing.parse_config('[user]\n\tname = "Jane  Doe" ; comment\n'
+                                           '[Section "Sub"] key\n[a.B]\nkey = x \\\n  y # comment\n')
+        self.assertEqual([('user', 'name', 'Jane  Doe'), ('section.Sub', 'key', 'true'), ('a.b', 'key', 'x   y')],
+                         entries)
+        with self.assertRaises(gitplumbing.Unsupported):
+            gitplumbing.parse_config('[include]\npath = other\n')
+
+
+class TestGitStore(unittest.TestCase):
+
+    def test_result_cache_bounds(self):
+        results = gitstore.ResultCache()
+        results.expect(['a', 'b', 'b', 'c', 'c'])
+        # results of blobs not expected again are not kept
+        results.put('key-a', 'a', True, b'a')
+        self.assertIsNone(results.get('key-a', 'a'))
+        results.put('key-b', 'b', True, b'b' * 6)
+        self.assertEqual((True, b'b' * 6), results.get('key-b', 'b'))
+        self.assertIsNone(results.get('key-b', 'b'))
+        self.assertEqual(0, results.size)
+        # the least recently used contents get dropped beyond the limit
+        with unittest.mock.patch.object(gitstore, 'MAX_RESULT_BYTES', 10):
+            results.expect(['b', 'b'])
+            results.put('key-b', 'b', True, b'b' * 6)
+            results.put('key-c', 'c', True, b'c' * 6)
+        self.assertIsNone(results.get('key-b', 'b'))
+        self.assertEqual(6, results.size)
+        # unchanged results are handed on until the end of the batch
+        results.put('key-d', 'd', False, b'd')
+        self.assertEqual(['key-d'], results.take_unchanged())
+        self.assertIsNone(results.get('key-c', 'c'))
+        self.assertEqual(0, results.size)
+
+    def test_unchanged_store(self):
+        with tempfile.TemporaryDirectory() as wkdir, unittest.mock.patch.object(gitstore, 'MAX_UNCHANGED', 2):
+            git_dir = pathlib.Path(wkdir)
+            # tables of earlier versions get replaced
+            connection = sqlite3.connect(str(git_dir / gitstore.DATABASE_FILE))
+            with connection:
+                connection.execute('CREATE TABLE unchanged (key TEXT PRIMARY KEY)')
+                connection.execute("INSERT INTO unchanged VALUES ('old')")
+            connection.close()
+            store = gitstore.MetadataStore(git_dir)
+            self.assertFalse(store.is_unchanged('old'))
+            store.add_unchanged(['a'])
+            store.add_unchanged(['b'])
+            self.assertTrue(store.is_unchanged('a'))
+            # the least recently used results get dropped
+            store.add_unchanged(['c'])
+            self.assertEqual([True, False, True], [store.is_unchanged(key) for key in 'abc'])
+            store.close()
+
+
+class TestDaemon(unittest.TestCase):
+
+    def test_daemon_security(self):
+        from license_tools import daemon
+        with tempfile.TemporaryDirectory() as wkdir:
+            private = pathlib.Path(wkdir) / 'private'
+            self.assertEqual(private, daemon._private_dir(private))
+            self.assertEqual(0o700, private.stat().st_mode & 0o777)
+            private.chmod(0o755)
+            with self.assertRaises(OSError):
+                daemon._private_dir(private)
+            # anything but a socket gets refused
+            (private / 'file.sock').write_text('')
+            self.assertIsNone(daemon._connect(private / 'file.sock'))
+        env = daemon._forwarded_env({'PATH': '/bin', 'GIT_DIR': '.git', 'LICTOOLS_OVERRIDE_YEAR': '2022',
+                                     'AWS_SECRET_ACCESS_KEY': 'secret', 'GITHUB_TOKEN': 'secret'})
+        self.assertEqual({'PATH': '/bin', 'GIT_DIR': '.git', 'LICTOOLS_OVERRIDE_YEAR': '2022'}, env)
+        left, right = socket.socketpair()
+        with left, right:
+            self.assertIn(daemon._peer_uid(left), (None, os.getuid()))
+        # daemons running another version of any source are not reused
+        paths = set()
+        for version in ('a', 'b'):
+            with unittest.mock.patch.object(license_tools.Tool, 'version', return_value=version):
+                paths.add(daemon.socket_path())
+        self.assertEqual(2, len(paths))
+
+    def test_daemon_exit_code(self):
+        from license_tools import daemon
+        stream = io.StringIO()
+        self.assertEqual(0, daemon._exit_code(SystemExit(), stream))
+        self.assertEqual(0, daemon._exit_code(SystemExit(None), stream))
+        self.assertEqual(2, daemon._exit_code(SystemExit(2), stream))
+        self.assertEqual('', stream.getvalue())
+        self.assertEqual(1, daemon._exit_code(SystemExit('Failed'), stream))
+        self.assertEqual('Failed\n', stream.getvalue())
+
+    def test_daemon_warm_state(self):
+        from license_tools import daemon
+        state = daemon._WarmState()
+        with tempfile.TemporaryDirectory() as wkdir, \
+                unittest.mock.patch.object(license_tools.DateUtils, '_current_year', 2022), \
+                unittest.mock.patch.object(license_tools, 'reload_configs') as reload_configs:
+            config = pathlib.Path(wkdir) / '.license-tools-config.json'
+            config.write_text('{}')
+            args = license_tools.create_parser().parse_args(['--config', str(config)])
+            state.refresh(wkdir, {'PATH': '/bin'})
+            state.track(args)
+            self.assertEqual(1, reload_configs.call_count)
+            # unchanged files and env keep the state warm
+            state.refresh(wkdir, {'PATH': '/bin'})
+            self.assertEqual(1, reload_configs.call_count)
+            self.assertIn(config, state.files)
+            # but any change drops it
+            state.refresh(wkdir, {'PATH': '/usr/bin'})
+            self.assertEqual(2, reload_configs.call_count)
+            state.track(args)
+            config.write_text('{"title": "Changed"}')
+            state.refresh(wkdir, {'PATH': '/usr/bin'})
+            self.assertEqual(3, reload_configs.call_count)
+            state.track(args)
+            state.refresh('/', {'PATH': '/usr/bin'})
+            self.assertEqual(4, reload_configs.call_count)
+            state.invalidate()
+            state.refresh(wkdir, {'PATH': '/usr/bin'})
+            self.assertEqual(5, reload_configs.call_count)
+
+
+class TestProfiling(unittest.TestCase):
+
+    @unittest.skipIf(sys.version_info >= (3, 12), "only a single profiler may be active")
+    def test_threads(self):
+        from license_tools import profiling
+
+        def worker():
+            return sum(range(100000))
+
+        def run():
+            with concurrent.futures.ThreadPoolExecutor(1) as executor:
+                return executor.submit(worker).result()
+        with tempfile.TemporaryDirectory() as wkdir:
+            output = pathlib.Path(wkdir) / 'threads.prof'
+            self.assertEqual(4999950000, profiling.profile(run, output))
+            functions = {name for _, _, name in pstats.Stats(str(output)).stats}
+        self.assertIn('run', functions)
+        self.assertIn('worker', functions)
+
+
 class TestPackage(unittest.TestCase):
 
     def _prepare_repo(self, commit: pathlib.Path, config: pathlib.Path):
@@ -975,6 +1571,526 @@ class TestPackage(unittest.TestCase):
             subprocess.check_call(f'{BASE}/lictool', cwd=repo)
             self._diff_repo(repo, BASE / 'test/noglob_package_commit_amend.diff')
 
+    def test_profile(self):
+        for extra_args in ([], ['--profile-interval', '0.1']):
+            with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                    BASE / 'test/package_apply.json') as repo:
+                output = pathlib.Path(repo) / 'lictool.prof'
+                subprocess.check_call([f'{BASE}/lictool', '--profile', output.name] + extra_args, cwd=repo)
+                output.unlink()
+                self._diff_repo(repo, BASE / 'test/package_apply.diff')
+                folded = pathlib.Path(repo) / 'lictool.prof.folded'
+                lines = folded.read_text().splitlines()
+                folded.unlink()
+                self.assertTrue(lines)
+                for line in lines:
+                    stack, value = line.rsplit(' ', maxsplit=1)
+                    self.assertTrue(stack)
+                    self.assertGreater(int(value), 0)
+
+    def test_stdin(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            files = subprocess.check_output(['git', 'ls-files'], cwd=repo, encoding='utf-8').splitlines()
+            for file in files:
+                path = pathlib.Path(repo) / file
+                # run from a different directory to verify config and style get resolved from the path
+                bumped = subprocess.check_output([f'{BASE}/lictool', '--stdin', '--stdin-path', str(path)],
+                                                 input=path.read_bytes(), cwd=BASE)
+                path.write_bytes(bumped)
+            self._diff_repo(repo, BASE / 'test/package_apply.diff')
+            with self.assertRaises(subprocess.CalledProcessError):
+                subprocess.check_call([f'{BASE}/lictool', '--stdin'], cwd=repo, stderr=subprocess.DEVNULL)
+        # contents get passed through when there is no config to be found
+        with tempfile.TemporaryDirectory() as wkdir:
+            output = subprocess.run([f'{BASE}/lictool', '--stdin', '--stdin-path', 'code.cpp'], cwd=wkdir, check=True,
+                                    input=b'int main() {}\n', stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.assertEqual(b'int main() {}\n', output.stdout)
+            self.assertIn(b'passing contents through', output.stderr)
+
+    def test_files_from(self):
+        for extra_args in (['-0'], []):
+            with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                    BASE / 'test/package_apply.json') as repo:
+                files = subprocess.check_output(['git', 'ls-files', '-z'], cwd=repo)
+                if extra_args:
+                    subprocess.run([f'{BASE}/lictool', '--files-from', '-'] + extra_args,
+                                   input=files, cwd=repo, check=True)
+                else:
+                    listing = pathlib.Path(repo) / '.git' / 'files.txt'
+                    listing.write_bytes(files.replace(b'\0', b'\r\n'))
+                    subprocess.check_call([f'{BASE}/lictool', '--files-from', str(listing)], cwd=repo)
+                self._diff_repo(repo, BASE / 'test/package_apply.diff')
+
+    def test_stats(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            config = pathlib.Path(repo) / '.license-tools-config.json'
+            config.write_text(json.dumps(dict(json.loads(config.read_text()), generated_markers=['DO NOT EDIT'])))
+            skipped = {
+                'generated.cpp': b'// Code generated by hand. DO NOT EDIT.\nint x;\n',
+                'image.cpp': b'\x89PNG\r\n\x1a\n\0\0\0\rIHDR',
+                'minified.js': b'var x=1;' * 1024 + b'\n',
+            }
+            for name, contents in skipped.items():
+                (pathlib.Path(repo) / name).write_bytes(contents)
+            output = subprocess.run([f'{BASE}/lictool', '--stats'], cwd=repo, check=True,
+                                    stderr=subprocess.PIPE, encoding='utf-8').stderr
+            self.assertIn('Processed 6 files: 1 changed, 0 unchanged, 0 failed, '
+                          'skipped: 1 binary, 2 excluded, 1 generated, 1 minified', output)
+            for name, contents in skipped.items():
+                self.assertEqual(contents, (pathlib.Path(repo) / name).read_bytes())
+            self._diff_repo(repo, BASE / 'test/package_apply.diff')
+
+    def test_daemon(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            socket = pathlib.Path(repo) / '.git' / 'lictool.sock'
+            # variables set using os.putenv() are not part of os.environ
+            env = dict(os.environ, LICTOOLS_OVERRIDE_YEAR='2022', GIT_CONFIG_COUNT='0',
+                       LICTOOLS_DAEMON_SOCKET=str(socket), LICTOOLS_DAEMON_IDLE_TIMEOUT='1')
+            # the first invocation will start the daemon, the second one reuses it
+            subprocess.check_call([f'{BASE}/lictool', '--daemon', 'code.cpp'], cwd=repo, env=env)
+            self.assertTrue(socket.exists())
+            subprocess.check_call([f'{BASE}/lictool', '--daemon'], cwd=repo, env=env)
+            self._diff_repo(repo, BASE / 'test/package_apply.diff')
+            # failures get forwarded as exit code
+            config = pathlib.Path(repo) / '.license-tools-config.json'
+            valid = config.read_text()
+            config.write_text('{')
+            with self.assertRaises(subprocess.CalledProcessError):
+                subprocess.check_call([f'{BASE}/lictool', '--daemon'], cwd=repo, env=env, stderr=subprocess.DEVNULL)
+            # and fixed configs get picked up again
+            config.write_text(valid)
+            subprocess.check_call([f'{BASE}/lictool', '--daemon'], cwd=repo, env=env)
+            # the daemon exits once idle
+            deadline = time.monotonic() + 10
+            while socket.exists() and time.monotonic() < deadline:
+                time.sleep(0.1)
+            self.assertFalse(socket.exists())
+
+    def test_watch(self):
+        def wait_for(path: pathlib.Path, text: str):
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                if path.exists() and text in path.read_text():
+                    return
+                time.sleep(0.05)
+            self.fail(f"Timeout waiting for '{text}' in {path}")
+
+        for extra_args in ([], ['--watch-poll']):
+            with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                    BASE / 'test/package_apply.json') as repo:
+                repo = pathlib.Path(repo)
+                watch = subprocess.Popen([f'{BASE}/lictool', '--watch'] + extra_args, cwd=repo,
+                                         stderr=subprocess.PIPE, encoding='utf-8')
+                try:
+                    self.assertIn('Watching', watch.stderr.readline())
+                    # new files in new directories get processed
+                    (repo / 'sub').mkdir()
+                    (repo / 'sub' / 'new.cpp').write_text('int main() {}\n')
+                    wait_for(repo / 'sub' / 'new.cpp', 'Copyright (c) 2022 Test Author')
+                    # changes to the config get picked up
+                    config = repo / '.license-tools-config.json'
+                    config.write_text(config.read_text().replace('Proprietary', 'MIT'))
+                    time.sleep(0.1)
+                    (repo / 'code.cpp').write_text('int main() {}\n')
+                    wait_for(repo / 'code.cpp', 'SPDX-License-Identifier: MIT')
+                finally:
+                    watch.terminate()
+                    watch.communicate()
+        # files written by a dry run are not processed again
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo)
+            watch = subprocess.Popen([f'{BASE}/lictool', '--watch', '--dry-run'], cwd=repo,
+                                     stderr=subprocess.PIPE, encoding='utf-8')
+            try:
+                self.assertIn('Watching', watch.stderr.readline())
+                (repo / 'new.cpp').write_text('int main() {}\n')
+                wait_for(repo / 'new.cpp.license_bumped', 'Copyright (c) 2022 Test Author')
+                time.sleep(0.5)
+                self.assertEqual([], list(repo.glob('*.license_bumped.license_bumped')))
+                self.assertIsNone(watch.poll())
+            finally:
+                watch.terminate()
+                watch.communicate()
+
+    def test_lsp(self):
+        def send(stream, message):
+            body = json.dumps(dict(message, jsonrpc='2.0')).encode('utf-8')
+            stream.write(f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii') + body)
+            stream.flush()
+
+        def receive(stream):
+            length = None
+            for line in iter(stream.readline, b'\r\n'):
+                name, value = line.decode('ascii').split(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            return json.loads(stream.read(length))
+
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            code = pathlib.Path(repo) / 'code.cpp'
+            expected = subprocess.check_output([f'{BASE}/lictool', '--stdin', '--stdin-path', str(code)],
+                                               input=code.read_text(), cwd=repo, encoding='utf-8')
+            server = subprocess.Popen([f'{BASE}/lictool', '--lsp'], cwd=repo,
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            try:
+                send(server.stdin, {'id': 1, 'method': 'initialize', 'params': {}})
+                capabilities = receive(server.stdout)['result']['capabilities']
+                self.assertIn('codeActionProvider', capabilities)
+                send(server.stdin, {'method': 'initialized', 'params': {}})
+                uri = code.as_uri()
+                send(server.stdin, {'method': 'textDocument/didOpen', 'params': {'textDocument': {
+                    'uri': uri, 'languageId': 'cpp', 'version': 1, 'text': code.read_text()}}})
+                diagnostics = receive(server.stdout)['params']['diagnostics']
+                self.assertEqual(1, len(diagnostics))
+                self.assertEqual('License header is outdated', diagnostics[0]['message'])
+                send(server.stdin, {'id': 2, 'method': 'textDocument/codeAction', 'params': {
+                    'textDocument': {'uri': uri}, 'range': diagnostics[0]['range'],
+                    'context': {'diagnostics': diagnostics}}})
+                actions = receive(server.stdout)['result']
+                self.assertEqual(1, len(actions))
+                edit = actions[0]['edit']['changes'][uri][0]
+                self.assertEqual(expected, edit['newText'])
+                # applying the action resolves the diagnostic
+                send(server.stdin, {'method': 'textDocument/didChange', 'params': {
+                    'textDocument': {'uri': uri, 'version': 2}, 'contentChanges': [{'text': edit['newText']}]}})
+                self.assertEqual([], receive(server.stdout)['params']['diagnostics'])
+                send(server.stdin, {'id': 3, 'method': 'shutdown'})
+                self.assertIsNone(receive(server.stdout)['result'])
+                send(server.stdin, {'method': 'exit'})
+                self.assertEqual(0, server.wait(timeout=10))
+            finally:
+                server.kill()
+                server.communicate()
+
+    def test_git_prefetch(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo)
+            files = [repo / 'with space.cpp', repo / 'glob*.cpp', repo / 'ünicode.cpp']
+            for file in files:
+                file.write_text('int main() {}\n')
+            subprocess.check_call(['git', 'add'] + [str(file) for file in files], cwd=repo)
+            subprocess.check_call(['git', 'commit', '-m', 'Special names'], cwd=repo, stdout=subprocess.DEVNULL)
+            (repo / 'code.cpp').write_text('int modified;\n')
+            files += [repo / 'code.cpp', repo / 'untracked.cpp']
+            expected = license_tools.GitRepo(cwd=repo)
+            git_repo = license_tools.GitRepo(cwd=repo)
+            git_repo.prefetch(files, concurrency=2)
+            for file in files:
+                self.assertEqual(expected.is_modified_in_tree(file), git_repo.is_modified_in_tree(file), file)
+                if file.name == 'code.cpp':
+                    # history is not queried for modified files
+                    continue
+                self.assertEqual(expected.author_from_history(file), git_repo.author_from_history(file), file)
+                self.assertFalse(file.relative_to(repo) in git_repo.prefetched_history)
+            self.assertTrue(git_repo.is_modified_in_tree(repo / 'code.cpp'))
+
+    def test_git_store(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo, \
+                unittest.mock.patch.object(gitstore, 'enabled', return_value=True):
+            repo = pathlib.Path(repo).resolve()
+            files = [repo / 'a.cpp', repo / 'b.cpp', repo / 'c.cpp']
+            for file in files:
+                file.write_text('int main() {}\n')
+            subprocess.check_call(['git', 'add', 'a.cpp', 'b.cpp'], cwd=repo)
+            subprocess.check_call(['git', 'commit', '-m', 'Files'], cwd=repo, stdout=subprocess.DEVNULL)
+            files[1].write_text('int modified;\n')
+            for file in files:
+                # recently changed files are never stored
+                os.utime(file, (time.time() - 10, time.time() - 10))
+            # git refreshes the stat data in the index once after the files got touched
+            subprocess.check_call(['git', 'update-index', '-q', '--refresh'], cwd=repo)
+            expected = license_tools.GitRepo(cwd=repo)
+            expected.prefetch(files)
+            self.assertTrue((repo / '.git' / gitstore.DATABASE_FILE).exists())
+            git_repo = license_tools.GitRepo(cwd=repo)
+            with unittest.mock.patch('license_tools.gitasync.prefetch', return_value=({}, {})) as prefetch:
+                git_repo.prefetch(files)
+                prefetch.assert_called_once_with(git_repo, [], None)
+            self.assertEqual(expected.prefetched_modified, git_repo.prefetched_modified)
+            self.assertEqual(expected.prefetched_history, git_repo.prefetched_history)
+            # changes to the file are detected
+            files[0].write_text('int changed;\n')
+            with unittest.mock.patch('license_tools.gitasync.prefetch', return_value=({}, {})) as prefetch:
+                git_repo.prefetch(files)
+                prefetch.assert_called_once_with(git_repo, [files[0]], None)
+
+    def test_result_cache(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo, \
+                unittest.mock.patch.object(gitstore, 'enabled', return_value=True):
+            repo = pathlib.Path(repo).resolve()
+            config = repo / '.license-tools-config.json'
+            config.write_text(json.dumps({'author': {'from_git': True}, 'license': 'MIT', 'title': False}))
+            files = [repo / 'a.cpp', repo / 'b.cpp', repo / 'sub' / 'c.cpp']
+            files[2].parent.mkdir()
+            for file in files:
+                file.write_text('int main() {}\n')
+            subprocess.check_call(['git', 'add', '.'], cwd=repo)
+            subprocess.check_call(['git', 'commit', '-m', 'Files'], cwd=repo, stdout=subprocess.DEVNULL)
+
+            def bump(expected_calls):
+                tool, options = license_tools.load_tool(config)
+                tool.default_author.git_repo.prefetch(files)
+                # files are sniffed first once they get read
+                with unittest.mock.patch.object(rawtext, 'sniff', side_effect=rawtext.sniff) as sniff:
+                    for file in files:
+                        self.assertTrue(tool.bump_inplace(file, **options))
+                    self.assertEqual(expected_calls, sniff.call_count)
+                tool.default_author.git_repo.discard_prefetched()
+            # identical files get bumped once
+            bump(1)
+            self.assertEqual(1, len({file.read_text() for file in files}))
+            self.assertIn('Copyright', files[2].read_text())
+            subprocess.check_call(['git', 'commit', '-a', '-m', 'Headers'], cwd=repo, stdout=subprocess.DEVNULL)
+            bump(1)
+            # unchanged results are reused by later runs
+            license_tools.reload_configs()
+            bump(0)
+
+    def test_git_store_unavailable(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo, \
+                unittest.mock.patch.object(gitstore, 'enabled', return_value=True), \
+                unittest.mock.patch.object(gitstore, 'TIMEOUT', 0.1):
+            database = pathlib.Path(repo).resolve() / '.git' / gitstore.DATABASE_FILE
+            # databases locked by other processes are skipped
+            gitstore.MetadataStore(database.parent).close()
+            connection = sqlite3.connect(str(database))
+            connection.execute('PRAGMA locking_mode=EXCLUSIVE')
+            connection.execute('BEGIN EXCLUSIVE')
+            self.assertIsNone(license_tools.GitRepo(cwd=repo).metadata_store())
+            connection.close()
+            # as are databases which cannot be opened
+            database.unlink()
+            database.mkdir()
+            self.assertIsNone(license_tools.GitRepo(cwd=repo).metadata_store())
+
+    def test_git_plumbing(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo).resolve()
+            files = ['a.cpp', 'sub/b.cpp', 'sub/dir/c.cpp', 'd e.py', 'f.py']
+            for file in files:
+                (repo / file).parent.mkdir(parents=True, exist_ok=True)
+                (repo / file).write_text(f'# {file}\n')
+            subprocess.check_call(['git', 'add'] + files, cwd=repo)
+            subprocess.check_call(['git', 'commit', '-m', 'More files'], cwd=repo, stdout=subprocess.DEVNULL)
+            # objects get read from packs and loose objects
+            subprocess.check_call(['git', 'gc', '-q'], cwd=repo)
+            (repo / files[4]).write_text('# loose\n')
+            subprocess.check_call(['git', 'commit', '-a', '-m', 'Loose'], cwd=repo, stdout=subprocess.DEVNULL)
+            (repo / files[0]).write_text('modified\n')
+            (repo / files[1]).write_text('staged\n')
+            subprocess.check_call(['git', 'add', files[1]], cwd=repo)
+            (repo / files[2]).unlink()
+            os.utime(repo / files[3])
+            (repo / 'untracked.cpp').write_text('int main() {}\n')
+            files.append('untracked.cpp')
+            git_repo = gitplumbing.Repository(repo)
+            self.assertEqual((repo, repo / '.git'), gitplumbing.find_worktree(repo / 'sub'))
+            self.assertEqual(subprocess.check_output(['git', 'config', 'user.name'], cwd=repo,
+                                                     encoding='utf-8').strip(), git_repo.user_name())
+            for version in ('2', '4'):
+                subprocess.check_call(['git', 'update-index', '--index-version', version], cwd=repo)
+                modified = subprocess.check_output(['git', 'diff', '--name-only', 'HEAD'], cwd=repo,
+                                                   encoding='utf-8').split()
+                for file in files:
+                    self.assertEqual(file in modified, git_repo.is_modified(file), file)
+            # packs get mapped again after being released
+            git_repo.close()
+            self.assertIsNone(git_repo.objects.packs)
+            packed = subprocess.check_output(['git', 'rev-parse', 'HEAD~1'], cwd=repo, encoding='utf-8').strip()
+            self.assertEqual(gitplumbing._OBJ_COMMIT, git_repo.objects.read(bytes.fromhex(packed))[0])
+            self.assertIsNotNone(git_repo.objects.packs)
+            git_repo.close()
+            # reading in-process is opt-in
+            with unittest.mock.patch.dict(os.environ, {'LICTOOLS_GIT_PLUMBING': '0'}):
+                self.assertFalse(gitplumbing.enabled())
+            with unittest.mock.patch.dict(os.environ, {'LICTOOLS_GIT_PLUMBING': '1'}):
+                self.assertTrue(gitplumbing.enabled())
+
+    def _assert_objects(self, repo: pathlib.Path, delta_type: int):
+        git_repo = gitplumbing.Repository(repo)
+        listing = subprocess.check_output(['git', 'cat-file', '--batch-all-objects',
+                                           '--batch-check=%(objectname) %(objecttype)'], cwd=repo, encoding='utf-8')
+        entry_types = set()
+        for line in listing.splitlines():
+            sha, obj_type = line.split()
+            content = subprocess.check_output(['git', 'cat-file', obj_type, sha], cwd=repo)
+            read_type, read_content = git_repo.objects.read(bytes.fromhex(sha))
+            self.assertEqual(obj_type.encode(), gitplumbing._TYPE_NAMES[read_type], sha)
+            self.assertEqual(content, read_content, sha)
+            for pack in git_repo.objects.packs:
+                offset = pack.find(bytes.fromhex(sha))
+                if offset is not None:
+                    entry_types.add((pack.data[offset] >> 4) & 7)
+        git_repo.close()
+        self.assertIn(delta_type, entry_types)
+        self.assertNotIn({gitplumbing._OBJ_OFS_DELTA, gitplumbing._OBJ_REF_DELTA}.difference([delta_type]).pop(),
+                         entry_types)
+
+    def test_git_plumbing_packs(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo).resolve()
+            lines = [f'line {i}' for i in range(300)]
+            for i in range(8):
+                # changes accumulate so that deltas are based on other deltas
+                lines[i * 30] += ' changed'
+                (repo / 'big.txt').write_text('\n'.join(lines))
+                subprocess.check_call(['git', 'add', 'big.txt'], cwd=repo)
+                subprocess.check_call(['git', 'commit', '-m', f'Version {i}'], cwd=repo, stdout=subprocess.DEVNULL)
+            # deltas referencing their base by sha
+            subprocess.check_call(['git', '-c', 'repack.usedeltabaseoffset=false', 'repack', '-adfq'], cwd=repo)
+            pack_index = str(next((repo / '.git' / 'objects' / 'pack').glob('*.idx')))
+            self.assertIn('chain length = 2', subprocess.check_output(['git', 'verify-pack', '-v', pack_index],
+                                                                      cwd=repo, encoding='utf-8'))
+            self._assert_objects(repo, gitplumbing._OBJ_REF_DELTA)
+            # deltas referencing their base by offset
+            subprocess.check_call(['git', 'repack', '-adfq'], cwd=repo)
+            self._assert_objects(repo, gitplumbing._OBJ_OFS_DELTA)
+
+    def _assert_modified(self, repo: pathlib.Path, files, cli_files):
+        modified = subprocess.check_output(['git', 'diff', '--name-only', 'HEAD'], cwd=repo, encoding='utf-8').split()
+        with unittest.mock.patch.dict(os.environ, {'LICTOOLS_GIT_PLUMBING': '1'}), \
+                unittest.mock.patch.object(license_tools.GitRepo, 'run',
+                                           side_effect=license_tools.GitRepo.run) as run:
+            git_repo = license_tools.GitRepo(cwd=repo)
+            for file in files:
+                self.assertEqual(file in modified, git_repo.is_modified_in_tree(repo / file), file)
+        self.assertEqual(cli_files, [call.args[-1] for call in run.call_args_list if 'diff' in call.args])
+        return git_repo
+
+    def test_git_plumbing_fallback(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo).resolve()
+            files = ['a.cpp', 'b.cpp', 'c.cpp']
+            for file in files:
+                (repo / file).write_text(f'// {file}\n')
+            subprocess.check_call(['git', 'add'] + files, cwd=repo)
+            subprocess.check_call(['git', 'commit', '-m', 'Files'], cwd=repo, stdout=subprocess.DEVNULL)
+            (repo / files[0]).write_text('modified\n')
+            self.assertIsNotNone(self._assert_modified(repo, files, []).plumbing)
+            # entries with special flags are left to the git CLI
+            subprocess.check_call(['git', 'update-index', '--skip-worktree', files[1]], cwd=repo)
+            self._assert_modified(repo, files, [files[1]])
+            subprocess.check_call(['git', 'update-index', '--no-skip-worktree', files[1]], cwd=repo)
+            # as are split indexes
+            subprocess.check_call(['git', 'update-index', '--split-index'], cwd=repo)
+            with self.assertRaises(gitplumbing.Unsupported):
+                gitplumbing.Repository(repo).index()
+            self._assert_modified(repo, files, files)
+        # and repositories using sha256
+        with tempfile.TemporaryDirectory(suffix='lictools') as repo:
+            repo = pathlib.Path(repo).resolve()
+            subprocess.check_call(['git', 'init', '-q', '--object-format=sha256'], cwd=repo)
+            subprocess.check_call(['git', 'config', 'user.name', 'Lictools Unittest'], cwd=repo)
+            for file in files:
+                (repo / file).write_text(f'// {file}\n')
+            subprocess.check_call(['git', 'add'] + files, cwd=repo)
+            subprocess.check_call(['git', 'commit', '-m', 'Files'], cwd=repo, stdout=subprocess.DEVNULL)
+            (repo / files[2]).write_text('modified\n')
+            with self.assertRaises(gitplumbing.Unsupported):
+                gitplumbing.Repository(repo)
+            self.assertIsNone(self._assert_modified(repo, files, files).plumbing)
+
+    def test_git_history(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo)
+            (repo / '.license-tools-config.json').write_text(json.dumps({
+                'author': {'from_git': True, 'from_history': True},
+                'license': 'MIT', 'title': False, 'include': ['*.py']}))
+
+            def commit(author, year, text):
+                if text is not None:
+                    (repo / 'file.py').write_text(text)
+                env = dict(os.environ, GIT_AUTHOR_NAME=author, GIT_AUTHOR_DATE=f'{year}-06-01T12:00:00',
+                           GIT_CONFIG_COUNT='0')
+                subprocess.check_call(['git', 'add', '.'], cwd=repo, env=env)
+                subprocess.check_call(['git', 'commit', '-m', author], cwd=repo, env=env, stdout=subprocess.DEVNULL)
+            commit('Jane Doe', 2015, 'a = 1\n')
+            commit('John Doe', 2017, 'a = 2\n')
+            commit('Jane Doe', 2019, 'a = 3\n')
+
+            def header():
+                subprocess.check_call([f'{BASE}/lictool', 'file.py'], cwd=repo)
+                return [line for line in (repo / 'file.py').read_text().splitlines() if 'Copyright' in line]
+            self.assertEqual(['# Copyright (c) 2015 - 2019 Jane Doe', '# Copyright (c) 2017 John Doe'], header())
+            # the language server lists the same authors as the commandline
+            expected = subprocess.check_output([f'{BASE}/lictool', '--stdin', '--stdin-path', 'file.py'],
+                                               input='a = 3\n', cwd=repo, encoding='utf-8')
+            self.assertIn('John Doe', expected)
+            args = license_tools.create_parser().parse_args(['--lsp'])
+            args.summary = None
+            document = lsp.Document((repo / 'file.py').as_uri(), repo.resolve() / 'file.py')
+            document.text = 'a = 3\n'
+            document.version = 1
+            with unittest.mock.patch.object(license_tools.DateUtils, '_current_year', 2022):
+                lsp.Server(args, io.BytesIO(), io.BytesIO()).validate(document)
+            self.assertEqual(expected, document.bumped)
+            index = json.loads((repo / '.git' / githistory.INDEX_FILE).read_text())
+            self.assertEqual(subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=repo, encoding='utf-8').strip(),
+                             index['head'])
+            # only the new commits get scanned, moving the file keeps its history
+            commit('Max Doe', 2020, 'a = 4\n')
+            (repo / 'sub').mkdir()
+            subprocess.check_call(['git', 'mv', 'file.py', 'sub/file.py'], cwd=repo)
+            commit('Moe Doe', 2021, None)
+            expected = [license_tools.Author('Jane Doe', 2015, 2019), license_tools.Author('John Doe', 2017, 2017),
+                        license_tools.Author('Max Doe', 2020, 2020)]
+            with unittest.mock.patch.object(githistory.HistoryIndex, '_scan', autospec=True,
+                                            side_effect=githistory.HistoryIndex._scan) as scan:
+                git_repo = license_tools.GitRepo(cwd=repo)
+                git_repo.enable_history()
+                self.assertEqual(expected, git_repo.contributors(repo / 'sub' / 'file.py'))
+                self.assertEqual(license_tools.Author('Max Doe', 2020, 2020),
+                                 git_repo.author_from_history(repo / 'sub' / 'file.py'))
+                self.assertEqual(f'{index["head"]}..{git_repo.head_commit()}', scan.call_args[0][1])
+            (repo / '.git' / githistory.INDEX_FILE).unlink()
+            git_repo = license_tools.GitRepo(cwd=repo)
+            git_repo.enable_history()
+            self.assertEqual(expected, git_repo.contributors(repo / 'sub' / 'file.py'))
+
+    def test_git_blame(self):
+        with self._prepare_repo(BASE / 'test/package_apply.patch',
+                                BASE / 'test/package_apply.json') as repo:
+            repo = pathlib.Path(repo)
+            (repo / '.license-tools-config.json').write_text(json.dumps({
+                'author': {'from_git': True, 'blame_threshold': 10},
+                'license': 'MIT', 'title': False, 'include': ['*.py']}))
+            for author, year, lines in (('Jane Doe', 2015, 10), ('John Doe', 2017, 1), ('Max Doe', 2019, 2)):
+                with open(repo / 'file.py', 'a', encoding='utf-8') as file_obj:
+                    file_obj.write(''.join(f'{author[0]}{i} = {i}\n' for i in range(lines)))
+                env = dict(os.environ, GIT_AUTHOR_NAME=author, GIT_AUTHOR_DATE=f'{year}-06-01T12:00:00+0100',
+                           GIT_CONFIG_COUNT='0')
+                subprocess.check_call(['git', 'commit', '-a', '-m', author] if year > 2015 else
+                                      ['git', 'add', 'file.py'], cwd=repo, env=env, stdout=subprocess.DEVNULL)
+                if year == 2015:
+                    subprocess.check_call(['git', 'commit', '-m', author], cwd=repo, env=env, stdout=subprocess.DEVNULL)
+            subprocess.check_call([f'{BASE}/lictool', 'file.py'], cwd=repo)
+            self.assertEqual(['# Copyright (c) 2015 Jane Doe', '# Copyright (c) 2019 Max Doe'],
+                             [line for line in (repo / 'file.py').read_text().splitlines() if 'Copyright' in line])
+            cache = json.loads((repo / '.git' / gitblame.CACHE_FILE).read_text())
+            self.assertEqual({'Jane Doe': [10, 2015, 2015], 'John Doe': [1, 2017, 2017], 'Max Doe': [2, 2019, 2019]},
+                             cache['files']['file.py'][1])
+            # blaming again is avoided while the file is unchanged in HEAD
+            git_repo = license_tools.GitRepo(cwd=repo)
+            git_repo.enable_blame(5)
+            with unittest.mock.patch('license_tools.gitasync.blame', return_value={}) as blame:
+                git_repo.prefetch([repo / 'file.py'])
+                self.assertEqual([license_tools.Author('Jane Doe', 2015, 2015), license_tools.Author('John Doe', 2017, 2017),
+                                  license_tools.Author('Max Doe', 2019, 2019)], git_repo.contributors(repo / 'file.py'))
+                blame.assert_called_once_with(git_repo.git_root, [], None)
+
 
 for file in BASE.glob('test/package_*.patch'):
     def create_test_case():